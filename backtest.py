@@ -0,0 +1,46 @@
+"""
+Replays recorded Binance order books & 1inch quotes offline for several screener configurations.
+Prints a summary per configuration and writes every alert that would have been sent to a JSON file.
+"""
+import os
+import sys
+import json
+
+from datetime import datetime
+
+from src.projecthope.replay import replay
+
+
+def parse_time(value: float | str | None) -> float | None:
+    """
+    :param value: Secs since epoch or ISO time, eg. '2022-10-17 15:00:00'
+    :return: Secs since epoch
+    """
+    if value is None or isinstance(value, (int, float)):
+        return value
+
+    return datetime.fromisoformat(value).timestamp()
+
+
+if __name__ == "__main__":
+
+    if len(sys.argv) != 3:
+        sys.exit(f"Usage: python3 {os.path.basename(__file__)} <input_file> <replay_file>\n")
+
+    info: dict = json.loads(sys.argv[1])
+    replay_info: dict = json.loads(sys.argv[2])
+
+    output = replay_info.get("output", "logs/replay.json")
+    results = replay(replay_info.get("directory", "data"), info, replay_info["configurations"],
+                     parse_time(replay_info.get("start")), parse_time(replay_info.get("end")),
+                     replay_info.get("processes"))
+
+    for result in results:
+        print(f"{result['name']}: {len(result['alerts'])} alerts, net {result['net_arbitrage']:,.2f}, "
+              f"{result['suppressed']} suppressed, {result['screenings']} screenings in {result['loops']} loops, "
+              f"quotes {result['quotes']}, {result['speedup']}x real time")
+
+    with open(output, "w") as file:
+        json.dump(results, file, indent=2)
+
+    print(f"Results written to {output}")
@@ -0,0 +1,206 @@
+"""
+End-to-end benchmark: runs 'main.py' against the local stand-in for a while and measures loop & pair screening times,
+1inch calls, alerts and the resources of the screener's processes. Linux only, process stats are read from /proc.
+
+    python3 -m benchmarks.e2e "$(cat coins.json)" '{"duration": 60, "latency": 0.2, "error_rate": 0.02}'
+"""
+import os
+import sys
+import json
+import time
+import signal
+import tempfile
+import subprocess
+
+from typing import (
+    Dict,
+    List,
+)
+from urllib.request import urlopen
+from urllib.error import URLError
+
+from benchmarks.stand_in import StandIn
+from benchmarks.results import (
+    result,
+    save_results,
+)
+
+
+def parse_metrics(text: str) -> Dict[str, float]:
+    """
+    :param text: Metrics in Prometheus text format
+    :return: Value by sample, eg. {'quote_errors_total{network="1",type="server"}': 3.0}
+    """
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            samples[name] = float(value)
+
+    return samples
+
+
+def metric_total(samples: Dict[str, float], name: str) -> float:
+    """Sum of a metric's samples over all label values."""
+    return sum(value for sample, value in samples.items() if sample == name or sample.startswith(name + "{"))
+
+
+def group_pids(group_id: int) -> List[int]:
+    """Pids of every process in a process group."""
+    pids = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as file:
+                # Fields after the command name, which may contain spaces
+                fields = file.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[2]) == group_id:
+            pids.append(int(entry))
+
+    return pids
+
+
+def process_stats(pid: int) -> Dict[str, float]:
+    """
+    Resources of a running process.
+
+    :param pid: Process id
+    :return: Resident memory in MB, threads, open sockets & CPU secs used. Empty if the process is gone
+    """
+    try:
+        with open(f"/proc/{pid}/status") as file:
+            status = dict(line.split(":", 1) for line in file if ":" in line)
+        with open(f"/proc/{pid}/stat") as file:
+            fields = file.read().rsplit(")", 1)[1].split()
+
+        sockets = 0
+        for fd in os.listdir(f"/proc/{pid}/fd"):
+            try:
+                sockets += os.readlink(f"/proc/{pid}/fd/{fd}").startswith("socket:")
+            except OSError:
+                continue
+
+    except OSError:
+        return {}
+
+    return {"rss_mb": int(status["VmRSS"].split()[0]) / 1024, "threads": int(status["Threads"]),
+            "sockets": sockets, "cpu_seconds": (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")}
+
+
+def run_e2e(info: dict, duration: float = 60, latency: float = 0.2, error_rate: float = 0.02,
+            port: int = 8765, metrics_port: int = 9109, stand_in_settings: dict | None = None) -> Dict[str, dict]:
+    """
+    Runs the screener against the stand-in with shared memory books, so no memcached daemon is needed.
+
+    :param info: Input data, as passed to 'main.py'
+    :param duration: Secs to run the screener for
+    :param latency: Mean 1inch quote latency of the stand-in in secs
+    :param error_rate: Share of 1inch quotes failing with HTTP 500
+    :param port: Port of the stand-in
+    :param metrics_port: Port the screener serves its metrics on
+    :param stand_in_settings: Further StandIn settings, eg. {"depth": 100}
+    :return: Results by benchmark name
+    """
+    heartbeat_path = os.path.join(tempfile.mkdtemp(prefix="projecthope-"), "heartbeat.json")
+    settings = {**info["settings"], "book_transport": "shm", "metrics": {"port": metrics_port},
+                "heartbeat": {"path": heartbeat_path}}
+
+    stand_in = StandIn(info["coins"], settings["base_token"], latency, error_rate, **(stand_in_settings or {}))
+    stand_in.start(port=port)
+
+    process = subprocess.Popen([sys.executable, "main.py", json.dumps({**info, "settings": settings})],
+                               env={**os.environ, **stand_in.environment()}, stdout=subprocess.DEVNULL,
+                               start_new_session=True)
+    start = time.monotonic()
+    screener_stats: List[dict] = []
+    total_stats: List[dict] = []
+    samples: Dict[str, float] = {}
+    heartbeat: dict = {}
+
+    try:
+        while time.monotonic() - start < duration and process.poll() is None:
+            time.sleep(1)
+
+            try:
+                with open(heartbeat_path) as file:
+                    heartbeat = json.load(file)
+            except (OSError, ValueError):
+                continue
+
+            screener_stats.append(process_stats(heartbeat["pid"]))
+            group = [process_stats(pid) for pid in group_pids(process.pid)]
+            total_stats.append({key: sum(stats.get(key, 0) for stats in group) for key in screener_stats[-1]})
+
+        try:
+            samples = parse_metrics(urlopen(f"http://127.0.0.1:{metrics_port}/metrics", timeout=5).read().decode())
+        except URLError as e:
+            print(f"Could not read screener metrics - {e}")
+
+    finally:
+        elapsed = time.monotonic() - start
+
+        # Stop the screener & stream, then interrupt main.py so its exit handlers remove the shared memory block
+        for pid in group_pids(process.pid):
+            if pid != process.pid:
+                os.kill(pid, signal.SIGTERM)
+        process.send_signal(signal.SIGINT)
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            os.killpg(process.pid, signal.SIGKILL)
+            process.wait()
+
+        stand_in.stop()
+
+    if not heartbeat:
+        raise Exception("Screener did not finish a loop, see logs/error-screener.log.")
+
+    def mean(name: str) -> float | None:
+        count = metric_total(samples, f"{name}_count")
+        return metric_total(samples, f"{name}_sum") / count if count else None
+
+    def peak(stats: List[dict], key: str) -> float:
+        return max((stat.get(key, 0) for stat in stats), default=0)
+
+    return {
+        "loops": result(heartbeat["loop"], "loops", "higher"),
+        "loop_seconds": result(mean("loop_duration_seconds"), "s"),
+        "pair_seconds": result(mean("pair_screening_seconds"), "s"),
+        "pair_queue_seconds": result(mean("pair_queue_seconds"), "s"),
+        "pairs_per_second": result(metric_total(samples, "pair_screening_seconds_count") / elapsed, "pairs/s",
+                                   "higher"),
+        "quote_seconds": result(mean("quote_latency_seconds"), "s"),
+        "quote_calls": result(stand_in.counts["quotes"], "calls", "higher"),
+        "quote_calls_per_second": result(stand_in.counts["quotes"] / elapsed, "calls/s", "higher"),
+        "quote_errors": result(metric_total(samples, "quote_errors_total"), "errors"),
+        "quote_cache_hits": result(metric_total(samples, 'quote_cache_requests_total{result="hit"}'), "hits",
+                                   "higher"),
+        "book_age_seconds": result(max((value for sample, value in samples.items()
+                                        if sample.startswith("book_age_seconds{")), default=None), "s"),
+        "depth_frames_per_second": result(stand_in.counts["frames"] / elapsed, "frames/s", "higher"),
+        "telegram_messages": result(stand_in.counts["telegram_messages"], "messages", "higher"),
+        "screener_rss_mb": result(peak(screener_stats, "rss_mb"), "MB"),
+        "screener_threads": result(peak(screener_stats, "threads"), "threads"),
+        "screener_sockets": result(peak(screener_stats, "sockets"), "sockets"),
+        "screener_cpu_share": result(peak(screener_stats, "cpu_seconds") / elapsed, "cpu"),
+        "total_rss_mb": result(peak(total_stats, "rss_mb"), "MB"),
+        "total_cpu_share": result(peak(total_stats, "cpu_seconds") / elapsed, "cpu"),
+    }
+
+
+if __name__ == "__main__":
+
+    if len(sys.argv) not in (2, 3):
+        sys.exit("Usage: python3 -m benchmarks.e2e <input_file> [<benchmark_settings>]\n")
+
+    input_info: dict = json.loads(sys.argv[1])
+    parameters: dict = json.loads(sys.argv[2]) if len(sys.argv) == 3 else {}
+
+    e2e_results = run_e2e(input_info, **parameters)
+    for benchmark, measured in e2e_results.items():
+        print(f"{benchmark:<30} {measured['value']!s:>12} {measured['unit']}")
+
+    print(f"Results written to {save_results('e2e', e2e_results, parameters)}")
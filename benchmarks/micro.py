@@ -0,0 +1,178 @@
+"""
+Micro-benchmarks of the screening hot path at realistic book depths & amount counts.
+
+    python3 -m benchmarks.micro [--quick]
+"""
+import sys
+import random
+import timeit
+
+from itertools import cycle
+from typing import (
+    Dict,
+    List,
+    Tuple,
+    Callable,
+)
+
+from src.projecthope.datatypes import (
+    Cost,
+    Token,
+    Swap,
+)
+from src.projecthope.compare import max_swaps
+from src.projecthope.binance.codec import encode_book
+from src.projecthope.binance.api import (
+    trade_a_for_b,
+    trade_b_for_a,
+)
+from src.projecthope.one_inch.routes import RouteTable
+from src.projecthope.common.variables import network_names
+
+from benchmarks.scale import generate_coins
+from benchmarks.results import (
+    result,
+    save_results,
+)
+
+
+# Published book depth of the Binance stream & amount ranges per pair, see 'BinanceDepthSocket'
+BOOK_DEPTHS = (20, 500)
+AMOUNT_COUNTS = (1, 5, 20)
+
+
+def measure(func: Callable, repeat: int = 5, min_time: float = 0.2) -> float:
+    """
+    Times a function call, best of 'repeat' runs of as many calls as fill 'min_time' secs.
+
+    :param func: Function without arguments
+    :param repeat: Number of runs
+    :param min_time: Minimum secs per run
+    :return: Secs per call
+    """
+    timer = timeit.Timer(func)
+
+    number = 1
+    while timer.timeit(number) < min_time:
+        number *= 2
+
+    return min(timer.repeat(repeat, number)) / number
+
+
+def make_book(depth: int, mid: float = 1500, update_id: int = 1, seed: int = 0) -> bytes:
+    """
+    Encoded order book with 'depth' levels per side one tick apart around 'mid'.
+
+    :param depth: Levels per side
+    :param mid: Mid price
+    :param update_id: Book update id
+    :param seed: Seed of the random quantities
+    :return: Encoded order book
+    """
+    rng = random.Random(seed)
+    tick = mid / 10000
+
+    bids = [[mid - tick * (i + 1), rng.uniform(0.1, 20)] for i in range(depth)]
+    asks = [[mid + tick * (i + 1), rng.uniform(0.1, 20)] for i in range(depth)]
+
+    return encode_book(update_id, update_id * 100, bids, asks)
+
+
+def make_amounts(count: int) -> List[float]:
+    """Swap amounts in USDT spread from 1,000 to 100,000."""
+    return [1000 + i * 99000 / max(1, count - 1) for i in range(count)]
+
+
+def make_swaps(amounts: List[float], networks: int = 8, seed: int = 0) -> List[Swap | None]:
+    """
+    Binance & 1inch swaps of every amount on every network, like one 'compare_swaps_async' stage.
+
+    :param amounts: Swap amounts
+    :param networks: Number of 1inch networks
+    :param seed: Seed of the random prices
+    :return: List of swaps, failed quotes are None
+    """
+    rng = random.Random(seed)
+    names = [name for name in network_names if name != "BinanceCEX"][:networks]
+
+    swaps: list = []
+    for name in ["BinanceCEX"] + names:
+        for amount in amounts:
+            if rng.random() < 0.05:
+                swaps.append(None)
+                continue
+
+            cost = Cost(gas_amount=rng.randint(100000, 300000), gas_price=30 * 10 ** 9, usdt_cost=rng.uniform(0, 20))
+            swaps.append(Swap(name, network_names[name], cost, Token("USDT", amount, 6),
+                              Token("WETH", amount / 1500 * rng.uniform(0.99, 1.01), 18)))
+
+    return swaps
+
+
+def run_micro(depths: Tuple[int, ...] = BOOK_DEPTHS, amount_counts: Tuple[int, ...] = AMOUNT_COUNTS,
+              repeat: int = 5, min_time: float = 0.2) -> Dict[str, dict]:
+    """
+    Runs every micro-benchmark.
+
+    :param depths: Book depths to benchmark the Binance fill simulation at
+    :param amount_counts: Number of swap amounts per pair
+    :param repeat: Number of timed runs per benchmark
+    :param min_time: Minimum secs per timed run
+    :return: Results by benchmark name, in microseconds per call
+    """
+    results: Dict[str, dict] = {}
+
+    def add(name: str, func: Callable) -> None:
+        results[name] = result(round(measure(func, repeat, min_time) * 10 ** 6, 3), "us")
+        print(f"{name:<50} {results[name]['value']:>12,.3f} us")
+
+    for depth in depths:
+        book = make_book(depth)
+        # Alternating versions of the book rebuild its ladder on every call, like a fresh stream update
+        books = cycle([make_book(depth, update_id=i + 1, seed=i) for i in range(2)])
+
+        for count in amount_counts:
+            amounts = make_amounts(count)
+            eth_amounts = [amount / 1500 for amount in amounts]
+
+            add(f"trade_b_for_a[depth={depth},amounts={count}]",
+                lambda: trade_b_for_a("WETH", "USDT", amounts, book))
+            add(f"trade_a_for_b[depth={depth},amounts={count}]",
+                lambda: trade_a_for_b("WETH", "USDT", eth_amounts, book))
+            add(f"trade_b_for_a[depth={depth},amounts={count},new_book]",
+                lambda: trade_b_for_a("WETH", "USDT", amounts, next(books)))
+
+    for count in amount_counts:
+        amounts = make_amounts(count)
+        swaps = make_swaps(amounts)
+        add(f"max_swaps[networks=8,amounts={count}]", lambda: max_swaps(swaps, amounts))
+
+    # Synthetic token listed on every network, real ones are on a few at most
+    coins = generate_coins(tokens=1, networks=8, amounts=max(amount_counts), coverage=1)["coins"]
+    table = RouteTable()
+    routes = table.get(coins, "USDT", "SYN0000")
+    add("RouteTable.get[networks=8]", lambda: table.get(coins, "USDT", "SYN0000"))
+    add("RouteTable.get[networks=8,compile]", lambda: RouteTable().get(coins, "USDT", "SYN0000"))
+
+    for count in amount_counts:
+        amounts = make_amounts(count)
+        # Reverse routes priced at every best Base->Arb amount, like 'compare_swaps_async'
+        add(f"Route.with_amount[networks=8,amounts={count}]",
+            lambda: [route.with_amount(amount) for amount in amounts for route in routes.reverse])
+
+    cost = Cost(gas_amount=150000, gas_price=30 * 10 ** 9, usdt_cost=1.2)
+    add("Swap", lambda: Swap("Polygon", "137", cost, Token("USDT", 1000.0, 6), Token("WETH", 0.6, 18)))
+    add("Swap+Cost", lambda: Swap("Polygon", "137", Cost(150000, 30 * 10 ** 9, 1.2), Token("USDT", 1000.0, 6),
+                                  Token("WETH", 0.6, 18)))
+
+    return results
+
+
+if __name__ == "__main__":
+
+    quick = "--quick" in sys.argv
+    parameters = {"depths": BOOK_DEPTHS, "amount_counts": AMOUNT_COUNTS, "repeat": 3 if quick else 5,
+                  "min_time": 0.05 if quick else 0.2}
+
+    micro_results = run_micro(**parameters)
+    print(f"Results written to {save_results('micro', micro_results, parameters)}")
@@ -0,0 +1,100 @@
+"""
+Benchmark results saved as JSON, one file per run, and compared between runs, eg. before & after a commit:
+
+    python3 -m benchmarks.results benchmarks/results/micro-1a2b3c4-....json benchmarks/results/micro-5d6e7f8-....json
+"""
+import os
+import sys
+import json
+import platform
+import subprocess
+
+from datetime import datetime
+from typing import (
+    Dict,
+    List,
+)
+
+
+def result(value: float, unit: str, better: str = "lower") -> dict:
+    """
+    :param value: Measured value
+    :param unit: Unit of the value, eg. 'us'
+    :param better: 'lower' or 'higher', tells regressions from improvements
+    :return: Result dictionary
+    """
+    return {"value": value, "unit": unit, "better": better}
+
+
+def git_commit() -> str | None:
+    """Short hash of the checked out commit, None outside a git repository."""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_results(kind: str, results: Dict[str, dict], parameters: dict | None = None,
+                 directory: str = "benchmarks/results") -> str:
+    """
+    Writes results with the commit & machine they were measured on.
+
+    :param kind: Benchmark kind, eg. 'micro'
+    :param results: Results by benchmark name, see 'result'
+    :param parameters: Parameters the benchmark ran with
+    :param directory: Directory to write to
+    :return: Path of the written file
+    """
+    os.makedirs(directory, exist_ok=True)
+
+    commit = git_commit()
+    timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    path = os.path.join(directory, f"{kind}-{commit or 'nogit'}-{timestamp}.json")
+
+    with open(path, "w") as file:
+        json.dump({"kind": kind, "commit": commit, "time": datetime.now().astimezone().isoformat(),
+                   "python": platform.python_version(), "machine": platform.platform(),
+                   "cpus": os.cpu_count(), "parameters": parameters or {}, "results": results}, file, indent=2)
+
+    return path
+
+
+def compare_results(old: dict, new: dict, threshold: float = 0.1) -> List[str]:
+    """
+    Compares two saved runs benchmark by benchmark.
+
+    :param old: Saved run to compare against
+    :param new: Saved run to compare
+    :param threshold: Relative change flagged as a regression or improvement, eg. 0.1 for 10%
+    :return: One line per benchmark
+    """
+    lines = [f"{'benchmark':<50} {'old':>12} {'new':>12} {'change':>8}"]
+
+    for name, new_result in new["results"].items():
+        old_result = old["results"].get(name)
+        if not old_result or not old_result["value"] or new_result["value"] is None:
+            lines.append(f"{name:<50} {'-':>12} {new_result['value']!s:>12}")
+            continue
+
+        change = new_result["value"] / old_result["value"] - 1
+        worse = change > threshold if new_result["better"] == "lower" else change < -threshold
+        better = change < -threshold if new_result["better"] == "lower" else change > threshold
+        flag = " REGRESSION" if worse else " improved" if better else ""
+
+        lines.append(f"{name:<50} {old_result['value']:>12.4g} {new_result['value']:>12.4g} {change:>+8.1%}"
+                     f" {new_result['unit']}{flag}")
+
+    return lines
+
+
+if __name__ == "__main__":
+
+    if len(sys.argv) != 3:
+        sys.exit("Usage: python3 -m benchmarks.results <old_results.json> <new_results.json>\n")
+
+    with open(sys.argv[1]) as old_file, open(sys.argv[2]) as new_file:
+        old_run, new_run = json.load(old_file), json.load(new_file)
+
+    print(f"{old_run['commit']} -> {new_run['commit']}")
+    print("\n".join(compare_results(old_run, new_run)))
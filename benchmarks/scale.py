@@ -0,0 +1,139 @@
+"""
+Synthetic input data with hundreds of tokens, and a scaling report running the end-to-end benchmark
+at growing pair counts against a stand-in market generated for the same tokens.
+
+    python3 -m benchmarks.scale generate 200 > coins-200.json
+    python3 -m benchmarks.scale report '{"pair_counts": [10, 50, 100, 200], "duration": 120}'
+"""
+import sys
+import json
+import random
+
+from typing import (
+    Dict,
+    Tuple,
+)
+from tabulate import tabulate
+
+from src.projecthope.common.variables import network_names
+
+from benchmarks.e2e import run_e2e
+from benchmarks.results import (
+    result,
+    save_results,
+)
+
+
+# End-to-end results kept per pair count
+REPORTED = ("loops", "loop_seconds", "pair_seconds", "pair_queue_seconds", "quote_calls", "quote_calls_per_second",
+            "quote_errors", "book_age_seconds", "depth_frames_per_second", "screener_rss_mb", "screener_threads",
+            "screener_sockets", "screener_cpu_share", "total_rss_mb", "total_cpu_share")
+
+
+def generate_coins(tokens: int = 200, networks: int = 8, amounts: int = 3, base_token: str = "USDT",
+                   coverage: float = 0.6, seed: int = 0, settings: dict | None = None) -> dict:
+    """
+    Synthetic input data in the format of coins.json. Tokens are named SYN0000, SYN0001... so they never clash
+    with real Binance pairs, and are listed on a random subset of networks.
+
+    :param tokens: Number of Arb tokens, one pair each
+    :param networks: Number of networks, at most the 8 1inch networks the screener knows
+    :param amounts: Number of swap amounts per token, from 2,000 up by a factor of 4
+    :param base_token: Name of the Base token, listed on every network
+    :param coverage: Chance of a token being listed on each network, every token is on at least one
+    :param seed: Seed of the random listings & addresses
+    :param settings: Settings to use instead of the defaults, eg. {"max_concurrency": 50}
+    :return: Input data, as passed to 'main.py'
+    """
+    rng = random.Random(seed)
+    chains = [name for name in network_names if name != "BinanceCEX"][:networks]
+
+    def address() -> str:
+        return "0x" + "".join(rng.choice("0123456789abcdef") for _ in range(40))
+
+    coins = {base_token: {"networks": {chain: {"address": address(), "decimals": 6} for chain in chains}}}
+    for i in range(tokens):
+        listed = [chain for chain in chains if rng.random() < coverage] or [rng.choice(chains)]
+        coins[f"SYN{i:04}"] = {"swap_amount": [2000 * 4 ** j for j in range(amounts)], "min_arb": 50,
+                               "networks": {chain: {"address": address(), "decimals": rng.choice((6, 8, 18))}
+                                            for chain in listed}}
+
+    return {"settings": {"sleep_time": 10, "base_token": base_token, **(settings or {})}, "coins": coins}
+
+
+def scaling_report(pair_counts: Tuple[int, ...] = (10, 50, 100, 200), duration: float = 120, networks: int = 8,
+                   amounts: int = 3, latency: float = 0.2, error_rate: float = 0.02, settings: dict | None = None,
+                   stand_in_settings: dict | None = None) -> Dict[str, dict]:
+    """
+    Runs the end-to-end benchmark once per pair count.
+
+    :param pair_counts: Numbers of Base-Arb pairs to screen
+    :param duration: Secs to run the screener for at each pair count
+    :param networks: Number of networks, see 'generate_coins'
+    :param amounts: Number of swap amounts per token
+    :param latency: Mean 1inch quote latency of the stand-in in secs
+    :param error_rate: Share of 1inch quotes failing with HTTP 500
+    :param settings: Screener settings, see 'generate_coins'
+    :param stand_in_settings: StandIn settings, defaults to 100 levels per side to keep up with hundreds of streams
+    :return: Results by benchmark name & pair count, eg. 'loop_seconds[pairs=100]'
+    """
+    report: Dict[str, dict] = {}
+
+    for pairs in pair_counts:
+        info = generate_coins(pairs, networks, amounts, settings=settings)
+        print(f"Screening {pairs} pairs for {duration} secs...")
+
+        try:
+            measured = run_e2e(info, duration, latency, error_rate,
+                               stand_in_settings={"depth": 100, **(stand_in_settings or {})})
+        except Exception as e:
+            # Where the screener falls over is a result too
+            print(f"{pairs} pairs failed - {e}")
+            report[f"failed[pairs={pairs}]"] = result(1, "failed")
+            continue
+
+        for name in REPORTED:
+            report[f"{name}[pairs={pairs}]"] = measured[name]
+
+        loops = measured["loops"]["value"]
+        report[f"quote_calls_per_loop[pairs={pairs}]"] = result(measured["quote_calls"]["value"] / loops
+                                                                if loops else None, "calls")
+
+    return report
+
+
+def report_table(report: Dict[str, dict], pair_counts: Tuple[int, ...]) -> str:
+    """
+    :param report: 'scaling_report' results
+    :param pair_counts: Pair counts of the report
+    :return: Table with one row per pair count
+    """
+    names = REPORTED + ("quote_calls_per_loop", )
+    rows = []
+    for pairs in pair_counts:
+        if f"failed[pairs={pairs}]" in report:
+            rows.append([pairs] + ["failed"] * len(names))
+            continue
+
+        values = [report[f"{name}[pairs={pairs}]"]["value"] for name in names]
+        rows.append([pairs] + [round(value, 3) if isinstance(value, float) else value for value in values])
+
+    return tabulate(rows, headers=["pairs"] + list(names))
+
+
+if __name__ == "__main__":
+
+    if len(sys.argv) >= 3 and sys.argv[1] == "generate":
+        print(json.dumps(generate_coins(*[int(arg) for arg in sys.argv[2:4]]), indent=4))
+
+    elif len(sys.argv) in (2, 3) and sys.argv[1] == "report":
+        parameters: dict = json.loads(sys.argv[2]) if len(sys.argv) == 3 else {}
+        parameters["pair_counts"] = tuple(parameters.get("pair_counts", (10, 50, 100, 200)))
+
+        scale_results = scaling_report(**parameters)
+        print(report_table(scale_results, parameters["pair_counts"]))
+        print(f"Results written to {save_results('scale', scale_results, parameters)}")
+
+    else:
+        sys.exit("Usage: python3 -m benchmarks.scale generate <tokens> [<networks>]\n"
+                 "       python3 -m benchmarks.scale report [<report_settings>]\n")
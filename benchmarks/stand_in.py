@@ -0,0 +1,271 @@
+"""
+Local stand-ins for the 1inch quote API, Binance depth snapshots & WebSocket streams and the Telegram bot API,
+so the screener can run end to end without network access or API keys.
+Point the screener at it with the ONE_INCH_API, BINANCE_API, BINANCE_STREAM & TELEGRAM_API environment variables,
+see 'common.variables'.
+"""
+import math
+import json
+import time
+import random
+import asyncio
+import threading
+
+from collections import Counter
+from typing import (
+    Dict,
+    List,
+    Tuple,
+)
+from aiohttp import web
+
+from src.projecthope.common.variables import (
+    network_names,
+    base_tokens,
+)
+
+
+# Starting USDT prices of the native gas tokens streamed for fees, other tokens get a random price
+native_prices = {"ETH": 1500.0, "BNB": 300.0, "MATIC": 0.8, "AVAX": 15.0, "FTM": 0.3}
+
+
+class SyntheticBook:
+    """
+    Order book of one trading pair on a fixed price grid around a random walk mid price.
+    Each move returns the changed levels only, like a Binance diff-depth event.
+    """
+
+    def __init__(self, symbol: str, price: float, depth: int, rng: random.Random):
+        """
+        :param symbol: Trading pair, eg. 'ETHUSDT'
+        :param price: Starting mid price
+        :param depth: Levels per side
+        :param rng: Random number generator
+        """
+        self.symbol = symbol
+        self.mid = price
+        self.depth = depth
+        self.tick = 10 ** (math.floor(math.log10(price)) - 4)
+        self.update_id = 1
+
+        self._rng = rng
+        self.bids: Dict[float, float] = {}
+        self.asks: Dict[float, float] = {}
+        self.move(0, 0)
+
+    def _grid(self) -> Tuple[List[float], List[float]]:
+        best_bid = math.floor(self.mid / self.tick)
+        bids = [round((best_bid - i) * self.tick, 10) for i in range(self.depth)]
+        asks = [round((best_bid + 1 + i) * self.tick, 10) for i in range(self.depth)]
+
+        return bids, asks
+
+    def _quantity(self, price: float) -> float:
+        # Roughly the same notional on every level
+        return round(self._rng.uniform(100, 5000) / price, 6)
+
+    def move(self, volatility: float, changes: int) -> Tuple[List[list], List[list]]:
+        """
+        Moves the mid price and changes the quantity of some levels.
+
+        :param volatility: Standard deviation of the relative mid price move
+        :param changes: Number of levels per side given a new quantity
+        :return: Changed bid & ask levels as [[price, quantity], ...], a quantity of 0 removes the level
+        """
+        self.mid *= 1 + self._rng.gauss(0, volatility)
+        bid_prices, ask_prices = self._grid()
+
+        diffs = []
+        for side, prices in ((self.bids, bid_prices), (self.asks, ask_prices)):
+            on_grid = set(prices)
+            changed = {price: 0.0 for price in side if price not in on_grid}
+            for price in prices:
+                if price not in side:
+                    changed[price] = self._quantity(price)
+            for price in self._rng.sample(prices, min(changes, len(prices))):
+                changed.setdefault(price, self._quantity(price))
+
+            for price, quantity in changed.items():
+                if quantity:
+                    side[price] = quantity
+                else:
+                    side.pop(price, None)
+            diffs.append([[str(price), str(quantity)] for price, quantity in changed.items()])
+
+        self.update_id += 1
+
+        return diffs[0], diffs[1]
+
+    def snapshot(self) -> dict:
+        """Depth snapshot in the format of Binance '/api/v3/depth'."""
+        return {"lastUpdateId": self.update_id,
+                "bids": [[str(price), str(self.bids[price])] for price in sorted(self.bids, reverse=True)],
+                "asks": [[str(price), str(self.asks[price])] for price in sorted(self.asks)]}
+
+
+class StandIn:
+    """
+    aiohttp server imitating the APIs the screener talks to, serving prices from one synthetic market:
+    1inch quotes are priced off the Binance mid prices with a random spread, so arbitrage shows up now and then.
+    """
+
+    def __init__(self, coins: dict, base_token: str = "USDT", latency: float = 0.2, error_rate: float = 0.02,
+                 depth: int = 500, frame_interval: float = 0.1, volatility: float = 0.0002,
+                 dex_spread: float = 0.003, seed: int = 0):
+        """
+        :param coins: 'coins' of the screener's input data
+        :param base_token: Name of the Base token pairs are quoted in
+        :param latency: Mean 1inch quote latency in secs, exponentially distributed
+        :param error_rate: Share of 1inch quotes answered with HTTP 500
+        :param depth: Book levels per side
+        :param frame_interval: Secs between two depth frames of a stream
+        :param volatility: Standard deviation of a mid price move per frame
+        :param dex_spread: Standard deviation of 1inch prices around the Binance mid price
+        :param seed: Seed of the synthetic market
+        """
+        self.base_token = base_token
+        self.latency = latency
+        self.error_rate = error_rate
+        self.depth = depth
+        self.frame_interval = frame_interval
+        self.volatility = volatility
+        self.dex_spread = dex_spread
+
+        self.rng = random.Random(seed)
+        self.books: Dict[str, SyntheticBook] = {}
+        self.counts: Counter = Counter()
+        self.messages: List[str] = []
+
+        # Token name & decimals by network id & lowercase address, as 1inch is queried by address
+        self.tokens: Dict[Tuple[str, str], Tuple[str, int]] = {}
+        for name, coin in coins.items():
+            for network, token in coin["networks"].items():
+                self.tokens[(network_names[network], token["address"].lower())] = (name, int(token["decimals"]))
+
+        self.url: str | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+        self._runner: web.AppRunner | None = None
+
+    def book(self, symbol: str) -> SyntheticBook:
+        """Book of a trading pair, created on first use."""
+        book = self.books.get(symbol)
+        if book is None:
+            token = symbol[:-len(self.base_token)]
+            price = native_prices.get(token) or math.exp(self.rng.uniform(math.log(0.05), math.log(5000)))
+            book = self.books[symbol] = SyntheticBook(symbol, price, self.depth, self.rng)
+
+        return book
+
+    def price(self, token: str) -> float:
+        """Mid price of a token in the Base token."""
+        if token in base_tokens:
+            return 1.0
+
+        return self.book(f"{token}{self.base_token}").mid
+
+    async def quote(self, request: web.Request) -> web.Response:
+        """GET /v4.0/{chain}/quote"""
+        self.counts["quotes"] += 1
+        await asyncio.sleep(self.rng.expovariate(1 / self.latency) if self.latency else 0)
+
+        if self.rng.random() < self.error_rate:
+            self.counts["quote_errors"] += 1
+            return web.json_response({"statusCode": 500, "error": "Internal Server Error"}, status=500)
+
+        network_id = request.match_info["chain"]
+        params = request.query
+        from_token = self.tokens.get((network_id, params["fromTokenAddress"].lower()))
+        to_token = self.tokens.get((network_id, params["toTokenAddress"].lower()))
+        if not from_token or not to_token:
+            return web.json_response({"statusCode": 400, "error": "cannot estimate"}, status=400)
+
+        amount = int(params["amount"]) / 10 ** from_token[1]
+        amount_out = amount * self.price(from_token[0]) / self.price(to_token[0]) * \
+            (1 - 0.003 + self.rng.gauss(0, self.dex_spread))
+
+        return web.json_response({"toTokenAmount": str(int(amount_out * 10 ** to_token[1])),
+                                  "estimatedGas": self.rng.randint(120000, 300000)})
+
+    async def depth_snapshot(self, request: web.Request) -> web.Response:
+        """GET /api/v3/depth"""
+        self.counts["snapshots"] += 1
+
+        return web.json_response(self.book(request.query["symbol"].upper()).snapshot())
+
+    async def stream(self, request: web.Request) -> web.WebSocketResponse:
+        """GET /stream?streams=ethusdt@depth@100ms/... as a WebSocket publishing diff-depth frames."""
+        socket = web.WebSocketResponse()
+        await socket.prepare(request)
+        self.counts["streams"] += 1
+
+        streams = request.query["streams"].split("/")
+        try:
+            while not socket.closed:
+                for stream in streams:
+                    book = self.book(stream.split("@")[0].upper())
+                    first = book.update_id + 1
+                    bids, asks = book.move(self.volatility, 5)
+                    data = {"e": "depthUpdate", "E": int(time.time() * 1000), "s": book.symbol,
+                            "U": first, "u": book.update_id, "b": bids, "a": asks}
+                    await socket.send_str(json.dumps({"stream": stream, "data": data}))
+                    self.counts["frames"] += 1
+
+                await asyncio.sleep(self.frame_interval)
+
+        except ConnectionResetError:
+            pass
+
+        return socket
+
+    async def telegram(self, request: web.Request) -> web.Response:
+        """POST /bot{token}/sendMessage"""
+        data = await request.post()
+        self.counts["telegram_messages"] += 1
+        self.messages.append(data.get("text", ""))
+
+        return web.json_response({"ok": True, "result": {}})
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.add_routes([web.get("/v4.0/{chain}/quote", self.quote),
+                        web.get("/api/v3/depth", self.depth_snapshot),
+                        web.get("/stream", self.stream),
+                        web.post("/bot{token}/sendMessage", self.telegram)])
+
+        return app
+
+    def start(self, host: str = "127.0.0.1", port: int = 8765) -> str:
+        """
+        Serves the stand-in from a background thread.
+
+        :param host: Host to listen on
+        :param port: Port to listen on
+        :return: Base url, eg. 'http://127.0.0.1:8765'
+        """
+        self._loop = asyncio.new_event_loop()
+        self._runner = web.AppRunner(self.app())
+        self._loop.run_until_complete(self._runner.setup())
+        self._loop.run_until_complete(web.TCPSite(self._runner, host, port).start())
+
+        self._thread = threading.Thread(target=self._loop.run_forever, name="stand-in", daemon=True)
+        self._thread.start()
+
+        self.url = f"http://{host}:{port}"
+        return self.url
+
+    def environment(self) -> Dict[str, str]:
+        """Environment variables pointing the screener at this stand-in, see 'common.variables'."""
+        return {"ONE_INCH_API": self.url, "BINANCE_API": self.url, "BINANCE_STREAM": self.url.replace("http", "ws"),
+                "TELEGRAM_API": self.url, "TOKEN": "stand-in", "CHAT_ID_ALERTS": "alerts", "CHAT_ID_DEBUG": "debug"}
+
+    def stop(self) -> None:
+        """Stops serving."""
+        if self._loop is None:
+            return
+
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result(10)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=10)
+        self._loop.close()
+        self._loop = None
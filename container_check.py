@@ -1,10 +1,10 @@
 """
 Program that constantly checks if a docker container is running.
-It checks the Loop timestamps and notifies vie Telegram if the last timestamp was older than 15 mins.
+It reads the screener's heartbeat file and notifies vie Telegram if the last loop was more than 5 mins ago.
 """
 import os
-import re
 import sys
+import json
 import time
 import datetime
 import requests
@@ -45,8 +45,27 @@ def telegram_send_message(message_text: str, teleg_chat_id: str,
         return None
 
 
-if len(sys.argv) != 2:
-    sys.exit(f"Usage: python3 {os.path.basename(__file__)} <container_name>\n")
+def read_heartbeat(container: str, path: str | None) -> dict | None:
+    """
+    Reads the screener's health record, from a mounted file if given, otherwise from inside the container.
+
+    :param container: Container name
+    :param path: Path of the heartbeat file on this host, eg. a mounted volume
+    :return: Health record, None if missing or not readable
+    """
+    try:
+        if path:
+            with open(path) as file:
+                return json.load(file)
+
+        return json.loads(os.popen(f"docker exec {container} cat {heartbeat_path}").read())
+
+    except (OSError, ValueError):
+        return None
+
+
+if len(sys.argv) not in (2, 3):
+    sys.exit(f"Usage: python3 {os.path.basename(__file__)} <container_name> [heartbeat_file]\n")
 
 
 env_text = os.popen("cat .env").read()
@@ -63,48 +82,40 @@ token = env_vals['TOKEN']
 
 current_dir = os.getcwd()
 time_format = "%Y-%m-%d %H:%M:%S, %Z"
-time_format_regex = re.compile(r"\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}, [A-Za-z]*")
+heartbeat_path = "/projecthope/logs/heartbeat.json"  # Inside the container
 program_name = os.path.abspath(os.path.basename(__file__))
 program_start_time = datetime.datetime.now()
 
-container_name = sys.argv[-1]
+container_name = sys.argv[1]
+heartbeat_file = sys.argv[2] if len(sys.argv) == 3 else None
 register(telegram_send_message, f"⚠️ <b>{container_name.upper()}: container_check.py</b> stopped!",
          chat_id_debug, token)
 
-wait_time = 5 * 60  # 5 mins (5 * 60 secs) sleep time in each loop
-max_time_diff = 5 * 60  # 5 mins max difference(in secs) between current and script's last timestamp
+wait_time = 10  # 10 secs sleep time in each loop, reading the heartbeat is cheap
+max_time_diff = 5 * 60  # 5 mins max difference(in secs) between current and script's last heartbeat
+start_time = 15 * 60  # 15 mins for the script to write its first heartbeat
 update_time = 12  # 12 hour check 'OK' message to Telegram to notify container_check is still running
 
-# Sleep before starting the script - 15 mins
-time.sleep(15 * 60)
-
 
 while True:
-    # Get timestamp of last execution loop
-    command = f"docker logs {container_name} | tail -n 50"
-    output = os.popen(command).read()
-
-    # Find last Loop timestamp
-    time_str = time_format_regex.findall(output)[-1]
-
-    # Construct date_time object from string
-    script_time = datetime.datetime.strptime(time_str, time_format)
-
+    heartbeat = read_heartbeat(container_name, heartbeat_file)
     now_time = datetime.datetime.now()
 
-    # Calculate time difference in seconds
-    time_diff = (now_time - script_time).seconds
-
-    # Calculate last loop execution time
-    temp = re.split(r"[ ]?sec[s]?", output)[0]
-    loop_time = float(re.split(r" ", temp)[-1])
+    if heartbeat:
+        # Calculate time difference in seconds
+        time_diff = time.time() - heartbeat['time']
+        loop_time = heartbeat.get('loop_time', 0)
+    else:
+        time_diff = (now_time - program_start_time).total_seconds() - start_time
+        loop_time = 0
 
     # Alert if container has stopped or is lagging behind
     if time_diff > max_time_diff:
 
         timestamp = datetime.datetime.now().astimezone().strftime(time_format)
+        last_beat = heartbeat['timestamp'] if heartbeat else "never"
         message = f"<b>⚠️ {container_name.upper()}</b> - {timestamp}\n" \
-                  f"<b>{program_name}</b> stopped!\n Last loop time: {loop_time:,.2f} secs.\n"
+                  f"<b>{program_name}</b> stopped!\n Last loop: {last_beat}, loop time: {loop_time:,.2f} secs.\n"
 
         # Send Telegram message in Alerts and Debug Chat and Break
         telegram_send_message(message, teleg_chat_id=chat_id_alerts, teleg_token=token)
@@ -114,10 +125,15 @@ while True:
 
     # Alert every 12hours if the script is still running
     if now_time - program_start_time > datetime.timedelta(hours=update_time):
+        networks = heartbeat.get('networks', {}) if heartbeat else {}
+        down = [network_id for network_id, health in networks.items() if health.get('open')]
         message = f"✅ {container_name.upper()}. Last loop time: {loop_time:,.2f} secs."
+        if down:
+            message += f" Networks down: {', '.join(down)}."
 
         # Send Telegram message in Debug Chat
         telegram_send_message(message, teleg_chat_id=chat_id_debug, teleg_token=token)
         program_start_time = datetime.datetime.now()
+        start_time = 0
 
     time.sleep(wait_time)
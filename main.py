@@ -1,6 +1,7 @@
 import os
 import sys
 import json
+import asyncio
 
 from atexit import register
 from datetime import datetime
@@ -8,64 +9,199 @@ from time import (
     sleep,
     perf_counter,
 )
-from multiprocessing import Process
-from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import (
+    Event,
+    Queue,
+    Process,
+)
 
-from src.projecthope.compare import alert_arb
-from src.projecthope.one_inch.api import get_swapout
-from src.projecthope.binance.api import start_binance_streams
+from src.projecthope.screener import (
+    screen_pairs,
+    PairTrigger,
+)
+from src.projecthope.scheduler import PairScheduler
+from src.projecthope.one_inch.api import (
+    contract,
+    get_swapout,
+)
+from src.projecthope.one_inch.client import quote_client
+from src.projecthope.one_inch.routes import route_table
+from src.projecthope.one_inch.limiter import rate_limiter
+from src.projecthope.one_inch.health import network_health
+from src.projecthope.blockchain.costs import chain_costs
+from src.projecthope.binance.shm import SharedBookStore
+from src.projecthope.binance.api import (
+    start_binance_streams,
+    use_book_store,
+)
 
+from src.projecthope.common.logger import configure_logging
+from src.projecthope.common.metrics import metrics
+from src.projecthope.common.heartbeat import heartbeat
+from src.projecthope.common.recorder import quote_recorder
+from src.projecthope.common.tracing import tracer
+from src.projecthope.common.profiler import profiler
 from src.projecthope.common.exceptions import exit_handler
 from src.projecthope.common.helpers import print_start_message
 from src.projecthope.common.message import telegram_send_message
-from src.projecthope.common.logger import log_error
+from src.projecthope.common.outbox import alert_outbox
 from src.projecthope.common.variables import (
     time_format,
     base_tokens,
+    fee_symbols,
 )
 
 
-def arb_screener(args: list, time_to_sleep: int) -> None:
+async def arb_screener_async(args: list, time_to_sleep: int, max_concurrency: int = 20,
+                             changes: "Queue | None" = None, debounce: float = 0.25,
+                             scheduler: PairScheduler | None = None) -> None:
     """
-    Main function that constantly screens for arbitrage between 1inch and binance trading pairs.
+    Screening loop, runs every pair concurrently on 'quote_client' event loop.
+    If 'changes' is given, pairs are also screened as soon as their Binance order book moves.
+    If 'scheduler' is given, each loop only screens the pairs it picks within its 1inch call budget.
 
     :param args: Arguments list to pass
     :param time_to_sleep: While loop sleep time
+    :param max_concurrency: Maximum number of pairs screened at once
+    :param changes: Queue of trading pairs whose book moved, published by the Binance stream process
+    :param debounce: Secs to wait for further book changes before screening a pair
+    :param scheduler: Picks the pairs to screen in each loop
     """
+    quote_cache = get_swapout.cache
+    semaphore = asyncio.Semaphore(max_concurrency)
+    alert_outbox.start()
+
+    trigger = None
+    listener = None
+    if changes is not None:
+        trigger = PairTrigger(args, semaphore, debounce)
+        listener = asyncio.create_task(trigger.listen(changes))  # Keep a reference for the life of the loop
+
     loop_counter = 1
     total_calls = 0
-    while True:
-        start = perf_counter()
+    total_hits = 0
+    total_triggered = 0
+    loop_duration = metrics.histogram("loop_duration_seconds", "Duration of a full screening loop, without sleep",
+                                      buckets=(1, 2.5, 5, 10, 20, 30, 60, 120))
+    try:
+        while True:
+            start = perf_counter()
+
+            with tracer.root("loop", loop=loop_counter):
+                loop_args = await scheduler.select() if scheduler else args
+                results = await screen_pairs(loop_args, semaphore=semaphore)
+            if scheduler:
+                scheduler.record(loop_args, results)
+            loop_time = perf_counter() - start
+            loop_duration.observe(loop_time)
 
-        with ThreadPoolExecutor(max_workers=len(args)) as executor:
-            arbs = executor.map(lambda p: alert_arb(*p), args, timeout=10)
+            # Health record read by container_check.py
+            heartbeat.beat(loop=loop_counter, loop_time=round(loop_time, 3), pairs=len(loop_args),
+                           failed_pairs=sum(1 for result in results if result is None), **heartbeat.collect())
 
-        for arb in arbs:
-            if not arb:
-                log_error.warning(f"'alert_arb' Error - {arb[0]} -> {arb[1]}")
+            await asyncio.sleep(time_to_sleep)
 
-        sleep(time_to_sleep)
+            cache_hits = quote_cache.hits + quote_cache.coalesced
+            time_stamp = datetime.now().astimezone().strftime(time_format)
+            message = f"{time_stamp}: Loop {loop_counter} executed in {(perf_counter() - start):,.2f} secs. " \
+                      f"1inch API calls: {quote_cache.misses - total_calls}, cache hits: {cache_hits - total_hits}"
+            if scheduler:
+                message += f", pairs screened: {len(loop_args)}/{len(args)}"
+            if trigger:
+                message += f", triggered screenings: {trigger.triggered - total_triggered}"
+                total_triggered = trigger.triggered
+            print(message)
 
-        time_stamp = datetime.now().astimezone().strftime(time_format)
-        print(f"{time_stamp}: Loop {loop_counter} executed in {(perf_counter() - start):,.2f} secs. "
-              f"1inch API calls: {abs(total_calls - get_swapout.calls)}")
+            total_calls = quote_cache.misses
+            total_hits = cache_hits
+            loop_counter += 1
+    finally:
+        # Its queue poll returns within a sec once cancelled, leaving no worker thread behind
+        if listener:
+            listener.cancel()
+        alert_outbox.stop()
 
-        total_calls = get_swapout.calls
-        loop_counter += 1
+
+def arb_screener(args: list, settings: dict, store: SharedBookStore | None = None,
+                 changes: "Queue | None" = None, profile: bool = False) -> None:
+    """
+    Main function that constantly screens for arbitrage between 1inch and binance trading pairs.
+
+    :param args: Arguments list to pass
+    :param settings: Settings from the input file, eg. {"sleep_time": 10, "base_token": "USDT"}
+    :param store: Shared memory book store to read from. If None reads from memcache
+    :param changes: Queue of trading pairs whose book moved. If None pairs are only screened every loop
+    :param profile: If True samples stacks from the start, otherwise only once toggled with SIGUSR2
+    """
+    if store:
+        use_book_store(store)
+
+    configure_logging(**settings.get("logging", {}))
+    heartbeat.configure(**settings.get("heartbeat", {}))
+    if "recorder" in settings:
+        # 'book_depth' is for the stream process
+        quote_recorder.configure(**{key: value for key, value in settings["recorder"].items() if key != "book_depth"})
+        quote_recorder.start()
+    if "metrics" in settings:
+        metrics.add_route("/health", heartbeat.to_json)
+        metrics.serve(**settings["metrics"])
+    if "tracing" in settings:
+        tracer.configure(**settings["tracing"])
+
+    # 'kill -USR2 <pid>' starts sampling, a second one writes collapsed stacks to ./logs
+    profiler.install_signal()
+    if profile:
+        profiler.start()
+    route_table.build(args)
+    get_swapout.cache.configure(ttl=settings.get("quote_ttl", 5))
+    rate_limiter.configure(**settings.get("rate_limit", {}))
+    network_health.configure(**settings.get("network_health", {}))
+    alert_outbox.configure(**settings.get("alerts", {}))
+
+    # Keep gas prices up to date in the background
+    contract.gas_oracle.configure(**settings.get("gas_oracle", {}))
+    chain_costs.configure(**settings.get("chain_costs", {}))
+    chain_costs.start()
+
+    scheduler = None
+    if "scheduler" in settings:
+        scheduler = PairScheduler(args, **settings["scheduler"])
+
+    try:
+        if changes is not None:
+            # Book changes trigger screenings, full loops only catch up on the rest
+            reactive = settings["reactive"]
+            coro = arb_screener_async(args, reactive.get("sweep_interval", 60), settings.get("max_concurrency", 20),
+                                      changes, reactive.get("debounce", 0.25), scheduler)
+        else:
+            coro = arb_screener_async(args, settings["sleep_time"], settings.get("max_concurrency", 20),
+                                      scheduler=scheduler)
+
+        quote_client.run(coro)
+    finally:
+        quote_recorder.stop()
+        profiler.stop()
+        chain_costs.stop()
+        quote_client.close()
 
 
 if __name__ == "__main__":
 
-    if len(sys.argv) != 2:
-        sys.exit(f"Usage: python3 {os.path.basename(__file__)} <input_file>\n")
+    # Optionally profile the screener from the start
+    profile_screener = "--profile" in sys.argv
+    argv = [arg for arg in sys.argv if arg != "--profile"]
+
+    if len(argv) != 2:
+        sys.exit(f"Usage: python3 {os.path.basename(__file__)} [--profile] <input_file>\n")
 
     # Send telegram debug message if program terminates
     program_name = os.path.abspath(os.path.basename(__file__))
     register(exit_handler, program_name)
 
     # Fetch variables
-    info: dict = json.loads(sys.argv[-1])
-    sleep_time, base_token = info["settings"].values()
+    info: dict = json.loads(argv[-1])
+    base_token = info["settings"]["base_token"]
+    book_transport = info["settings"].get("book_transport", "memcache")
 
     timestamp = datetime.now().astimezone().strftime(time_format)
     print_start_message(info, base_token, timestamp)
@@ -79,8 +215,26 @@ if __name__ == "__main__":
     # Create all Base-Arbitrage token pairs
     arguments = [[info, base_token, arb_token] for arb_token in arb_tokens]
 
-    binance_stream = Process(target=start_binance_streams, args=(trading_pairs, ))
-    main_screener = Process(target=arb_screener, args=(arguments, sleep_time, ))
+    # Optionally pass order books through shared memory instead of memcached
+    book_store = None
+    if book_transport == "shm":
+        book_store = SharedBookStore(trading_pairs + [symbol for symbol in fee_symbols if symbol not in trading_pairs],
+                                     create=True)
+        register(book_store.close)
+
+    # Optionally screen pairs as soon as their order book moves
+    reactive = info["settings"].get("reactive")
+    book_changes = Queue(maxsize=1000) if reactive else None
+
+    # Optionally record every book update & quote for tuning
+    recorder = info["settings"].get("recorder")
+
+    stream_stop = Event()
+    # Process names also name their log files, eg. logs/error-screener.log
+    binance_stream = Process(target=start_binance_streams, name="binance-stream",
+                             args=(trading_pairs, False, book_store, book_changes, reactive, recorder, stream_stop, ))
+    main_screener = Process(target=arb_screener, name="screener",
+                            args=(arguments, info["settings"], book_store, book_changes, profile_screener, ))
 
     binance_stream.start()  # Start Process 1 - Binance WebSocket streams
     sleep(3)  # Wait initially for WebSocket handshake
@@ -88,6 +242,15 @@ if __name__ == "__main__":
 
     while True:
         sleep(86395)  # Restart every 23:55 hours and restart binance stream
-        binance_stream.terminate()
-        binance_stream = Process(target=start_binance_streams, args=(trading_pairs,))
+
+        # Let the stream exit by itself, killing it mid-put could leave the shared changes queue locked
+        stream_stop.set()
+        binance_stream.join(timeout=30)
+        if binance_stream.is_alive():
+            binance_stream.terminate()
+
+        stream_stop = Event()
+        binance_stream = Process(target=start_binance_streams, name="binance-stream",
+                                 args=(trading_pairs, False, book_store, book_changes, reactive, recorder,
+                                       stream_stop, ))
         binance_stream.start()
\ No newline at end of file
@@ -1,37 +1,120 @@
-import ast
 import ssl
+import sys
 import json
+import signal
+import time
+import asyncio
+import threading
 from typing import List
-
-from requests.exceptions import ReadTimeout
+from collections import deque
+from multiprocessing.queues import Queue
+from multiprocessing.synchronize import Event
+from concurrent.futures import ThreadPoolExecutor
+
+from pymemcache.client.base import PooledClient
+from requests.exceptions import (
+    ConnectionError,
+    ReadTimeout,
+)
 from websocket import WebSocketApp
 
 from src.projecthope.datatypes import (
+    Cost,
     Token,
     Swap,
 )
+from src.projecthope.binance.trigger import BookChangeDetector
+from src.projecthope.binance.codec import (
+    encode_book,
+    decode_book,
+)
+from src.projecthope.binance.fills import get_ladder
+from src.projecthope.binance.shm import SharedBookStore
+from src.projecthope.binance.orderbook import (
+    OrderBook,
+    OrderBookGapError,
+)
 from src.projecthope.common.logger import log_error
+from src.projecthope.common.decorators import traced
+from src.projecthope.common.recorder import book_recorder
 from src.projecthope.common.variables import (
+    BINANCE_API,
+    BINANCE_STREAM,
     network_names,
     memcache,
     http_session,
+    fee_symbols,
 )
 
 
+# Order book transport shared by the stream & screener processes. Memcache unless replaced by 'use_book_store'
+# Any object with the same 'get'/'set' calls can be used, eg. 'replay.RecordedBooks'
+book_store: PooledClient | SharedBookStore = memcache
+
+
+def use_book_store(store: PooledClient | SharedBookStore) -> None:
+    """
+    Sets the transport order books are published to and read from in this process.
+
+    :param store: Memcache client, SharedBookStore or any store with the same 'get'/'set' calls
+    """
+    global book_store
+    book_store = store
+
+
+def get_order_book(symbol: str) -> bytes | None:
+    """
+    Get the latest encoded order book for a trading pair.
+
+    :param symbol: Trading pair, eg. 'ETHUSDT'
+    :return: Encoded order book bytes, see 'binance.codec'
+    """
+    return book_store.get(key=symbol, default=None)
+
+
+async def get_order_book_async(symbol: str) -> bytes | None:
+    """
+    Get the latest encoded order book for a trading pair without blocking the event loop.
+    Memcache reads run in a worker thread, other stores, eg. shared memory, are read directly.
+
+    :param symbol: Trading pair, eg. 'ETHUSDT'
+    :return: Encoded order book bytes, see 'binance.codec'
+    """
+    if isinstance(book_store, PooledClient):
+        return await asyncio.to_thread(book_store.get, key=symbol, default=None)
+
+    return book_store.get(key=symbol, default=None)
+
+
 class BinanceDepthSocket:
 
-    def __init__(self, symbols: List[str], level: int = 20, update_speed: int = 1000, debug: bool = False):
+    def __init__(self, symbols: List[str], update_speed: int = 100, depth: int = 500, debug: bool = False,
+                 detector: BookChangeDetector | None = None):
         """
         :param symbols: List of trading pairs, eg. ['ETHUSDT', 'CVXUSDT']
-        :param level: Binance socket depth level, eg. 5, 10, 20
-        :param update_speed: Real time update speed, 1000ms or 100ms
+        :param update_speed: Diff-depth update speed, 1000ms or 100ms
+        :param depth: Number of levels per side to publish from each local order book
+        :param debug: If True will print to terminal websocket output
+        :param detector: Notifies the screener of pairs whose book moved. If None the screener is not notified
         """
-        symbols.append('ETHUSDT')  # Add ETHUSDT to query the price of ETH/USD for fee calculation
-        self.symbols = [f"{symbol.lower()}@depth{level}@{update_speed}ms" for symbol in symbols]
-        self._last_update_id = {symbol.upper(): 0 for symbol in symbols}
+        # Add native gas token pairs, eg. ETHUSDT, to price network fees
+        symbols = symbols + [symbol for symbol in fee_symbols if symbol not in symbols]
+        self.symbols = [f"{symbol.lower()}@depth@{update_speed}ms" for symbol in symbols]
         self.debug = debug
+        self.detector = detector
+
+        # Shared memory slots have a fixed size, publish only as many levels as fit
+        if isinstance(book_store, SharedBookStore):
+            depth = min(depth, book_store.max_depth)
+        self.depth = depth
 
-        self.url = f"wss://stream.binance.com:9443/stream?streams={'/'.join(self.symbols)}"
+        # Local order book per trading pair, diff events buffered while waiting for a snapshot
+        self.books = {symbol.upper(): OrderBook(symbol) for symbol in symbols}
+        self._buffers = {symbol.upper(): deque(maxlen=1000) for symbol in symbols}
+        self._snapshots = {symbol.upper(): None for symbol in symbols}
+        self._executor = ThreadPoolExecutor(max_workers=4)
+
+        self.url = f"{BINANCE_STREAM}/stream?streams={'/'.join(self.symbols)}"
         self.socket = WebSocketApp(self.url, on_open=self.on_open, on_message=self.on_message,
                                    on_error=self.on_error, on_close=self.on_close)
 
@@ -45,10 +128,10 @@ class BinanceDepthSocket:
         :param timeout: Maximum wait time for request
         :returns: Dictionary of response data
         """
-        url = f"https://api.binance.us/api/v3/depth?symbol={trading_symbol.upper()}&limit={limit}"
+        url = f"{BINANCE_API}/api/v3/depth?symbol={trading_symbol.upper()}&limit={limit}"
         try:
             response = http_session.get(url, timeout=timeout)
-        except ConnectionError or ReadTimeout as e:
+        except (ConnectionError, ReadTimeout) as e:
             log_error.warning(f"'ConnectionError' {url} - {e}")
             return None
 
@@ -89,28 +172,102 @@ class BinanceDepthSocket:
 
     def on_message(self, socket, message):
         """WebSocket on_message method handler."""
-        data = ast.literal_eval(message)  # Convert data into a dict
+        data = json.loads(message)  # Convert data into a dict
         try:
             stream_name: str = data['stream'].split('@')[0].upper()  # Get the trading pair part only, eg. 'ETHUSDT'
             stream_data = data['data']
-            update_id = data['data']['lastUpdateId']
 
             if self.debug:
                 print(stream_data)
 
-            if update_id >= self._last_update_id[stream_name]:
-                memcache.set(key=stream_name, value=stream_data, expire=20)
+            book = self.books[stream_name]
+
+            if book.synced:
+                try:
+                    book.apply_event(stream_data)
+                except OrderBookGapError as e:
+                    log_error.warning(f"Order book out of sync, resyncing - {e}")
+                    self.resync(stream_name, stream_data)
+                    return
+            else:
+                self._buffers[stream_name].append(stream_data)
+                if not self._sync_from_snapshot(stream_name):
+                    return
+
+            bids, asks = book.top(self.depth)
+            book_store.set(key=stream_name, value=encode_book(book.last_update_id, book.event_time, bids, asks),
+                           expire=20)
 
-            self._last_update_id[stream_name] = update_id  # Save last id for each stream in dict
+            if self.detector:
+                self.detector.update(stream_name, bids, asks)
+
+            book_recorder.record(time.time(), book.event_time, book.last_update_id, stream_name, bids, asks)
 
         except Exception as e:
             log_error.warning(f"Error getting data from websocket stream - {socket} - {e}")
 
+    def resync(self, symbol: str, event: dict | None = None) -> None:
+        """
+        Discards a local order book and requests a fresh REST snapshot for it.
+
+        :param symbol: Trading pair, eg. 'ETHUSDT'
+        :param event: Diff event to buffer until the snapshot arrives
+        """
+        self.books[symbol].reset()
+        self._buffers[symbol].clear()
+        if event:
+            self._buffers[symbol].append(event)
+
+        self._snapshots[symbol] = self._executor.submit(self.get_pair_depth, symbol)
+
+    def _sync_from_snapshot(self, symbol: str) -> bool:
+        """
+        Applies a REST snapshot and buffered diff events to an unsynced book once the snapshot has arrived.
+
+        :param symbol: Trading pair, eg. 'ETHUSDT'
+        :return: True if the book is now synced
+        """
+        future = self._snapshots[symbol]
+
+        # Request a snapshot only after the first diff event has been buffered
+        if future is None:
+            self._snapshots[symbol] = self._executor.submit(self.get_pair_depth, symbol)
+            return False
+
+        if not future.done():
+            return False
+
+        snapshot = future.result()
+        if not snapshot:
+            # Request failed, try again with the next event
+            self._snapshots[symbol] = self._executor.submit(self.get_pair_depth, symbol)
+            return False
+
+        buffer = self._buffers[symbol]
+        try:
+            self.books[symbol].apply_snapshot(snapshot, list(buffer))
+        except OrderBookGapError as e:
+            # Snapshot is older than buffered events, get a newer one
+            log_error.warning(f"Order book snapshot out of date, refetching - {e}")
+            self.books[symbol].reset()
+            self._snapshots[symbol] = self._executor.submit(self.get_pair_depth, symbol)
+            return False
+
+        buffer.clear()
+        self._snapshots[symbol] = None
+
+        return True
+
     def run_forever(self):
         """Start screening for messages from websocket and handle with on_message method"""
         self.socket.run_forever(sslopt={"cert_reqs": ssl.CERT_NONE})
 
+    def close(self):
+        """Closes the websocket, 'run_forever' returns once the message being handled is done."""
+        self.socket.close()
+
 
+@traced
 def trade_b_for_a(token_a: str, token_b: str, b_amounts: list, order_book: bytes) -> List[Swap]:
     """
     Given pair 'AB', by selling amount 'B', calculate the received amount of 'A'
@@ -119,15 +276,16 @@ def trade_b_for_a(token_a: str, token_b: str, b_amounts: list, order_book: bytes
     :param token_a: Name of Token A
     :param token_b: Name of Token B
     :param b_amounts: List of amounts of token 'B' to swap in
-    :param order_book: Raw bytes string order book data
+    :param order_book: Encoded order book bytes, see 'binance.codec'
     :return: List of Swap dataclass: (chain, id, cost, from_token, to_token, remainder)
     """
     all_swaps: list = []
     if not order_book:
         return all_swaps
 
-    order_book = ast.literal_eval(order_book.decode("utf-8"))  # Decode bytes string into a dictionary
-    asks = order_book['asks']
+    book = decode_book(order_book)
+    # asks are when they want to sell sth -> they are ASKING for the PRICE
+    asks = get_ladder(f"{token_a}{token_b}", "asks", book)
 
     b_amounts = list(b_amounts)
 
@@ -138,31 +296,12 @@ def trade_b_for_a(token_a: str, token_b: str, b_amounts: list, order_book: bytes
 
         # Deduct binance 0.1% fee before trading
         fee = b_amount * (0.1 / 100.0)
-        swap_cost = {"exchange_fee": fee}
+        swap_cost = Cost(exchange_fee=fee)
         b_sold = b_amount
         b_amount -= fee
 
-        a_bought = 0
-        # asks are when they want to sell sth -> they are ASKING for the PRICE
-        for item in asks:
-            # getting the amounts at price closest to the origin
-            price = float(item[0])
-            quantity = float(item[1])
-            cost = price * quantity
-
-            # If b_amount less than ask total cost
-            if b_amount >= cost:
-                a_bought += quantity
-                b_amount -= cost
-
-            # otherwise we check how much of the current level we are filling
-            else:
-                last_quantity_bought = float(b_amount / price)
-                a_bought += last_quantity_bought
-                b_amount -= price * last_quantity_bought
-
-                # No more stables left to trade
-                break
+        # Buy out whole levels closest to the origin then partially fill the next one
+        a_bought, b_amount = asks.spend_quote(b_amount)
 
         # Deduct b_amount, if any, from total sold
         remainder = b_amount
@@ -180,6 +319,7 @@ def trade_b_for_a(token_a: str, token_b: str, b_amounts: list, order_book: bytes
     return all_swaps
 
 
+@traced
 def trade_a_for_b(token_a: str, token_b: str, a_amounts: list, order_book: bytes) -> List[Swap]:
     """
     Given pair 'AB', by selling amount 'A', calculate the received amount of 'B'
@@ -188,15 +328,16 @@ def trade_a_for_b(token_a: str, token_b: str, a_amounts: list, order_book: bytes
     :param token_a: Name of Token A
     :param token_b: Name of Token B
     :param a_amounts: List of amounts of token 'A' to swap in
-    :param order_book: Raw bytes string order book data
+    :param order_book: Encoded order book bytes, see 'binance.codec'
     :return: List of Swap dataclass: (chain, id, cost, from_token, to_token, remainder)
     """
     all_swaps: list = []
     if not order_book:
         return all_swaps
 
-    order_book = ast.literal_eval(order_book.decode("utf-8"))  # Decode bytes string into a dictionary
-    bids = order_book['bids']
+    book = decode_book(order_book)
+    # bids are when they want to BUY sth -> they are BIDDING at the PRICE
+    bids = get_ladder(f"{token_a}{token_b}", "bids", book)
 
     a_amounts = list(a_amounts)
 
@@ -207,30 +348,12 @@ def trade_a_for_b(token_a: str, token_b: str, a_amounts: list, order_book: bytes
 
         # Deduct binance 0.1% fee before trading
         fee = a_amount * (0.1 / 100.0)
-        swap_cost = {"exchange_fee": fee}
+        swap_cost = Cost(exchange_fee=fee)
         total_a_sold = a_amount
         a_amount -= fee
 
-        b_bought = 0
-        a_sold = 0
-        # bids are when they want to BUY sth -> they are BIDDING at the PRICE
-        for item in bids:
-
-            price = float(item[0])
-            quantity = float(item[1])
-            cost = price * quantity
-
-            if a_amount >= quantity:
-                a_amount -= quantity
-                a_sold += quantity
-                b_bought += cost
-            else:
-                last_quantity_sold = float(a_amount * price)
-                a_sold += a_amount
-                b_bought += last_quantity_sold
-
-                # No more tokens left to trade
-                break
+        # Sell into whole levels closest to the origin then partially fill the next one
+        b_bought, a_sold = bids.sell_base(a_amount)
 
         # Deduct a_amount, if any, from total sold
         remainder = (total_a_sold - fee) - a_sold
@@ -246,13 +369,51 @@ def trade_a_for_b(token_a: str, token_b: str, a_amounts: list, order_book: bytes
     return all_swaps
 
 
-def start_binance_streams(trading_pairs: List[str], debug: bool = False) -> None:
+def start_binance_streams(trading_pairs: List[str], debug: bool = False,
+                          store: SharedBookStore | None = None, changes: Queue | None = None,
+                          reactive: dict | None = None, recorder: dict | None = None,
+                          stop: Event | None = None) -> None:
     """
     Starts a Binance WebSocket stream for each trading pair.
 
     :param trading_pairs: List of trading pairs, eg. ['ETHUSDT', 'BTCUSDT']
     :param debug: If True will print to terminal websocket output
+    :param store: Shared memory book store to publish to. If None publishes to memcache
+    :param changes: Queue to publish trading pairs whose book moved to. If None the screener is not notified
+    :param reactive: Reactive screening settings, eg. {"mid_threshold": 0.001, "depth_threshold": 0.2}
+    :param recorder: Recorder settings, eg. {"directory": "data"}. If None book updates are not recorded
+    :param stop: Event that closes the streams and returns, eg. for a restart. If None runs until terminated
     """
+    if store:
+        use_book_store(store)
+
+    detector = None
+    if changes is not None:
+        reactive = reactive or {}
+        detector = BookChangeDetector(changes, mid_threshold=reactive.get("mid_threshold", 0.001),
+                                      depth_threshold=reactive.get("depth_threshold", 0.2))
+
     # Initialise BinanceDepthSocket with trading pairs
-    binance_socket = BinanceDepthSocket(trading_pairs, debug=debug)
-    binance_socket.run_forever()
+    binance_socket = BinanceDepthSocket(trading_pairs, debug=debug, detector=detector)
+
+    if recorder is not None:
+        # Cannot record more levels than the stream publishes
+        book_recorder.configure(**recorder)
+        book_recorder.configure(book_depth=min(book_recorder.depth, binance_socket.depth))
+        book_recorder.start()
+
+        # Process is restarted with SIGTERM, exit normally so buffered books are written
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+
+    # Close the socket between two messages, so no book is left half published to the store or changes queue
+    def close_on_stop() -> None:
+        stop.wait()
+        binance_socket.close()
+
+    if stop is not None:
+        threading.Thread(target=close_on_stop, name="stream-stop", daemon=True).start()
+
+    try:
+        binance_socket.run_forever()
+    finally:
+        book_recorder.stop()
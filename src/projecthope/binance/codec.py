@@ -0,0 +1,69 @@
+"""
+Compact binary encoding for order books stored in the cache.
+
+Layout (little-endian, price levels as native float64):
+    header: lastUpdateId (uint64), event time ms (int64), number of bids (uint32), number of asks (uint32)
+    body:   bids as float64 [price, quantity, price, quantity, ...] followed by asks in the same format
+"""
+from array import array
+from struct import Struct
+from itertools import chain
+from typing import (
+    List,
+    Iterable,
+)
+
+
+HEADER = Struct("<QqII")
+
+
+class BookView:
+    """
+    Read-only view over an encoded order book. Price levels are not copied out of the buffer.
+    'bids' & 'asks' are flat float64 memoryviews: [price, quantity, price, quantity, ...]
+    """
+    __slots__ = ("update_id", "event_time", "bids", "asks")
+
+    def __init__(self, buffer: bytes):
+        """
+        :param buffer: Bytes produced by 'encode_book'
+        """
+        self.update_id, self.event_time, n_bids, n_asks = HEADER.unpack_from(buffer)
+
+        levels = memoryview(buffer)[HEADER.size:].cast("d")
+        self.bids = levels[:2 * n_bids]
+        self.asks = levels[2 * n_bids:2 * (n_bids + n_asks)]
+
+    @property
+    def best_bid(self) -> float | None:
+        return self.bids[0] if len(self.bids) else None
+
+    @property
+    def best_ask(self) -> float | None:
+        return self.asks[0] if len(self.asks) else None
+
+
+def encode_book(update_id: int, event_time: int, bids: List[Iterable[float]], asks: List[Iterable[float]]) -> bytes:
+    """
+    Packs an order book into bytes, see module docstring for the layout.
+
+    :param update_id: Binance 'lastUpdateId' of the book
+    :param event_time: Binance event time in ms
+    :param bids: Bid levels, highest first, as [[price, quantity], ...]
+    :param asks: Ask levels, lowest first, as [[price, quantity], ...]
+    :return: Encoded order book
+    """
+    header = HEADER.pack(update_id, event_time, len(bids), len(asks))
+    levels = array("d", chain.from_iterable(chain(bids, asks)))
+
+    return header + levels.tobytes()
+
+
+def decode_book(buffer: bytes) -> BookView:
+    """
+    Decodes an order book produced by 'encode_book' without copying its price levels.
+
+    :param buffer: Encoded order book
+    :return: BookView instance
+    """
+    return BookView(buffer)
@@ -0,0 +1,93 @@
+"""
+Fill simulation against one side of an order book.
+Cumulative quantity & cost are computed once per book version, every amount is then resolved with a binary search.
+"""
+from bisect import bisect_right
+from itertools import accumulate
+from typing import (
+    List,
+    Dict,
+    Tuple,
+)
+
+from src.projecthope.binance.codec import BookView
+
+
+class BookLadder:
+    """Cumulative quantity & cost of one side of an order book, best price first."""
+    __slots__ = ("prices", "cum_quantity", "cum_cost")
+
+    def __init__(self, levels: memoryview):
+        """
+        :param levels: Flat [price, quantity, ...] float64 view, see 'codec.BookView'
+        """
+        self.prices = levels[0::2].tolist()
+        quantities = levels[1::2].tolist()
+
+        self.cum_quantity: List[float] = list(accumulate(quantities))
+        self.cum_cost: List[float] = list(accumulate(price * quantity
+                                                     for price, quantity in zip(self.prices, quantities)))
+
+    def spend_quote(self, amount: float) -> Tuple[float, float]:
+        """
+        Walks the asks spending a quote token amount.
+
+        :param amount: Amount of quote token to spend
+        :return: Tuple of base token bought & quote token left unspent
+        """
+        # Levels that can be bought out entirely
+        filled = bisect_right(self.cum_cost, amount)
+        spent = self.cum_cost[filled - 1] if filled else 0.0
+        bought = self.cum_quantity[filled - 1] if filled else 0.0
+        left = amount - spent
+
+        if filled < len(self.prices):
+            # Partially fill the next level with what is left
+            price = self.prices[filled]
+            last_quantity = left / price
+            bought += last_quantity
+            left -= price * last_quantity
+
+        return bought, left
+
+    def sell_base(self, amount: float) -> Tuple[float, float]:
+        """
+        Walks the bids selling a base token amount.
+
+        :param amount: Amount of base token to sell
+        :return: Tuple of quote token received & base token sold
+        """
+        # Levels that can be sold into entirely
+        filled = bisect_right(self.cum_quantity, amount)
+        sold = self.cum_quantity[filled - 1] if filled else 0.0
+        received = self.cum_cost[filled - 1] if filled else 0.0
+
+        if filled < len(self.prices):
+            # Partially fill the next level with what is left
+            received += (amount - sold) * self.prices[filled]
+            sold = amount
+
+        return received, sold
+
+
+# Most recent ladder per (symbol, side), rebuilt only when the book's update id changes
+_ladders: Dict[Tuple[str, str], Tuple[int, int, BookLadder]] = {}
+
+
+def get_ladder(symbol: str, side: str, book: BookView) -> BookLadder:
+    """
+    Returns the ladder for one side of a book, reusing it while the book version is unchanged.
+
+    :param symbol: Trading pair, eg. 'ETHUSDT'
+    :param side: 'bids' or 'asks'
+    :param book: Decoded order book
+    :return: BookLadder instance
+    """
+    cached = _ladders.get((symbol, side))
+    if cached and cached[0] == book.update_id and cached[1] == book.event_time:
+        return cached[2]
+
+    ladder = BookLadder(getattr(book, side))
+    _ladders[(symbol, side)] = (book.update_id, book.event_time, ladder)
+
+    return ladder
@@ -0,0 +1,130 @@
+from typing import (
+    List,
+    Dict,
+    Tuple,
+)
+
+from src.projecthope.binance.codec import encode_book
+
+
+class OrderBookGapError(Exception):
+    """Raised when a diff-depth event does not follow the last applied update."""
+
+
+class OrderBook:
+    """
+    Local order book for a single trading pair, maintained from Binance diff-depth events.
+    Follows Binance's 'How to manage a local order book correctly' procedure.
+    """
+
+    def __init__(self, symbol: str):
+        """
+        :param symbol: Trading pair, eg. 'ETHUSDT'
+        """
+        self.symbol = symbol.upper()
+        self.bids: Dict[float, float] = {}
+        self.asks: Dict[float, float] = {}
+        self.last_update_id: int = 0
+        self.event_time: int = 0
+        self.synced: bool = False
+
+        # First event after a snapshot may straddle its 'lastUpdateId' instead of following it
+        self._first_event = False
+
+    def reset(self) -> None:
+        """Clears all price levels and marks the book as out of sync."""
+        self.bids.clear()
+        self.asks.clear()
+        self.last_update_id = 0
+        self.event_time = 0
+        self.synced = False
+        self._first_event = False
+
+    def apply_snapshot(self, snapshot: dict, buffered_events: List[dict]) -> None:
+        """
+        Initialises the book from a REST depth snapshot and replays any buffered diff events.
+
+        :param snapshot: Response data from Binance '/api/v3/depth' endpoint
+        :param buffered_events: Diff events received while waiting for the snapshot
+        :raises OrderBookGapError: If buffered events do not line up with the snapshot
+        """
+        self.reset()
+
+        self.last_update_id = int(snapshot['lastUpdateId'])
+        self._update_side(self.bids, snapshot['bids'])
+        self._update_side(self.asks, snapshot['asks'])
+
+        # Snapshots carry no event time, they are at least as new as the newest buffered event
+        self.event_time = max((int(event.get('E', 0)) for event in buffered_events), default=0)
+        self._first_event = True
+
+        for event in buffered_events:
+            self.apply_event(event)
+
+        # Snapshot may be newer than all buffered events, the next live event then straddles it
+        self.synced = True
+
+    def apply_event(self, event: dict) -> None:
+        """
+        Applies a single diff-depth event to a synced book, or a buffered one to a book being synced.
+
+        :param event: Binance 'depthUpdate' event data
+        :raises OrderBookGapError: If the event's first update id does not follow the last one applied
+        """
+        # Stale event, already covered by the snapshot
+        if event['u'] <= self.last_update_id:
+            return
+
+        if self._first_event:
+            # The first processed event should have U <= lastUpdateId+1 AND u >= lastUpdateId+1
+            if event['U'] > self.last_update_id + 1:
+                raise OrderBookGapError(f"{self.symbol} snapshot {self.last_update_id} is older "
+                                        f"than first event {event['U']}-{event['u']}")
+            self._first_event = False
+
+        # Each new event's U should be equal to the previous event's u+1
+        elif event['U'] != self.last_update_id + 1:
+            raise OrderBookGapError(f"{self.symbol} expected update {self.last_update_id + 1}, "
+                                    f"got {event['U']}-{event['u']}")
+
+        self._apply(event)
+
+    def _apply(self, event: dict) -> None:
+        self._update_side(self.bids, event['b'])
+        self._update_side(self.asks, event['a'])
+        self.last_update_id = int(event['u'])
+        self.event_time = int(event.get('E', 0))
+
+    @staticmethod
+    def _update_side(side: Dict[float, float], levels: List[list]) -> None:
+        for price, quantity in levels:
+            price = float(price)
+            quantity = float(quantity)
+            # A quantity of 0 means the price level should be removed
+            if quantity == 0:
+                side.pop(price, None)
+            else:
+                side[price] = quantity
+
+    def top(self, depth: int = 1000) -> Tuple[List[list], List[list]]:
+        """
+        Returns sorted price levels closest to the spread.
+
+        :param depth: Maximum number of levels per side
+        :return: Tuple of bids (highest first) & asks (lowest first) as [[price, quantity], ...]
+        """
+        bids = [[price, self.bids[price]] for price in sorted(self.bids, reverse=True)[:depth]]
+        asks = [[price, self.asks[price]] for price in sorted(self.asks)[:depth]]
+
+        return bids, asks
+
+    def to_bytes(self, depth: int = 1000) -> bytes:
+        """
+        Returns the book packed in the cache's binary format, see 'codec.encode_book'.
+
+        :param depth: Maximum number of levels per side
+        :return: Encoded order book
+        """
+        bids, asks = self.top(depth)
+
+        return encode_book(self.last_update_id, self.event_time, bids, asks)
@@ -0,0 +1,111 @@
+"""
+Shared-memory order book transport between the Binance stream process and the screener process.
+Each symbol owns a fixed-size slot guarded by a seqlock: a single writer, lock-free readers.
+"""
+import time
+
+from struct import Struct
+from typing import List
+from multiprocessing.shared_memory import SharedMemory
+
+from src.projecthope.binance.codec import HEADER
+
+
+# Slot header: sequence number (uint64), write time (float64), expiry secs (float32), payload length (uint32)
+SLOT_HEADER = Struct("<QdfI")
+
+
+class SharedBookStore:
+    """
+    Fixed-slot order book store in shared memory.
+    Exposes the same 'get'/'set' calls as the memcache client so either can be used as a book transport.
+    """
+
+    def __init__(self, symbols: List[str], slot_size: int = 32 * 1024, name: str | None = None,
+                 create: bool = False):
+        """
+        :param symbols: List of trading pairs, eg. ['ETHUSDT', 'CVXUSDT']. Must be the same in every process
+        :param slot_size: Bytes reserved per symbol, including the slot header
+        :param name: Shared memory block name. If None a new name is generated (create only)
+        :param create: Create the shared memory block, otherwise attach to an existing one
+        """
+        self.symbols = [symbol.upper() for symbol in symbols]
+        self.slot_size = slot_size
+        self._slots = {symbol: i * slot_size for i, symbol in enumerate(self.symbols)}
+
+        self.shm = SharedMemory(name=name, create=create, size=slot_size * len(self.symbols))
+        self.name = self.shm.name
+        self._owner = create
+
+    def __reduce__(self):
+        # Attach to the same block when passed to a spawned process
+        return self.__class__, (self.symbols, self.slot_size, self.name, False)
+
+    @property
+    def max_depth(self) -> int:
+        """Maximum number of levels per side that fit into one slot."""
+        return (self.slot_size - SLOT_HEADER.size - HEADER.size) // 32
+
+    def set(self, key: str, value: bytes, expire: float = 0) -> bool:
+        """
+        Writes an encoded order book into a symbol's slot. Only one process may write to a slot.
+
+        :param key: Trading pair, eg. 'ETHUSDT'
+        :param value: Encoded order book bytes, see 'binance.codec'
+        :param expire: Number of seconds after which readers treat the book as missing, 0 for never
+        :return: True if written
+        """
+        offset = self._slots.get(key.upper())
+        if offset is None or SLOT_HEADER.size + len(value) > self.slot_size:
+            return False
+
+        buf = self.shm.buf
+        # Rounded up to even, in case a previous writer was killed mid-write and left the slot odd
+        seq = (SLOT_HEADER.unpack_from(buf, offset)[0] + 1) & ~1
+
+        # Odd sequence number tells readers a write is in progress
+        SLOT_HEADER.pack_into(buf, offset, seq + 1, 0, 0, 0)
+        start = offset + SLOT_HEADER.size
+        buf[start:start + len(value)] = value
+        SLOT_HEADER.pack_into(buf, offset, seq + 2, time.time(), expire, len(value))
+
+        return True
+
+    def get(self, key: str, default: bytes | None = None, retries: int = 100) -> bytes | None:
+        """
+        Reads a consistent copy of a symbol's order book without taking a lock.
+
+        :param key: Trading pair, eg. 'ETHUSDT'
+        :param default: Value to return if the book is missing or expired
+        :param retries: Maximum number of attempts while the writer is busy
+        :return: Encoded order book bytes
+        """
+        offset = self._slots.get(key.upper())
+        if offset is None:
+            return default
+
+        buf = self.shm.buf
+        start = offset + SLOT_HEADER.size
+        for _ in range(retries):
+            seq, written_at, expire, length = SLOT_HEADER.unpack_from(buf, offset)
+            if seq & 1:
+                continue
+
+            value = bytes(buf[start:start + length])
+
+            # Retry if the writer touched the slot while copying
+            if SLOT_HEADER.unpack_from(buf, offset)[0] != seq:
+                continue
+
+            if seq == 0 or (expire and time.time() - written_at > expire):
+                return default
+
+            return value
+
+        return default
+
+    def close(self) -> None:
+        """Detaches from the shared memory block and removes it if this instance created it."""
+        self.shm.close()
+        if self._owner:
+            self.shm.unlink()
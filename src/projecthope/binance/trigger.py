@@ -0,0 +1,69 @@
+from multiprocessing import Queue
+from queue import Full
+from typing import (
+    Dict,
+    List,
+    Tuple,
+)
+
+
+class BookChangeDetector:
+    """
+    Publishes a trading pair to a queue when its order book moved enough to be worth screening again.
+    A move is measured against the book at the time of the last notification for that pair.
+    """
+
+    def __init__(self, changes: Queue, mid_threshold: float = 0.001, depth_threshold: float = 0.2,
+                 depth_levels: int = 20):
+        """
+        :param changes: Queue the screener process reads changed trading pairs from
+        :param mid_threshold: Relative mid price move that triggers a notification, eg. 0.001 for 0.1%
+        :param depth_threshold: Relative change in top of book quantity that triggers a notification
+        :param depth_levels: Number of levels per side summed up as top of book quantity
+        """
+        self.changes = changes
+        self.mid_threshold = mid_threshold
+        self.depth_threshold = depth_threshold
+        self.depth_levels = depth_levels
+
+        self.dropped = 0
+        self._reference: Dict[str, Tuple[float, float]] = {}
+
+    def update(self, symbol: str, bids: List[list], asks: List[list]) -> bool:
+        """
+        Compares a new book against the pair's reference and notifies the screener if it moved.
+
+        :param symbol: Trading pair, eg. 'ETHUSDT'
+        :param bids: Bid levels, highest first, as [[price, quantity], ...]
+        :param asks: Ask levels, lowest first, as [[price, quantity], ...]
+        :return: True if the screener was notified
+        """
+        if not bids or not asks:
+            return False
+
+        mid = (bids[0][0] + asks[0][0]) / 2
+        depth = sum(level[1] for level in bids[:self.depth_levels]) + \
+            sum(level[1] for level in asks[:self.depth_levels])
+
+        reference = self._reference.get(symbol)
+        if reference:
+            ref_mid, ref_depth = reference
+            mid_move = abs(mid - ref_mid) / ref_mid
+            depth_move = abs(depth - ref_depth) / ref_depth if ref_depth else 0
+
+            if mid_move < self.mid_threshold and depth_move < self.depth_threshold:
+                return False
+
+        self._reference[symbol] = (mid, depth)
+
+        # First book of a pair only sets its reference
+        if not reference:
+            return False
+
+        try:
+            self.changes.put_nowait(symbol)
+        except Full:
+            self.dropped += 1
+            return False
+
+        return True
@@ -0,0 +1,266 @@
+import time
+
+from threading import (
+    Event,
+    Thread,
+)
+from typing import (
+    Dict,
+    Tuple,
+)
+from web3 import Web3
+
+from src.projecthope.datatypes import Cost
+from src.projecthope.blockchain.gas import (
+    GasOracle,
+    gas_cache_key,
+)
+from src.projecthope.binance.codec import decode_book
+from src.projecthope.binance.api import get_order_book
+from src.projecthope.common.logger import log_error
+from src.projecthope.common.decorators import traced
+from src.projecthope.common.variables import (
+    memcache,
+    network_names,
+    native_symbols,
+)
+
+
+# Gas price in gwei used for networks without a running oracle or published price
+default_gas_price_gwei = {
+    "56": 5,
+    "137": 50,
+    "10": 0.001,
+    "42161": 0.1,
+    "43114": 25,
+    "250": 100,
+    "100": 2,
+}
+
+# Bridge fees in the network's native token, used for chains without a configured fee in USDT
+default_native_bridge_fees = {
+    "1": 0.005510,
+}
+
+
+class ChainCostModel:
+    """
+    Transaction & bridge costs in USDT for every network.
+    Gas is priced with each network's native token from the Binance streams. Once started, native token & shared
+    gas prices are refreshed every 'price_ttl' secs in a background thread, so pricing a quote on the event loop
+    only reads cached values. Until then prices are loaded when needed, at most once every 'price_ttl' secs.
+    """
+
+    def __init__(self, gas_price_gwei: dict | None = None, bridge_fees: dict | None = None,
+                 price_ttl: float = 1):
+        """
+        :param gas_price_gwei: Fallback gas price per network id in gwei, eg. {"137": 50}
+        :param bridge_fees: Bridge fees in USDT by chain name or chain pair, eg. {"Ethereum-Polygon": 15}
+        :param price_ttl: Secs between two price refreshes
+        """
+        self.gas_price_gwei: Dict[str, float] = dict(default_gas_price_gwei)
+        self.bridge_fees: Dict[frozenset, float] = {}
+        self.price_ttl = price_ttl
+        self.shared_prices = True
+
+        self.oracles: Dict[str, GasOracle] = {}
+        self._prices: Dict[str, Tuple[float | None, float]] = {}
+
+        self._stop = Event()
+        self._thread: Thread | None = None
+
+        self.configure(gas_price_gwei, bridge_fees)
+
+    def configure(self, gas_price_gwei: dict | None = None, bridge_fees: dict | None = None,
+                  rpc: dict | None = None, oracle: dict | None = None, price_ttl: float | None = None,
+                  shared_prices: bool | None = None) -> None:
+        """
+        Changes cost settings. Networks with an RPC url get their own gas oracle, see 'start'.
+
+        :param gas_price_gwei: Fallback gas price per network id in gwei, eg. {"137": 50}
+        :param bridge_fees: Bridge fees in USDT by chain name or chain pair, eg. {"Ethereum": 10, "Ethereum-Polygon": 5}
+        :param rpc: Node url per network id, eg. {"137": "https://polygon-rpc.com"}
+        :param oracle: GasOracle settings for the networks in 'rpc', eg. {"interval": 5}
+        :param price_ttl: Secs between two price refreshes
+        :param shared_prices: Use gas prices published to memcache by other processes' oracles
+        """
+        if gas_price_gwei:
+            self.gas_price_gwei.update({str(network_id): gwei for network_id, gwei in gas_price_gwei.items()})
+
+        for chains, fee in (bridge_fees or {}).items():
+            try:
+                network_ids = frozenset(network_names[chain] for chain in chains.split("-"))
+            except KeyError:
+                raise Exception(f"Unknown chain in bridge fee '{chains}'.")
+            self.bridge_fees[network_ids] = float(fee)
+
+        for network_id, url in (rpc or {}).items():
+            self.add_oracle(GasOracle(Web3(Web3.HTTPProvider(url)), str(network_id), **(oracle or {})))
+
+        if price_ttl is not None:
+            self.price_ttl = price_ttl
+        if shared_prices is not None:
+            self.shared_prices = shared_prices
+
+    def add_oracle(self, oracle: GasOracle) -> None:
+        """
+        Uses a gas oracle for its network's gas price.
+
+        :param oracle: GasOracle instance
+        """
+        self.oracles[oracle.network_id] = oracle
+
+    def start(self) -> None:
+        """Starts every gas oracle and the price refreshing thread, does nothing if already running."""
+        for oracle in self.oracles.values():
+            oracle.start()
+
+        if self._thread and self._thread.is_alive():
+            return
+
+        # Load every price once, so the first quotes are priced too
+        self.refresh()
+
+        self._stop.clear()
+        self._thread = Thread(target=self._run, name="chain-costs", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stops every gas oracle and the price refreshing thread."""
+        for oracle in self.oracles.values():
+            oracle.stop()
+
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def refresh(self) -> None:
+        """Loads the native token & shared gas price of every network into the cache."""
+        for network_id, symbol in native_symbols.items():
+            if symbol is not None:
+                self._prices[symbol] = (self._load_native_price(symbol), time.monotonic())
+            self._prices[gas_cache_key(network_id)] = (self._load_gas_price(network_id), time.monotonic())
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.price_ttl):
+            try:
+                self.refresh()
+            except Exception as e:
+                log_error.warning(f"'ChainCostModel' Error - could not refresh prices - {e}")
+
+    def _cached(self, key: str, loader) -> float | None:
+        value, loaded_at = self._prices.get(key, (None, 0.0))
+
+        # Refreshed in the background while running, never load on the caller's thread
+        if self._thread and self._thread.is_alive():
+            return value
+
+        if time.monotonic() - loaded_at >= self.price_ttl:
+            value = loader()
+            self._prices[key] = (value, time.monotonic())
+
+        return value
+
+    @staticmethod
+    def _load_native_price(symbol: str) -> float | None:
+        order_book: bytes = get_order_book(symbol)
+        if not order_book:
+            return None
+
+        try:
+            return decode_book(order_book).best_bid
+        except Exception as e:
+            log_error.error(f"'native_price' Error - can not query {symbol} price. {e}")
+            return None
+
+    def _load_gas_price(self, network_id: str) -> int | None:
+        gas_price: bytes = memcache.get(gas_cache_key(network_id)) if self.shared_prices else None
+        if gas_price:
+            return int(gas_price.decode("utf-8"))
+
+        gwei = self.gas_price_gwei.get(network_id)
+        return int(gwei * 10 ** 9) if gwei is not None else None
+
+    def native_price(self, network_id: str) -> float | None:
+        """
+        Price of a network's native gas token in USDT from its Binance stream.
+
+        :param network_id: Network id, eg. '137'
+        :return: Price in USDT, None if unknown
+        """
+        network_id = str(network_id)
+        if network_id not in native_symbols:
+            return None
+
+        symbol = native_symbols[network_id]
+        if symbol is None:
+            return 1.0
+
+        return self._cached(symbol, lambda: self._load_native_price(symbol))
+
+    def gas_price(self, network_id: str) -> int | None:
+        """
+        Gas price of a network in wei. Taken from its oracle, the price published by another process' oracle
+        or the configured fallback, in that order.
+
+        :param network_id: Network id, eg. '137'
+        :return: Gas price in wei, None if unknown
+        """
+        network_id = str(network_id)
+
+        oracle = self.oracles.get(network_id)
+        if oracle and oracle.fresh:
+            return oracle.gas_price
+
+        return self._cached(gas_cache_key(network_id), lambda: self._load_gas_price(network_id))
+
+    @traced
+    def swap_cost(self, network_id: str, gas_amount: int) -> Cost:
+        """
+        Prices a swap's gas on its network.
+
+        :param network_id: Network id, eg. '137'
+        :param gas_amount: Gas amount for transaction to be executed
+        :return: Cost record, 'usdt_cost' is None if gas or native token price is unknown
+        """
+        cost = Cost(gas_amount=gas_amount, gas_price=self.gas_price(network_id))
+
+        if cost.gas_price is not None:
+            native_price = self.native_price(network_id)
+            if native_price:
+                cost.usdt_cost = ((gas_amount * cost.gas_price) / 10 ** 18) * native_price
+
+        return cost
+
+    def bridge_cost(self, network_a: str, network_b: str) -> float:
+        """
+        Cost of moving funds between two networks in USDT.
+        A configured chain pair fee is used as is, otherwise each chain's own fee is added up.
+
+        :param network_a: Network id of the first swap
+        :param network_b: Network id of the second swap
+        :return: Bridge cost in USDT, 0 if none is known
+        """
+        network_a, network_b = str(network_a), str(network_b)
+        if network_a == network_b:
+            return 0.0
+
+        pair_fee = self.bridge_fees.get(frozenset((network_a, network_b)))
+        if pair_fee is not None:
+            return pair_fee
+
+        total = 0.0
+        for network_id in (network_a, network_b):
+            fee = self.bridge_fees.get(frozenset((network_id, )))
+            if fee is not None:
+                total += fee
+            elif network_id in default_native_bridge_fees:
+                native_price = self.native_price(network_id)
+                if native_price:
+                    total += default_native_bridge_fees[network_id] * native_price
+
+        return total
+
+
+# One cost model per process
+chain_costs = ChainCostModel()
@@ -9,8 +9,7 @@ from web3 import (
     Web3,
     middleware,
 )
-from src.projecthope.common.logger import log_error
-from src.projecthope.common.variables import memcache
+from src.projecthope.blockchain.gas import GasOracle
 
 
 class EvmContract:
@@ -39,34 +38,8 @@ class EvmContract:
         self.w3.middleware_onion.add(middleware.latest_block_based_cache_middleware)
         self.w3.middleware_onion.add(middleware.simple_cache_middleware)
 
-    def eth_gas_price(self, expire_after: int = 900) -> int | None:
-        """
-        Get a quote for Eth gas price for a transaction to get mined.
-        Set to 30secs max_wait, 60 sample_size, 98 probability & weighted False.
-        Use 'change_gas_strategy' method to implement a different strategy.
-
-        :param expire_after: Number of seconds until memcached is cleared
-        :return: Gas price on Ethereum
-        """
-        eth_gas_price: bytes = memcache.get("eth_gas_price")
-
-        # If memcached returns None
-        if not eth_gas_price:
-            counter = 1
-            while True:
-                try:
-                    gas_price = int(self.w3.eth.generateGasPrice())
-                    memcache.set(key="eth_gas_price", value=gas_price, expire=expire_after)
-
-                    return gas_price
-
-                except IndexError:
-                    log_error.warning(f"Could not query gas price from Web3. Attempt: {counter}")
-                    counter += 1
-                    if counter > 3:
-                        return None
-
-        return int(eth_gas_price.decode("utf-8"))
+        # Refreshes gas price in the background once started
+        self.gas_oracle = GasOracle(self.w3, "1")
 
     def change_gas_strategy(self, max_wait: int, sample_size: int = 60,
                             probability: int = 98, weighted: bool = False) -> int:
@@ -0,0 +1,130 @@
+import time
+
+from threading import (
+    Event,
+    Thread,
+)
+from web3 import Web3
+
+from src.projecthope.common.logger import log_error
+from src.projecthope.common.variables import memcache
+
+
+def gas_cache_key(network_id: str) -> str:
+    """
+    Memcache key a network's gas price is published under.
+
+    :param network_id: Network id, eg. '1'
+    :return: Cache key, eg. 'eth_gas_price'
+    """
+    return "eth_gas_price" if str(network_id) == "1" else f"gas_price_{network_id}"
+
+
+class GasOracle:
+    """
+    Keeps a network's gas price up to date from 'eth_feeHistory' in a background thread.
+    Fee history is only requested when a new block was mined, the result is kept in process
+    and published to memcache under 'gas_cache_key' so readers never wait on the node.
+    """
+
+    def __init__(self, w3: Web3, network_id: str = "1", interval: float = 12, block_count: int = 5,
+                 percentile: float = 60, base_fee_multiplier: float = 1.25, expire: int = 120):
+        """
+        :param w3: Web3 instance connected to a node of the network
+        :param network_id: Network id, eg. '1' for Ethereum
+        :param interval: Secs between two checks for a new block
+        :param block_count: Number of recent blocks to take priority fees from
+        :param percentile: Priority fee percentile paid within each block, eg. 60
+        :param base_fee_multiplier: Headroom on the next block's base fee
+        :param expire: Secs until the published gas price is cleared from memcache and considered stale
+        """
+        self.w3 = w3
+        self.network_id = str(network_id)
+        self.cache_key = gas_cache_key(network_id)
+        self.interval = interval
+        self.block_count = block_count
+        self.percentile = percentile
+        self.base_fee_multiplier = base_fee_multiplier
+        self.expire = expire
+
+        self.gas_price: int | None = None
+        self.base_fee: int | None = None
+        self.priority_fee: int | None = None
+        self.updated_at = 0.0
+        self.last_block: int | None = None
+
+        self._stop = Event()
+        self._thread: Thread | None = None
+
+    @property
+    def fresh(self) -> bool:
+        """True if the gas price was refreshed within 'expire' secs."""
+        return self.gas_price is not None and time.monotonic() - self.updated_at < self.expire
+
+    def configure(self, **settings) -> None:
+        """
+        Changes oracle settings, see constructor for arguments.
+        """
+        for key, value in settings.items():
+            if key not in ("interval", "block_count", "percentile", "base_fee_multiplier", "expire"):
+                raise Exception(f"Unknown gas oracle setting '{key}'.")
+            setattr(self, key, value)
+
+    def refresh(self) -> int | None:
+        """
+        Queries fee history if a new block was mined since the last refresh and publishes the gas price.
+
+        :return: Current gas price in wei, None if it could not be queried yet
+        """
+        block_number = self.w3.eth.block_number
+        if block_number == self.last_block and self.gas_price is not None:
+            # Same block - keep the price alive
+            self.updated_at = time.monotonic()
+            memcache.set(key=self.cache_key, value=self.gas_price, expire=self.expire)
+            return self.gas_price
+
+        history = self.w3.eth.fee_history(self.block_count, block_number, [self.percentile])
+
+        # Last base fee is the one of the next block
+        base_fee = int(history['baseFeePerGas'][-1])
+        rewards = sorted(int(reward[0]) for reward in history['reward'] if reward)
+        priority_fee = rewards[len(rewards) // 2] if rewards else 0
+
+        self.base_fee = base_fee
+        self.priority_fee = priority_fee
+        self.gas_price = int(base_fee * self.base_fee_multiplier) + priority_fee
+        self.last_block = block_number
+        self.updated_at = time.monotonic()
+
+        memcache.set(key=self.cache_key, value=self.gas_price, expire=self.expire)
+
+        return self.gas_price
+
+    def _run(self) -> None:
+        counter = 0
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+                counter = 0
+
+            except Exception as e:
+                counter += 1
+                log_error.warning(f"'GasOracle' Error - could not query fee history. Attempt: {counter} - {e}")
+
+            # Back off while the node keeps failing
+            self._stop.wait(self.interval * min(counter + 1, 5))
+
+    def start(self) -> None:
+        """Starts refreshing in a daemon thread, does nothing if already running."""
+        if self._thread and self._thread.is_alive():
+            return
+
+        self._stop.clear()
+        self._thread = Thread(target=self._run, name=f"gas-oracle-{self.cache_key}", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stops the refreshing thread."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.interval)
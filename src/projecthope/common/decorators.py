@@ -1,6 +1,9 @@
 import functools
+import inspect
 import time
 
+from src.projecthope.common.tracing import tracer
+
 
 def timer(func):
     """Print the runtime of the decorated function"""
@@ -18,16 +21,27 @@ def timer(func):
     return wrapper
 
 
-def count_func_calls(func):
-    """Counts the number of function calls."""
+def traced(func):
+    """Record each call of the decorated function as a span of the current trace, see 'tracing.Tracer'"""
+    name = func.__name__
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            if not tracer.active:
+                return await func(*args, **kwargs)
+
+            with tracer.span(name):
+                return await func(*args, **kwargs)
+
+        return async_wrapper
 
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        wrapper.calls += 1
-        value = func(*args, **kwargs)
-
-        return value
+        if not tracer.active:
+            return func(*args, **kwargs)
 
-    wrapper.calls = 0
+        with tracer.span(name):
+            return func(*args, **kwargs)
 
     return wrapper
@@ -0,0 +1,95 @@
+import os
+import json
+import time
+
+from datetime import datetime
+
+from src.projecthope.common.logger import log_error
+from src.projecthope.common.metrics import metrics
+from src.projecthope.common.variables import time_format
+
+
+class Heartbeat:
+    """
+    Latest health record of the screener, written to a JSON file replaced atomically on every beat,
+    so readers such as 'container_check.py' never see a partial file.
+    """
+
+    def __init__(self, path: str = "logs/heartbeat.json"):
+        """
+        :param path: File the record is written to
+        """
+        self.path = path
+        self.record: dict = {}
+
+        self._stage_totals: dict = {}
+
+    def configure(self, path: str | None = None) -> None:
+        """
+        :param path: File the record is written to
+        """
+        if path:
+            self.path = path
+
+    def collect(self) -> dict:
+        """
+        Summarises the metrics registry since the last call: average duration per screening stage,
+        Binance book age per symbol & 1inch error rate per network.
+
+        :return: Dictionary to pass to 'beat'
+        """
+        summary = {"stages": {}, "stream_lag": {}, "networks": {}}
+
+        stages = metrics.metrics.get("screening_stage_seconds")
+        if stages:
+            totals = stages.totals()
+            for (stage, ), (count, total) in totals.items():
+                last_count, last_total = self._stage_totals.get((stage, ), (0, 0.0))
+                if count > last_count:
+                    summary["stages"][stage] = round((total - last_total) / (count - last_count), 4)
+            self._stage_totals = totals
+
+        book_age = metrics.metrics.get("book_age_seconds")
+        if book_age:
+            lags = {symbol: round(age, 3) for (symbol, ), age in book_age.values().items()}
+            summary["stream_lag"] = {"max": max(lags.values(), default=None), "symbols": lags}
+
+        error_rate = metrics.metrics.get("network_error_rate")
+        breaker_open = metrics.metrics.get("network_breaker_open")
+        if error_rate and breaker_open:
+            is_open = breaker_open.values()
+            summary["networks"] = {network_id: {"error_rate": round(rate, 3), "open": bool(is_open.get((network_id, )))}
+                                   for (network_id, ), rate in error_rate.values().items()}
+
+        return summary
+
+    def beat(self, **record) -> None:
+        """
+        Replaces the health record and writes it.
+
+        :param record: Health info, eg. loop=10, loop_time=3.2
+        """
+        now = time.time()
+        self.record = {"time": now,
+                       "timestamp": datetime.fromtimestamp(now).astimezone().strftime(time_format),
+                       "pid": os.getpid(),
+                       **record}
+
+        temp_path = f"{self.path}.tmp"
+        try:
+            with open(temp_path, "w") as file:
+                json.dump(self.record, file)
+            os.replace(temp_path, self.path)
+
+        except OSError as e:
+            log_error.warning(f"'Heartbeat' Error - could not write {self.path} - {e}")
+
+    def to_json(self) -> str:
+        """Latest health record as JSON, with its age in secs."""
+        age = time.time() - self.record["time"] if self.record else None
+
+        return json.dumps({**self.record, "age": age})
+
+
+# One heartbeat per process
+heartbeat = Heartbeat()
@@ -1,35 +1,219 @@
+import os
+import weakref
 import logging
+import threading
+import multiprocessing
+
+from queue import (
+    Full,
+    Queue,
+)
+from typing import (
+    Dict,
+    Callable,
+)
+from logging.handlers import (
+    QueueHandler,
+    QueueListener,
+    RotatingFileHandler,
+    TimedRotatingFileHandler,
+)
 
 from src.projecthope.common.variables import log_format
 
 
+class RepeatFilter(logging.Filter):
+    """
+    Drops repeats of an identical message within 'window' secs.
+    The next copy logged after the window says how many were dropped.
+    """
+
+    def __init__(self, window: float = 60, max_messages: int = 1000):
+        """
+        :param window: Secs during which identical messages are only written once
+        :param max_messages: Number of distinct messages to remember
+        """
+        super().__init__()
+        self.window = window
+        self.max_messages = max_messages
+        self.seen: Dict[tuple, list] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = (record.levelno, record.getMessage())
+        seen = self.seen.get(key)
+
+        if seen and record.created - seen[0] < self.window:
+            seen[1] += 1
+            return False
+
+        if seen and seen[1]:
+            record.msg = f"{record.getMessage()} (repeated {seen[1]} more times)"
+            record.args = None
+
+        if len(self.seen) >= self.max_messages:
+            self.seen = {k: v for k, v in self.seen.items() if record.created - v[0] < self.window}
+        self.seen[key] = [record.created, 0]
+
+        return True
+
+
+def process_filename(filename: str) -> str:
+    """
+    Log file of the current process. Rotating handlers of several processes must not share a file,
+    so child processes write to one named after them, eg. 'logs/error-screener.log'.
+
+    :param filename: Log file of the main process, eg. 'logs/error.log'
+    :return: Log file name
+    """
+    if multiprocessing.parent_process() is None:
+        return filename
+
+    root, extension = os.path.splitext(filename)
+    return f"{root}-{multiprocessing.current_process().name}{extension}"
+
+
+class BackgroundHandler(QueueHandler):
+    """
+    Hands records to a bounded queue written to disk by a listener thread, so logging never waits on the file.
+    Records are dropped when the queue is full. The listener and its file handler are created per process on first use.
+    """
+
+    def __init__(self, make_handler: Callable[[], logging.Handler], maxsize: int = 10000):
+        """
+        :param make_handler: Creates the handler writing the records, runs in the listener thread
+        :param maxsize: Maximum number of queued records
+        """
+        super().__init__(Queue(maxsize))
+        self.make_handler = make_handler
+        self.handler: logging.Handler | None = None
+        self.maxsize = maxsize
+        self.dropped = 0
+
+        self._pid: int | None = None
+        self._listener: QueueListener | None = None
+        self._start_lock = threading.Lock()
+
+        _background_handlers.add(self)
+
+    def _forget_listener(self) -> None:
+        # The file handler is left open for the parent, this process opens its own file
+        self.queue = Queue(self.maxsize)
+        self.handler = None
+        self._listener = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_listener(self) -> None:
+        if self._pid == os.getpid():
+            return
+
+        with self._start_lock:
+            if self._pid != os.getpid():
+                if self.handler is None:
+                    self.handler = self.make_handler()
+                self._listener = QueueListener(self.queue, self.handler, respect_handler_level=True)
+                self._listener.start()
+                self._pid = os.getpid()
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        self._ensure_listener()
+        try:
+            self.queue.put_nowait(record)
+        except Full:
+            self.dropped += 1
+
+    def close(self) -> None:
+        """Writes queued records and stops the listener."""
+        if self._listener and self._pid == os.getpid():
+            try:
+                self._listener.stop()
+            except Full:
+                pass
+            self._listener = None
+            self._pid = None
+
+        if self.handler:
+            self.handler.close()
+        _background_handlers.discard(self)
+        super().close()
+
+
+# Handlers of this process, their listener threads are not inherited by forked processes
+_background_handlers: "weakref.WeakSet[BackgroundHandler]" = weakref.WeakSet()
+
+
+def _forget_listeners() -> None:
+    for handler in list(_background_handlers):
+        handler._forget_listener()
+
+
+# Registered once for all handlers, hooks cannot be unregistered
+os.register_at_fork(after_in_child=_forget_listeners)
+
+
 def logger_setup(
         log_name: str,
         filename: str,
         level=logging.INFO,
+        max_bytes: int = 10 * 1024 * 1024,
+        backup_count: int = 5,
+        when: str | None = None,
+        aggregate_window: float | None = None,
+        queue_size: int = 10000,
 ) -> logging.Logger:
     """
-    Sets up a new logger config.
+    Sets up a new logger config. Records are written by a background thread.
+    Child processes write to their own file, see 'process_filename'.
 
     :param log_name: Name of Logger. Make sure unique name is given for each Log
     :param filename: Name of filename
     :param level: Logger level of severity
+    :param max_bytes: Size in bytes to rotate the file at, ignored if 'when' is given
+    :param backup_count: Number of rotated files to keep
+    :param when: Rotate by time instead of size, eg. 'midnight' or 'H'
+    :param aggregate_window: If set, identical messages are only written once per this many secs
+    :param queue_size: Maximum number of records waiting to be written
     :returns: An instance of the Logger class
     """
     # Set up formatting style
     formatter = logging.Formatter(log_format)
 
-    handler = logging.FileHandler(filename)
-    handler.setFormatter(formatter)
+    def make_handler() -> logging.Handler:
+        path = process_filename(filename)
+        if when:
+            handler = TimedRotatingFileHandler(path, when=when, backupCount=backup_count)
+        else:
+            handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count)
+        handler.setFormatter(formatter)
+
+        if aggregate_window:
+            handler.addFilter(RepeatFilter(aggregate_window))
 
-    # Create logger with name, level and handler
+        return handler
+
+    # Create logger with name, level and handler. Replaces handlers of a previous setup
     logger = logging.getLogger(log_name)
     logger.setLevel(level)
-    logger.addHandler(handler)
+    for old_handler in list(logger.handlers):
+        logger.removeHandler(old_handler)
+        old_handler.close()
+    logger.addHandler(BackgroundHandler(make_handler, queue_size))
 
     return logger
 
 
+def configure_logging(**settings) -> None:
+    """
+    Sets up both loggers again with new settings, see 'logger_setup' for arguments.
+    'aggregate_window' only applies to the error log.
+    """
+    aggregate_window = settings.pop("aggregate_window", 60)
+    logger_setup("arbitrage", "logs/arbitrage.log", **settings)
+    logger_setup("error", "logs/error.log", aggregate_window=aggregate_window, **settings)
+    logger_setup("trace", "logs/trace.log", **settings)
+
+
 # Configure logging settings
 log_arbitrage = logger_setup("arbitrage", "logs/arbitrage.log")
-log_error = logger_setup("error", "logs/error.log")
+log_error = logger_setup("error", "logs/error.log", aggregate_window=60)
+log_trace = logger_setup("trace", "logs/trace.log")
@@ -3,13 +3,18 @@ import requests
 from time import sleep
 from typing import Optional
 
-from requests.exceptions import ConnectionError
+from requests.exceptions import (
+    ConnectionError,
+    ReadTimeout,
+)
 
 from src.projecthope.common.logger import log_error
 from src.projecthope.common.variables import (
     TOKEN,
+    TELEGRAM_API,
     CHAT_ID_ALERTS,
     CHAT_ID_DEBUG,
+    http_session,
 )
 
 
@@ -20,6 +25,7 @@ def telegram_send_message(
         telegram_chat_id: Optional[str] = "",
         debug: bool = False,
         timeout: float = 10,
+        retries: int = 3,
 ) -> requests.Response or None:
     """
     Sends a Telegram message to a specified chat.
@@ -28,6 +34,7 @@ def telegram_send_message(
     CHAT_ID: the specific id of the chat you want the message sent to
     Follow telegram's instruction on how to set up a bot using the bot father
     and configure it to be able to send messages to a chat.
+    Blocks until sent, alerts from the screening loop go through 'outbox.alert_outbox' instead.
 
     :param message_text: Text message to send
     :param disable_web_page_preview: Set web preview on/off
@@ -35,6 +42,7 @@ def telegram_send_message(
     :param telegram_chat_id: Telegram chat ID for alerts, default is 'CHAT_ID_ALERTS' from .env file
     :param debug: If true sends message to Telegram 'CHAT_ID_DEBUG' chat taken from .env file
     :param timeout: Max secs to wait for POST request
+    :param retries: Number of attempts before giving up
     :return: requests.Response
     """
     telegram_token = str(telegram_token)
@@ -53,7 +61,7 @@ def telegram_send_message(
             telegram_chat_id = CHAT_ID_ALERTS
 
     # construct url using token for a sendMessage POST request
-    url = "https://api.telegram.org/bot{}/sendMessage".format(telegram_token)
+    url = "{}/bot{}/sendMessage".format(TELEGRAM_API, telegram_token)
 
     # Construct data for the request
     payload = {"chat_id": telegram_chat_id, "text": message_text,
@@ -61,19 +69,18 @@ def telegram_send_message(
 
     # send the POST request
     try:
-        counter = 1
         # If too many requests, wait for Telegram's rate limit
-        while True:
-            post_request = requests.post(url=url, data=payload, timeout=timeout)
+        for counter in range(1, retries + 1):
+            post_request = http_session.post(url=url, data=payload, timeout=timeout)
 
             if post_request.json()['ok']:
                 return post_request
 
             log_error.warning(f"'telegram_send_message' -Telegram message not sent, attempt {counter}. "
                               f"Sleeping for 3 secs...")
-            counter += 1
             sleep(3)
 
-    except ConnectionError as e:
+    except (ConnectionError, ReadTimeout) as e:
         log_error.warning(f"'telegram_send_message' - {e} - '{message_text})' was not sent.")
-        return None
+
+    return None
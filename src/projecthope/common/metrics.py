@@ -0,0 +1,241 @@
+import threading
+
+from bisect import bisect_left
+from typing import (
+    Callable,
+    Dict,
+    List,
+    Tuple,
+)
+from http.server import (
+    BaseHTTPRequestHandler,
+    ThreadingHTTPServer,
+)
+
+# Latency buckets in secs
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _format_labels(names: Tuple[str, ...], values: tuple, extra: str = "") -> str:
+    labels = [f'{name}="{str(value)}"' for name, value in zip(names, values)]
+    if extra:
+        labels.append(extra)
+
+    return "{" + ",".join(labels) + "}" if labels else ""
+
+
+class Metric:
+    """
+    Base of all metrics, values are kept per combination of label values.
+    A metric with a 'callback' reads its values from it when rendered instead.
+    """
+    kind = "untyped"
+
+    def __init__(self, name: str, description: str, labels: Tuple[str, ...] = (),
+                 callback: Callable[[], Dict[tuple, float]] | None = None):
+        """
+        :param name: Metric name, eg. 'quote_errors_total'
+        :param description: Help text
+        :param labels: Label names, eg. ('network', )
+        :param callback: Returns {label values: value}, eg. lambda: {("1", ): 0.5}
+        """
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self.callback = callback
+
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(name, "") for name in self.labels)
+
+    def values(self) -> Dict[tuple, float]:
+        """Current value per combination of label values."""
+        return self.callback() if self.callback else dict(self._values)
+
+    def samples(self) -> List[str]:
+        values = self.values()
+
+        return [f"{self.name}{_format_labels(self.labels, key)} {value}" for key, value in values.items()]
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"] + self.samples()
+
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    """Value that only goes up, eg. number of errors."""
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        """
+        :param amount: Amount to add
+        :param labels: Label values, eg. network="1"
+        """
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """Value that goes up & down, eg. age of an order book."""
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        """
+        :param value: New value
+        :param labels: Label values, eg. symbol="ETHUSDT"
+        """
+        self._values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    """Distribution of observed values in cumulative buckets, eg. request latency."""
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str, labels: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        """
+        :param name: Metric name, eg. 'quote_latency_seconds'
+        :param description: Help text
+        :param labels: Label names, eg. ('network', )
+        :param buckets: Upper bounds of the buckets, ascending
+        """
+        super().__init__(name, description, labels)
+        self.buckets = tuple(sorted(buckets))
+
+        # Per label values: count per bucket, last one is +Inf, then sum
+        self._observations: Dict[tuple, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        """
+        :param value: Observed value, eg. latency in secs
+        :param labels: Label values, eg. network="1"
+        """
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+
+        with self._lock:
+            observations = self._observations.get(key)
+            if observations is None:
+                observations = ([0] * (len(self.buckets) + 1), [0.0])
+                self._observations[key] = observations
+
+            observations[0][index] += 1
+            observations[1][0] += value
+
+    def totals(self) -> Dict[tuple, Tuple[int, float]]:
+        """Number & sum of observations per combination of label values."""
+        with self._lock:
+            return {key: (sum(counts), total[0]) for key, (counts, total) in self._observations.items()}
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            observations = {key: (list(counts), total[0]) for key, (counts, total) in self._observations.items()}
+
+        lines = []
+        for key, (counts, total) in observations.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"), ), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound}"
+                bucket_labels = _format_labels(self.labels, key, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {cumulative}")
+
+        return lines
+
+
+class MetricsRegistry:
+    """All metrics of a process, rendered in Prometheus text format and optionally served over HTTP."""
+
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+        self.routes: Dict[str, Callable[[], str]] = {}
+        self._server: ThreadingHTTPServer | None = None
+
+    def _register(self, metric: Metric) -> Metric:
+        # Registering again returns the existing metric so modules can declare what they use
+        return self.metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, description: str, labels: Tuple[str, ...] = (),
+                callback: Callable[[], Dict[tuple, float]] | None = None) -> Counter:
+        """Returns a counter, see Metric for arguments."""
+        return self._register(Counter(name, description, labels, callback))
+
+    def gauge(self, name: str, description: str, labels: Tuple[str, ...] = (),
+              callback: Callable[[], Dict[tuple, float]] | None = None) -> Gauge:
+        """Returns a gauge, see Metric for arguments."""
+        return self._register(Gauge(name, description, labels, callback))
+
+    def histogram(self, name: str, description: str, labels: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        """Returns a histogram, see Histogram for arguments."""
+        return self._register(Histogram(name, description, labels, buckets))
+
+    def add_route(self, path: str, callback: Callable[[], str]) -> None:
+        """
+        Serves JSON returned by a callback next to the metrics, eg. a health record.
+
+        :param path: URL path, eg. '/health'
+        :param callback: Returns the response body
+        """
+        self.routes[path] = callback
+
+    def render(self) -> str:
+        """All metrics in Prometheus text format."""
+        return "\n".join(metric.render() for metric in self.metrics.values()) + "\n"
+
+    def serve(self, port: int = 9100, host: str = "127.0.0.1") -> None:
+        """
+        Serves metrics on http://host:port/metrics and added routes from a daemon thread.
+        Does nothing if already serving.
+
+        :param port: Port to listen on
+        :param host: Address to listen on, local only by default
+        """
+        if self._server is not None:
+            return
+
+        registry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.split("?")[0]
+                if path in ("/", "/metrics"):
+                    body = registry.render().encode("utf-8")
+                    content_type = "text/plain; version=0.0.4; charset=utf-8"
+                elif path in registry.routes:
+                    body = registry.routes[path]().encode("utf-8")
+                    content_type = "application/json"
+                else:
+                    self.send_error(404)
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), MetricsHandler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="metrics-server", daemon=True).start()
+
+    def close(self) -> None:
+        """Stops serving metrics."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+# One metrics registry per process
+metrics = MetricsRegistry()
@@ -0,0 +1,233 @@
+import time
+import math
+import asyncio
+
+from typing import (
+    Dict,
+    List,
+    Tuple,
+)
+from aiohttp import (
+    ClientSession,
+    ClientError,
+    TCPConnector,
+)
+
+from src.projecthope.common.logger import log_error
+from src.projecthope.common.metrics import metrics
+from src.projecthope.common.variables import (
+    TOKEN,
+    TELEGRAM_API,
+    CHAT_ID_ALERTS,
+    CHAT_ID_DEBUG,
+    timeout_class,
+)
+
+# Telegram rejects longer messages
+MAX_MESSAGE_LENGTH = 4096
+
+
+def amount_bucket(amount: float, ratio: float = 2) -> int:
+    """
+    Groups amounts within a factor of 'ratio' of each other, used to tell repeated alerts apart.
+
+    :param amount: Amount, eg. swapped in amount
+    :param ratio: Width of a bucket, eg. 2 puts 1,000 to 1,999 in one bucket
+    :return: Bucket number
+    """
+    return math.floor(math.log(amount, ratio)) if amount > 0 else 0
+
+
+class AlertOutbox:
+    """
+    Queue of Telegram messages drained by one async worker with a pooled session.
+    Messages arriving within 'merge_window' secs for the same chat are merged into one,
+    each chat gets at most one message per 'chat_interval' secs and repeats of an alert key
+    within 'cooldown' secs are dropped.
+    """
+
+    def __init__(self, cooldown: float = 300, merge_window: float = 1, chat_interval: float = 3,
+                 maxsize: int = 1000, retries: int = 3):
+        """
+        :param cooldown: Secs during which an alert with the same key is not sent again
+        :param merge_window: Secs to wait for more messages to merge into the same Telegram message
+        :param chat_interval: Minimum secs between two messages to the same chat, Telegram allows about 20 a minute
+                              in group chats
+        :param maxsize: Maximum number of queued messages, new ones are dropped when full
+        :param retries: Number of attempts per message before it is dropped
+        """
+        self.cooldown = cooldown
+        self.merge_window = merge_window
+        self.chat_interval = chat_interval
+        self.maxsize = maxsize
+        self.retries = retries
+
+        self.sent = 0
+        self.suppressed = 0
+        self.dropped = 0
+
+        self._queue: asyncio.Queue | None = None
+        self._last_seen: Dict[tuple, float] = {}
+        self._next_send: Dict[str, float] = {}
+        self._worker: asyncio.Task | None = None
+
+    def configure(self, **settings) -> None:
+        """
+        Changes outbox settings, see constructor for arguments.
+        """
+        for key, value in settings.items():
+            if key not in ("cooldown", "merge_window", "chat_interval", "maxsize", "retries"):
+                raise Exception(f"Unknown alert setting '{key}'.")
+            setattr(self, key, value)
+
+    def put(self, message: str, key: tuple | None = None, debug: bool = False) -> bool:
+        """
+        Queues a message without waiting. Must be called from the outbox's event loop.
+
+        :param message: HTML text message to send
+        :param key: Identifies repeats of the same alert, eg. (pair, chain1, chain2, amount bucket)
+        :param debug: If true sends message to Telegram 'CHAT_ID_DEBUG' chat instead of 'CHAT_ID_ALERTS'
+        :return: True if the message was queued
+        """
+        now = time.monotonic()
+        if key is not None:
+            last_seen = self._last_seen.get(key)
+            if last_seen is not None and now - last_seen < self.cooldown:
+                self.suppressed += 1
+                return False
+
+        if self._queue is None:
+            self._queue = asyncio.Queue(self.maxsize)
+
+        try:
+            self._queue.put_nowait((CHAT_ID_DEBUG if debug else CHAT_ID_ALERTS, str(message)))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            log_error.warning("'AlertOutbox' - queue full, message dropped")
+            return False
+
+        # Only alerts actually queued start a cooldown, a dropped one may be sent by its next repeat
+        if key is not None:
+            self._last_seen[key] = now
+
+            # Forget keys once their cooldown is over so the dict does not grow forever
+            if len(self._last_seen) > 10 * self.maxsize:
+                self._last_seen = {k: t for k, t in self._last_seen.items() if now - t < self.cooldown}
+
+        return True
+
+    def start(self) -> asyncio.Task:
+        """
+        Starts the worker on the running event loop, does nothing if already running.
+
+        :return: Worker task
+        """
+        if self._queue is None:
+            self._queue = asyncio.Queue(self.maxsize)
+
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+
+        return self._worker
+
+    def stop(self) -> None:
+        """
+        Cancels the worker, messages still queued are kept for the next start.
+        """
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+
+    async def _collect(self) -> Dict[str, List[str]]:
+        """Waits for a message, then gathers everything arriving within the merge window by chat."""
+        chat_id, message = await self._queue.get()
+        batches: Dict[str, List[str]] = {chat_id: [message]}
+
+        deadline = time.monotonic() + self.merge_window
+        while (remaining := deadline - time.monotonic()) > 0:
+            try:
+                chat_id, message = await asyncio.wait_for(self._queue.get(), remaining)
+            except asyncio.TimeoutError:
+                break
+            batches.setdefault(chat_id, []).append(message)
+
+        return batches
+
+    @staticmethod
+    def _split(message: str) -> List[str]:
+        """Splits a message longer than the length limit at line breaks, so no HTML tag is cut in two."""
+        if len(message) <= MAX_MESSAGE_LENGTH:
+            return [message]
+
+        parts: List[str] = []
+        for line in message.split("\n"):
+            if parts and len(parts[-1]) + len(line) + 1 <= MAX_MESSAGE_LENGTH:
+                parts[-1] += f"\n{line}"
+            else:
+                # A single line over the limit has nowhere better to be split
+                parts.extend(line[i:i + MAX_MESSAGE_LENGTH] for i in range(0, max(len(line), 1), MAX_MESSAGE_LENGTH))
+
+        return parts
+
+    @classmethod
+    def _merge(cls, messages: List[str]) -> List[str]:
+        """Joins whole messages into as few Telegram messages as the length limit allows."""
+        merged: List[str] = []
+        for message in messages:
+            for part in cls._split(message):
+                if merged and len(merged[-1]) + len(part) + 2 <= MAX_MESSAGE_LENGTH:
+                    merged[-1] += f"\n\n{part}"
+                else:
+                    merged.append(part)
+
+        return merged
+
+    async def _send(self, session: ClientSession, chat_id: str, message: str) -> None:
+        url = f"{TELEGRAM_API}/bot{TOKEN}/sendMessage"
+        payload = {"chat_id": chat_id, "text": message, "disable_web_page_preview": "true", "parse_mode": "HTML"}
+
+        for attempt in range(1, self.retries + 1):
+            # Respect the per chat rate limit
+            wait = self._next_send.get(chat_id, 0.0) - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._next_send[chat_id] = time.monotonic() + self.chat_interval
+
+            try:
+                async with session.post(url, data=payload) as response:
+                    data = await response.json(content_type=None)
+
+                if data.get('ok'):
+                    self.sent += 1
+                    return
+
+                # Too many requests, Telegram says how long to wait
+                retry_after = (data.get('parameters') or {}).get('retry_after')
+                if retry_after:
+                    self._next_send[chat_id] = time.monotonic() + float(retry_after)
+
+                log_error.warning(f"'AlertOutbox' - Telegram message not sent, attempt {attempt}. "
+                                  f"{data.get('description')}")
+
+            except (ClientError, asyncio.TimeoutError, ValueError) as e:
+                log_error.warning(f"'AlertOutbox' - Telegram message not sent, attempt {attempt}. {e}")
+
+        self.dropped += 1
+
+    async def _run(self) -> None:
+        connector = TCPConnector(limit=10, keepalive_timeout=60)
+        async with ClientSession(connector=connector, timeout=timeout_class) as session:
+            while True:
+                batches: Dict[str, List[str]] = await self._collect()
+
+                # Chats are rate limited separately, send to them concurrently
+                sends: List[Tuple[str, str]] = [(chat_id, message) for chat_id, messages in batches.items()
+                                                for message in self._merge(messages)]
+                await asyncio.gather(*[self._send(session, chat_id, message) for chat_id, message in sends])
+
+
+# One alert outbox per process, runs on 'quote_client' event loop
+alert_outbox = AlertOutbox()
+metrics.counter("alerts_total", "Telegram alerts by outcome", ("status", ),
+                callback=lambda: {("sent", ): alert_outbox.sent, ("suppressed", ): alert_outbox.suppressed,
+                                  ("dropped", ): alert_outbox.dropped})
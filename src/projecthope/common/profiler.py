@@ -0,0 +1,119 @@
+import os
+import sys
+import time
+import signal
+import threading
+
+from collections import Counter
+from datetime import datetime
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of every thread from a background thread and writes them as collapsed stacks,
+    one 'thread;module:function;... count' line per stack, ready for flame graph tools.
+    Costs nothing while stopped. Toggle it with a signal to profile a running process.
+    """
+
+    def __init__(self, interval: float = 0.005, directory: str = "logs"):
+        """
+        :param interval: Secs between two samples
+        :param directory: Directory profiles are written to
+        """
+        self.interval = interval
+        self.directory = directory
+
+        self.samples: Counter = Counter()
+        self.started_at: float | None = None
+
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        # Held while stopping & writing, so a second toggle neither stops twice nor restarts mid write
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _sample(self) -> None:
+        own_id = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id:
+                continue
+
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+
+            stack.append(names.get(thread_id, str(thread_id)))
+            self.samples[";".join(reversed(stack))] += 1
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self) -> None:
+        """Starts sampling, does nothing if already running or a profile is being written."""
+        # Never wait here, it is called from a signal handler
+        if not self._lock.acquire(blocking=False):
+            return
+
+        try:
+            if self.running:
+                return
+
+            self.samples.clear()
+            self.started_at = time.time()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+        finally:
+            self._lock.release()
+
+    def stop(self) -> str | None:
+        """
+        Stops sampling and writes the collapsed stacks.
+
+        :return: Path of the written profile, None if it was not running
+        """
+        with self._lock:
+            if not self.running:
+                return None
+
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+            timestamp = datetime.fromtimestamp(self.started_at).strftime("%Y%m%d-%H%M%S")
+            path = os.path.join(self.directory, f"profile-{os.getpid()}-{timestamp}.folded")
+            with open(path, "w") as file:
+                file.writelines(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+            total = sum(self.samples.values())
+
+        print(f"Profile written to {path} ({total} samples)")
+
+        return path
+
+    def toggle(self, *_) -> None:
+        """Starts sampling if stopped, otherwise stops and writes the profile. Usable as a signal handler."""
+        if self.running:
+            # Writing may take a moment, keep it out of the signal handler's frame
+            threading.Thread(target=self.stop, name="profile-writer", daemon=True).start()
+        else:
+            self.start()
+
+    def install_signal(self, signum: int = signal.SIGUSR2) -> None:
+        """
+        Toggles the profiler on a signal, eg. 'kill -USR2 <pid>'. Must be called from the main thread.
+
+        :param signum: Signal number
+        """
+        signal.signal(signum, self.toggle)
+
+
+# One profiler per process
+profiler = SamplingProfiler()
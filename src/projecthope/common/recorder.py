@@ -0,0 +1,364 @@
+import os
+import json
+import time
+import zipfile
+import threading
+
+from array import array
+from queue import (
+    Full,
+    Empty,
+    Queue,
+)
+from typing import (
+    Dict,
+    List,
+    Tuple,
+)
+from datetime import datetime
+
+from src.projecthope.common.logger import log_error
+
+# Column types: array typecodes plus 'str', stored as int codes into a list of categories
+STRING = "str"
+
+# Estimated memory of a buffered row and of each value in it, a float object plus its reference
+ROW_BYTES = 128
+VALUE_BYTES = 32
+
+
+class ColumnRecorder:
+    """
+    Records rows into append-only segment files, one compressed zip per segment with one binary array per column.
+    Recording only appends a row to a buffer, full buffers are converted & written by a background thread.
+    A buffer is full at 'segment_rows' rows or once its estimated memory reaches 'max_bytes'.
+    When the writer falls behind by more than 'max_segments' the newest buffer is dropped instead of waiting.
+    """
+
+    def __init__(self, kind: str, columns: List[Tuple[str, str, int]], directory: str = "data",
+                 segment_rows: int = 50000, flush_interval: float = 60, max_segments: int = 4,
+                 max_bytes: int = 16 * 1024 * 1024):
+        """
+        :param kind: Record type, used in file names, eg. 'books'
+        :param columns: (name, type, width) of every column. Type is an array typecode, eg. 'd', or 'str'.
+                        Columns wider than 1 take a sequence of 'width' values per row.
+                        The first column is the time a row was recorded at
+        :param directory: Directory segments are written to
+        :param segment_rows: Number of rows per segment
+        :param flush_interval: Secs after which a partial segment is written anyway
+        :param max_segments: Maximum number of segments waiting to be written
+        :param max_bytes: Estimated memory of buffered rows at which a segment is written anyway
+        """
+        self.kind = kind
+        self.columns = columns
+        self.directory = directory
+        self.segment_rows = segment_rows
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+
+        self.enabled = False
+        self.recorded = 0
+        self.dropped = 0
+        self.segments = 0
+
+        self._rows: list = []
+        self._max_rows = segment_rows
+        self._lock = threading.Lock()
+        self._queue: Queue = Queue(max_segments)
+        self._thread: threading.Thread | None = None
+        self._flushed_at = time.monotonic()
+
+    def configure(self, directory: str | None = None, segment_rows: int | None = None,
+                  flush_interval: float | None = None, max_bytes: int | None = None) -> None:
+        """
+        Changes recorder settings, see constructor for arguments.
+        """
+        if directory:
+            self.directory = directory
+        if segment_rows:
+            self.segment_rows = segment_rows
+        if flush_interval:
+            self.flush_interval = flush_interval
+        if max_bytes:
+            self.max_bytes = max_bytes
+
+    @property
+    def row_bytes(self) -> int:
+        """Estimated memory of one buffered row."""
+        return ROW_BYTES + VALUE_BYTES * sum(width for _, _, width in self.columns)
+
+    def start(self) -> None:
+        """Starts recording and the writer thread, does nothing if already running."""
+        if self._thread and self._thread.is_alive():
+            return
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._max_rows = max(1, min(self.segment_rows, self.max_bytes // self.row_bytes))
+        self.enabled = True
+        self._thread = threading.Thread(target=self._run, name=f"recorder-{self.kind}", daemon=True)
+        self._thread.start()
+
+    def record(self, *row) -> None:
+        """
+        Records a row, values in the order of 'columns'. Does nothing while stopped.
+        """
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._rows.append(row)
+            if len(self._rows) < self._max_rows:
+                return
+            rows, self._rows = self._rows, []
+
+        self._submit(rows)
+
+    def _submit(self, rows: list) -> None:
+        try:
+            self._queue.put_nowait(rows)
+        except Full:
+            self.dropped += len(rows)
+
+    def flush(self) -> None:
+        """Hands the current partial segment to the writer."""
+        with self._lock:
+            rows, self._rows = self._rows, []
+
+        if rows:
+            self._submit(rows)
+
+    def _run(self) -> None:
+        while True:
+            wait = max(0.0, self.flush_interval - (time.monotonic() - self._flushed_at))
+            try:
+                rows = self._queue.get(timeout=wait)
+            except Empty:
+                # Nothing filled up in time, write what there is
+                self._flushed_at = time.monotonic()
+                self.flush()
+                continue
+
+            if rows is None:
+                return
+
+            try:
+                self.write_segment(rows)
+            except (OSError, ValueError, TypeError) as e:
+                self.dropped += len(rows)
+                log_error.warning(f"'ColumnRecorder' Error - could not write {self.kind} segment - {e}")
+
+    def write_segment(self, rows: list) -> str:
+        """
+        Writes rows as one segment file. Written to a temp file first, so readers only see whole segments.
+
+        :param rows: Rows to write
+        :return: Path of the segment
+        """
+        meta = {"kind": self.kind, "rows": len(rows), "created": time.time(), "start": rows[0][0], "end": rows[-1][0],
+                "columns": [[name, typecode, width] for name, typecode, width in self.columns], "categories": {}}
+
+        timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        path = os.path.join(self.directory, f"{self.kind}-{os.getpid()}-{timestamp}-{self.segments:05}.zip")
+
+        with zipfile.ZipFile(f"{path}.tmp", "w", compression=zipfile.ZIP_DEFLATED, compresslevel=6) as segment:
+            for index, (name, typecode, width) in enumerate(self.columns):
+                if typecode == STRING:
+                    # Dictionary encode strings
+                    categories: Dict[str, int] = {}
+                    values = array("i", (categories.setdefault(row[index], len(categories)) for row in rows))
+                    meta["categories"][name] = list(categories)
+                elif width > 1:
+                    values = array(typecode)
+                    for row in rows:
+                        values.extend(row[index])
+                else:
+                    values = array(typecode, (row[index] for row in rows))
+
+                segment.writestr(f"{name}.bin", values.tobytes())
+
+            segment.writestr("meta.json", json.dumps(meta))
+
+        os.replace(f"{path}.tmp", path)
+        self.segments += 1
+        self.recorded += len(rows)
+
+        return path
+
+    def stop(self) -> None:
+        """Writes buffered rows and stops the writer thread."""
+        if not self.enabled:
+            return
+
+        self.enabled = False
+        self.flush()
+        self._queue.put(None)
+        self._thread.join(timeout=30)
+
+
+def read_segment(path: str) -> Dict[str, list | array]:
+    """
+    Reads a segment written by ColumnRecorder.
+
+    :param path: Segment file
+    :return: Dictionary of column name to values. Columns wider than 1 are flat, 'width' values per row
+    """
+    with zipfile.ZipFile(path) as segment:
+        meta = json.loads(segment.read("meta.json"))
+
+        columns = {}
+        for name, typecode, width in meta["columns"]:
+            values = array("i" if typecode == STRING else typecode)
+            values.frombytes(segment.read(f"{name}.bin"))
+
+            if typecode == STRING:
+                categories = meta["categories"][name]
+                columns[name] = [categories[code] for code in values]
+            else:
+                columns[name] = values
+
+    return columns
+
+
+def read_meta(path: str) -> dict:
+    """
+    Reads only the metadata of a segment: kind, number of rows, columns & first and last row time.
+
+    :param path: Segment file
+    :return: Metadata dictionary
+    """
+    with zipfile.ZipFile(path) as segment:
+        return json.loads(segment.read("meta.json"))
+
+
+def list_segments(directory: str, kind: str) -> List[str]:
+    """
+    Lists written segments of a record type, oldest first.
+
+    :param directory: Directory segments were written to
+    :param kind: Record type, eg. 'books'
+    :return: Segment paths
+    """
+    if not os.path.isdir(directory):
+        return []
+
+    names = [name for name in os.listdir(directory) if name.startswith(f"{kind}-") and name.endswith(".zip")]
+
+    # File names sort by pid first, order by write time instead
+    paths = [os.path.join(directory, name) for name in names]
+
+    return sorted(paths, key=os.path.getmtime)
+
+
+def book_columns(depth: int) -> List[Tuple[str, str, int]]:
+    """
+    Columns of a book record.
+
+    :param depth: Book levels recorded per side
+    :return: (name, type, width) of every column
+    """
+    return [
+        ("received", "d", 1),
+        ("event_time", "q", 1),
+        ("update_id", "q", 1),
+        ("symbol", STRING, 1),
+        ("bid_prices", "d", depth),
+        ("bid_quantities", "d", depth),
+        ("ask_prices", "d", depth),
+        ("ask_quantities", "d", depth),
+    ]
+
+
+# Book levels recorded per side by default, at most as many as the stream process publishes
+BOOK_DEPTH = 100
+
+# Estimated memory of a buffered book level, a [price, quantity] list plus its reference
+LEVEL_BYTES = 80
+
+
+class BookRecorder(ColumnRecorder):
+    """
+    Records order book updates with 'depth' levels per side, as price & quantity columns padded with NaN.
+    Rows keep the book's level lists as they are, the writer thread splits them into columns.
+    """
+
+    def __init__(self, depth: int = BOOK_DEPTH, **settings):
+        """
+        :param depth: Book levels recorded per side
+        :param settings: See 'ColumnRecorder'
+        """
+        super().__init__("books", book_columns(depth), **settings)
+        self.depth = depth
+
+    def configure(self, book_depth: int | None = None, **settings) -> None:
+        """
+        Changes recorder settings, see 'ColumnRecorder' for arguments. Must be called before 'start'.
+
+        :param book_depth: Book levels recorded per side
+        """
+        if book_depth:
+            self.depth = book_depth
+            self.columns = book_columns(book_depth)
+
+        super().configure(**settings)
+
+    @property
+    def row_bytes(self) -> int:
+        """Estimated memory of one buffered row."""
+        return ROW_BYTES + 2 * self.depth * LEVEL_BYTES
+
+    def record(self, received: float, event_time: int, update_id: int, symbol: str,
+               bids: List[list], asks: List[list]) -> None:
+        """
+        Records a book update. Does nothing while stopped.
+
+        :param received: Time the update was received at
+        :param event_time: Binance event time in ms
+        :param update_id: Last update id applied to the book
+        :param symbol: Trading pair, eg. 'ETHUSDT'
+        :param bids: Bids, highest first, as [[price, quantity], ...]
+        :param asks: Asks, lowest first, as [[price, quantity], ...]
+        """
+        if self.enabled:
+            super().record(received, event_time, update_id, symbol, bids[:self.depth], asks[:self.depth])
+
+    def write_segment(self, rows: list) -> str:
+        """
+        Writes book updates as one segment file, see 'ColumnRecorder.write_segment'.
+
+        :param rows: Rows to write
+        :return: Path of the segment
+        """
+        rows = [(*row[:4], *book_levels(row[4], self.depth), *book_levels(row[5], self.depth)) for row in rows]
+
+        return super().write_segment(rows)
+
+
+# Every Binance book update, recorded by the stream process
+book_recorder = BookRecorder()
+
+# Every 1inch quote sent, recorded by the screener process. Failed quotes have a NaN amount out
+quote_recorder = ColumnRecorder("quotes", [
+    ("received", "d", 1),
+    ("network", STRING, 1),
+    ("from_token", STRING, 1),
+    ("to_token", STRING, 1),
+    ("amount_in", "d", 1),
+    ("amount_out", "d", 1),
+    ("gas_amount", "q", 1),
+    ("usdt_cost", "d", 1),
+    ("latency", "d", 1),
+])
+
+
+def book_levels(levels: List[list], depth: int = BOOK_DEPTH) -> Tuple[List[float], List[float]]:
+    """
+    Splits book levels into fixed width price & quantity columns, padded with NaN.
+
+    :param levels: Levels as [[price, quantity], ...]
+    :param depth: Number of levels to keep
+    :return: Prices, quantities
+    """
+    levels = levels[:depth]
+    padding = [float("nan")] * (depth - len(levels))
+
+    return [level[0] for level in levels] + padding, [level[1] for level in levels] + padding
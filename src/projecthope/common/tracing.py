@@ -0,0 +1,157 @@
+import time
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import (
+    Dict,
+    List,
+)
+
+from src.projecthope.common.logger import log_trace
+
+
+class Span:
+    """Timed section of a screening, with the spans started inside it as children."""
+    __slots__ = ("name", "attrs", "start", "end", "children")
+
+    def __init__(self, name: str, attrs: dict | None = None):
+        """
+        :param name: Span name, usually the traced function's name
+        :param attrs: Extra info shown in breakdowns, eg. {"pair": "CVXUSDT"}
+        """
+        self.name = name
+        self.attrs = attrs
+        self.start = time.perf_counter()
+        self.end: float | None = None
+        self.children: List[Span] = []
+
+    @property
+    def duration(self) -> float:
+        """Secs the span took, or has taken so far if still running."""
+        return (self.end or time.perf_counter()) - self.start
+
+    @property
+    def label(self) -> str:
+        if not self.attrs:
+            return self.name
+
+        return f"{self.name}[{', '.join(f'{key}={value}' for key, value in self.attrs.items())}]"
+
+
+class Tracer:
+    """
+    Records nested spans of a screening loop. Spans are only recorded inside a root span,
+    so traced functions cost almost nothing when tracing is off. The current span is kept in a
+    context variable, so spans started in gathered tasks attach to the span that started the tasks.
+    Roots slower than their threshold are written to the trace log as a breakdown.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.thresholds: Dict[str, float] = {}
+        self.slowest = 5
+
+        self._current: ContextVar[Span | None] = ContextVar("current_span", default=None)
+
+    def configure(self, slow_loop: float = 30, slow_pair: float = 10, slowest: int = 5) -> None:
+        """
+        Turns tracing on.
+
+        :param slow_loop: Loops taking longer than this many secs are written to the trace log
+        :param slow_pair: Pair screenings taking longer than this many secs are written to the trace log
+        :param slowest: Number of slowest child spans listed in a loop's breakdown
+        """
+        self.enabled = True
+        self.thresholds = {"loop": slow_loop, "screen_pair": slow_pair}
+        self.slowest = slowest
+
+    @property
+    def active(self) -> bool:
+        """True inside a root span."""
+        return self._current.get() is not None
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        """
+        Records a span as a child of the current one. Does nothing outside a root span.
+
+        :param name: Span name
+        :param attrs: Extra info shown in breakdowns
+        """
+        parent = self._current.get()
+        if parent is None:
+            yield None
+            return
+
+        span = Span(name, attrs or None)
+        parent.children.append(span)
+        token = self._current.set(span)
+        try:
+            yield span
+        finally:
+            span.end = time.perf_counter()
+            self._current.reset(token)
+
+    @contextmanager
+    def root(self, name: str, **attrs):
+        """
+        Records a span that other spans attach to, eg. a loop or a pair's screening.
+        Nested in another root it is recorded as a child instead.
+
+        :param name: Span name, 'loop' & 'screen_pair' have slow thresholds
+        :param attrs: Extra info shown in breakdowns
+        """
+        if not self.enabled:
+            yield None
+            return
+
+        parent = self._current.get()
+        span = Span(name, attrs or None)
+        if parent is not None:
+            parent.children.append(span)
+
+        token = self._current.set(span)
+        try:
+            yield span
+        finally:
+            span.end = time.perf_counter()
+            self._current.reset(token)
+
+            threshold = self.thresholds.get(name)
+            if threshold is not None and span.duration >= threshold:
+                log_trace.info(self.breakdown(span))
+
+    def breakdown(self, root: Span) -> str:
+        """
+        Formats a span tree: time per call path with call counts, then the slowest direct children.
+
+        :param root: Span to break down
+        :return: Multi line text
+        """
+        paths: Dict[str, list] = {}
+
+        def walk(span: Span, path: str) -> None:
+            path = f"{path}/{span.name}" if path else span.name
+            totals = paths.setdefault(path, [0, 0.0, 0.0])
+            totals[0] += 1
+            totals[1] += span.duration
+            totals[2] = max(totals[2], span.duration)
+            for child in span.children:
+                walk(child, path)
+
+        walk(root, "")
+
+        lines = [f"Slow {root.label} - {root.duration:,.3f} secs", "calls    total     max  path"]
+        lines += [f"{calls:>5} {total:>8.3f} {longest:>7.3f}  {path}"
+                  for path, (calls, total, longest) in paths.items()]
+
+        slowest = sorted(root.children, key=lambda child: child.duration, reverse=True)[:self.slowest]
+        if slowest:
+            lines.append("slowest:")
+            lines += [f"  {child.duration:,.3f} secs  {child.label}" for child in slowest]
+
+        return "\n".join(lines)
+
+
+# One tracer per process
+tracer = Tracer()
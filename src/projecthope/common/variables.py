@@ -24,9 +24,15 @@ CHAT_ID_DEBUG = os.getenv("CHAT_ID_DEBUG")
 BINANCE_KEY = os.getenv("BINANCE_KEY")
 BINANCE_SECRET = os.getenv("BINANCE_SECRET")
 
+# API endpoints, can be pointed at local stand-ins, eg. by 'benchmarks/e2e.py'
+ONE_INCH_API = os.getenv("ONE_INCH_API", "https://api.1inch.io")
+BINANCE_API = os.getenv("BINANCE_API", "https://api.binance.com")
+BINANCE_STREAM = os.getenv("BINANCE_STREAM", "wss://stream.binance.com:9443")
+TELEGRAM_API = os.getenv("TELEGRAM_API", "https://api.telegram.org")
 
-# Set-up memcached client instance
-memcache = PooledClient(('localhost', 11211), connect_timeout=3, timeout=3)
+
+# Set-up memcached client instance. Errors are ignored so a missing daemon behaves like an empty cache
+memcache = PooledClient(('localhost', 11211), connect_timeout=3, timeout=3, ignore_exc=True)
 
 # Set up and configure requests session
 http_session = Session()
@@ -72,3 +78,18 @@ network_names = {
 }
 
 base_tokens = ['USDC', 'USDT', 'DAI', 'BUSD']
+
+# Binance pair used to price each network's native gas token, None if gas is paid in a stablecoin
+native_symbols = {
+    "1": "ETHUSDT",
+    "56": "BNBUSDT",
+    "137": "MATICUSDT",
+    "10": "ETHUSDT",
+    "42161": "ETHUSDT",
+    "43114": "AVAXUSDT",
+    "250": "FTMUSDT",
+    "100": None,
+}
+
+# Binance pairs streamed for fee calculation on top of the traded pairs
+fee_symbols = sorted({symbol for symbol in native_symbols.values() if symbol})
@@ -1,93 +1,106 @@
+import time
 import asyncio
 
 from datetime import datetime
 from typing import List
 
-from src.projecthope.datatypes import Swap
+from src.projecthope.datatypes import (
+    Swap,
+    Arbitrage,
+)
+from src.projecthope.binance.codec import decode_book
 from src.projecthope.binance.api import (
     trade_a_for_b,
     trade_b_for_a,
+    get_order_book_async,
 )
-from src.projecthope.one_inch.api import get_swapout
-from src.projecthope.common.message import telegram_send_message
-from src.projecthope.common.logger import log_arbitrage
-from src.projecthope.common.helpers import (
-    parse_args_1inch,
-    gather_funcs,
+from src.projecthope.one_inch.api import get_route_swapouts
+from src.projecthope.one_inch.routes import route_table
+from src.projecthope.one_inch.client import quote_client
+from src.projecthope.blockchain.costs import chain_costs
+from src.projecthope.common.outbox import (
+    alert_outbox,
+    amount_bucket,
 )
+from src.projecthope.common.logger import log_arbitrage
+from src.projecthope.common.decorators import traced
+from src.projecthope.common.metrics import metrics
 from src.projecthope.common.variables import (
     time_format,
     base_tokens,
-    memcache,
 )
 
 
-def max_swaps(swap_list: list, amounts: list | float) -> list[Swap]:
+stage_latency = metrics.histogram("screening_stage_seconds", "Duration of each screening stage", ("stage", ))
+book_age = metrics.gauge("book_age_seconds", "Age of the Binance order book read by the screener", ("symbol", ))
+
+
+def net_amount(swap: Swap) -> float:
     """
-    Analyses a list of swaps and returns the one with maximum amount in their respective range.
+    Amount out of a swap after its network cost, in the token swapped out.
+    Costs can only be converted if one side of the swap is a stablecoin, otherwise the gross amount is returned.
 
-    :param swap_list: List containing swaps
-    :param amounts: Range amounts for swaps
-    :return: List of maximum swap_data for each swap amount respectively
+    :param swap: Swap dataclass
+    :return: Net amount out
     """
-    def compare_swap_fees(swaps: dict) -> Swap:
+    usdt_cost = swap.cost.usdt_cost
+    if not usdt_cost:
+        return swap.to_token.amount
 
-        highest_amount: float = max(swaps)
-        highest_swap: Swap = swaps[highest_amount]
+    if swap.to_token.name in base_tokens:
+        return swap.to_token.amount - usdt_cost
 
-        # If highest arb is on Ethereum check txn cost
-        if int(highest_swap.id) == 1 and len(swaps) > 1 and highest_swap.cost['usdt_cost']:
-            # Get second highest amount
-            second_amount = sorted(swaps)[-2]
-            second_swap = swaps[second_amount]
+    if swap.from_token.name in base_tokens:
+        # Convert cost to the swapped out token at the swap's own price
+        return swap.to_token.amount - usdt_cost * swap.to_token.amount / swap.from_token.amount
 
-            # Calculate Stablecoin to Token ratio to adjust accordingly
-            if highest_swap.from_token.name in base_tokens:
-                stable_token_ratio = highest_swap.from_token.amount / highest_swap.to_token.amount
-            elif highest_swap.to_token.name in base_tokens:
-                stable_token_ratio = 1
-            else:
-                # If not swapping a stable coin - return highest_swap and don't compare with fees
-                return highest_swap
+    return swap.to_token.amount
 
-            # Calculate token - fees difference
-            difference_amount = (highest_amount - second_amount) * stable_token_ratio
-            if difference_amount > highest_swap.cost['usdt_cost']:
-                return highest_swap
-            else:
-                return second_swap
 
-        else:
-            return highest_swap
+@traced
+def max_swaps(swap_list: list, amounts: list | float) -> list[Swap]:
+    """
+    Analyses a list of swaps and returns the one with maximum net of cost amount in their respective range.
+    Swaps with identical net amounts out are ranked by lower USDT cost, then by their order in swap_list.
+
+    :param swap_list: List containing swaps
+    :param amounts: Range amounts for swaps
+    :return: List of maximum swap_data for each swap amount respectively
+    """
+    def best_swap(swaps: List[Swap]) -> Swap:
+        # max keeps the first of equal keys, so earlier swaps win full ties
+        return max(swaps, key=lambda swap: (net_amount(swap), -(swap.cost.usdt_cost or 0.0)))
 
     swaps_amounts: list = []
 
     if type(amounts) is list or type(amounts) is tuple:
-        for amount in amounts:
-            # Create dict{swap_max_amount: swap_data} if swap not None
-            all_swaps = {swap.to_token.amount: swap for swap in swap_list
-                         if swap and swap.from_token.amount == amount}
+        # Group swaps by amount swapped in, in a single pass
+        groups = {amount: [] for amount in amounts}
+        for swap in swap_list:
+            if swap and swap.from_token.amount in groups:
+                groups[swap.from_token.amount].append(swap)
 
-            # Compare ethereum fees if all_swaps is not empty
-            if len(all_swaps) > 0:
-                max_swap = compare_swap_fees(all_swaps)
-                swaps_amounts.append(max_swap)
+        for amount in amounts:
+            # Pick the best swap if there are any for this range
+            if len(groups[amount]) > 0:
+                swaps_amounts.append(best_swap(groups[amount]))
 
     else:
-        # Create dict{swap_max_amount: swap_data} if swap not None
-        all_swaps = {swap.to_token.amount: swap for swap in swap_list if swap}
+        all_swaps = [swap for swap in swap_list if swap]
 
-        # Compare ethereum fees if all_swaps is not empty
+        # Pick the best swap if all_swaps is not empty
         if len(all_swaps) > 0:
-            max_swap = compare_swap_fees(all_swaps)
+            max_swap = best_swap(all_swaps)
             swaps_amounts.append(max_swap)
 
     return swaps_amounts
 
 
-def compare_swaps(data: dict, base_token: str, arb_token: str) -> List[List[Swap]] | None:
+@traced
+async def compare_swaps_async(data: dict, base_token: str, arb_token: str) -> List[List[Swap]] | None:
     """
     Compares 1inch supported blockchains and Binance CEX for arbitrage between 2 tokens.
+    Coroutine version, must run on 'quote_client' event loop.
 
     :param data: Input dictionary data
     :param base_token: Name of Base token being swapped in
@@ -95,13 +108,20 @@ def compare_swaps(data: dict, base_token: str, arb_token: str) -> List[List[Swap
     :return: List [max_Swap_ab, max_Swap_ba]
     """
     all_max_swaps: list = []
+    symbol = f"{arb_token}{base_token}"
 
     # Query all networks on 1inch for Base->Arb swap outs for each range respectively
-    args_ab, amounts = parse_args_1inch(data, base_token, arb_token)
-    results = asyncio.run(gather_funcs(get_swapout, args_ab))
+    start = time.perf_counter()
+    routes = route_table.get(data, base_token, arb_token)
+    amounts = routes.amounts
+    order_book_asks, results = await asyncio.gather(get_order_book_async(symbol),
+                                                    get_route_swapouts(routes.forward))
+    stage_latency.observe(time.perf_counter() - start, stage="forward_quotes")
+
+    if order_book_asks:
+        book_age.set(time.time() - decode_book(order_book_asks).event_time / 1000, symbol=symbol)
 
     # Get Binance CEX prices and combine with all swaps
-    order_book_asks: bytes = memcache.get(key=f"{arb_token}{base_token}", default=None)
     binance_swaps_ab = trade_b_for_a(arb_token, base_token, amounts, order_book_asks)
     swaps_ab = list(binance_swaps_ab) + list(results)
 
@@ -112,18 +132,23 @@ def compare_swaps(data: dict, base_token: str, arb_token: str) -> List[List[Swap
     if len(max_swaps_ab) == 0:
         return None
 
-    for max_swap_ab in max_swaps_ab:
-        # Save only 1 amount to query in Arb->Base
-        max_amount_ab = max_swap_ab.to_token.amount
+    # Save only 1 amount per range to query in Arb->Base
+    max_amounts_ab = [max_swap_ab.to_token.amount for max_swap_ab in max_swaps_ab]
 
-        # Query networks for Arb->Base swap out
-        args_ba, _ = parse_args_1inch(data, arb_token, base_token, max_amount_ab)
-        results = asyncio.run(gather_funcs(get_swapout, args_ba))
+    # Query networks for Arb->Base swap outs of every range in one concurrent batch
+    routes_ba = [route.with_amount(max_amount_ab) for max_amount_ab in max_amounts_ab for route in routes.reverse]
+    start = time.perf_counter()
+    order_book_bids, results = await asyncio.gather(get_order_book_async(symbol),
+                                                    get_route_swapouts(routes_ba))
+    stage_latency.observe(time.perf_counter() - start, stage="reverse_quotes")
 
-        # Get Binance CEX prices and a combine with all swaps
-        order_book_bids: bytes = memcache.get(key=f"{arb_token}{base_token}", default=None)
-        binance_swaps_ba = trade_a_for_b(arb_token, base_token, [max_amount_ab], order_book_bids)
-        swaps_ba = list(binance_swaps_ba) + list(results)
+    # Get Binance CEX prices for every range at once
+    binance_swaps_ba = trade_a_for_b(arb_token, base_token, max_amounts_ab, order_book_bids)
+
+    batch_size = len(routes.reverse)
+    for i, (max_swap_ab, max_amount_ab) in enumerate(zip(max_swaps_ab, max_amounts_ab)):
+        # Split batch results back into the range they were queried for
+        swaps_ba = binance_swaps_ba[i:i + 1] + list(results[i * batch_size:(i + 1) * batch_size])
 
         # Get the maximum swap out - should be list of only 1 item!
         max_swaps_ba = max_swaps(swaps_ba, max_amount_ab)
@@ -135,49 +160,98 @@ def compare_swaps(data: dict, base_token: str, arb_token: str) -> List[List[Swap
     return all_max_swaps
 
 
-def alert_arb(data: dict, base_token: str, arb_token: str) -> tuple:
+def compare_swaps(data: dict, base_token: str, arb_token: str) -> List[List[Swap]] | None:
+    """
+    Compares 1inch supported blockchains and Binance CEX for arbitrage between 2 tokens.
+    Blocking version of 'compare_swaps_async', safe to call from any thread.
+
+    :param data: Input dictionary data
+    :param base_token: Name of Base token being swapped in
+    :param arb_token: Name of token being Arbitraged
+    :return: List [max_Swap_ab, max_Swap_ba]
+    """
+    return quote_client.run(compare_swaps_async(data, base_token, arb_token))
+
+
+def price_arbitrages(max_swap_pairs: List[List[Swap]]) -> List[Arbitrage]:
+    """
+    Prices the arbitrage of every swap pair net of network & bridge fees in USDT, unknown gas costs count as 0.
+    Pairs are priced in order and stop at the first pair swapping on the same chain twice.
+
+    :param max_swap_pairs: List [max_Swap_ab, max_Swap_ba], see 'compare_swaps_async'
+    :return: List of Arbitrage dataclass
+    """
+    arbitrages: list = []
+
+    for swap_ab, swap_ba in max_swap_pairs:
+
+        # This may cause pairs to get 'skipped'!
+        if swap_ab.chain == swap_ba.chain:
+            break
+
+        arbitrage = swap_ba.to_token.amount - swap_ab.from_token.amount
+        fees = (swap_ab.cost.usdt_cost or 0) + (swap_ba.cost.usdt_cost or 0) + \
+            chain_costs.bridge_cost(swap_ab.id, swap_ba.id)
+
+        arbitrages.append(Arbitrage(swap_ab, swap_ba, arbitrage, fees))
+
+    return arbitrages
+
+
+def alert_key(arbitrage: Arbitrage) -> tuple:
+    """
+    Identifies repeats of the same alert: trading pair, chains & swap size within a factor of 2.
+
+    :param arbitrage: Arbitrage dataclass
+    :return: Key for 'AlertOutbox.put'
+    """
+    swap_ab = arbitrage.swap_ab
+
+    return (f"{swap_ab.to_token.name}{swap_ab.from_token.name}", swap_ab.chain, arbitrage.swap_ba.chain,
+            amount_bucket(swap_ab.from_token.amount))
+
+
+@traced
+async def alert_arb_async(data: dict, base_token: str, arb_token: str) -> tuple:
     """
     Alerts via Telegram for arbitrage between 2 tokens.
+    Coroutine version, must run on 'quote_client' event loop.
 
     :param data: Input dictionary data with coins
     :param base_token: Name of Base token being swapped in
     :param arb_token: Name of token being Arbitraged
-    :returns: Base token & Arb token
+    :returns: Base token, Arb token & highest arbitrage net of fees found, None if no swaps were compared
     """
     # Get arbitrage data pairs for each amount swapped
-    max_swap_pairs = compare_swaps(data['coins'], base_token, arb_token)
+    max_swap_pairs = await compare_swaps_async(data['coins'], base_token, arb_token)
 
     # If max_swap_pairs is an empty list - return
     if not max_swap_pairs:
-        return base_token, arb_token
-
-    for max_swap_pair in max_swap_pairs:
+        return base_token, arb_token, None
 
-        # Unpack values - A->B and B->A
-        swap_ab, swap_ba = max_swap_pair
+    min_arb = data['coins'][arb_token]['min_arb']
+    arbitrages = price_arbitrages(max_swap_pairs)
 
-        chain1 = swap_ab.chain
-        chain2 = swap_ba.chain
+    best_arbitrage = max((arbitrage.net for arbitrage in arbitrages), default=None)
 
-        # This may cause pairs to get 'skipped'!
-        if chain1 == chain2:
-            break
+    for arbitrage in arbitrages:
+        if arbitrage.net >= min_arb:
+            swap_ab, swap_ba = arbitrage.swap_ab, arbitrage.swap_ba
 
-        min_arb = data['coins'][arb_token]['min_arb']
+            chain1 = swap_ab.chain
+            chain2 = swap_ba.chain
 
-        base_swap_in = swap_ab.from_token.amount
-        base_swap_out = swap_ba.to_token.amount
-        arb_swap_out = swap_ab.to_token.amount
-        arb_swap_in = swap_ba.from_token.amount
+            base_swap_in = swap_ab.from_token.amount
+            base_swap_out = swap_ba.to_token.amount
+            arb_swap_out = swap_ab.to_token.amount
+            arb_swap_in = swap_ba.from_token.amount
 
-        arbitrage = base_swap_out - base_swap_in
-
-        if arbitrage >= min_arb:
+            fees = arbitrage.fees
             timestamp = datetime.now().astimezone().strftime(time_format)
 
             swap_1 = f"Buy {base_swap_in:,.0f} {base_token} -> {arb_swap_out:,.2f} <u>{arb_token}</u> on {chain1}"
             swap_2 = f"Sell {arb_swap_in:,.2f} <u>{arb_token}</u> -> {base_swap_out:,.0f} {base_token} on {chain2}"
-            arb_string = f"<b>{arbitrage:,.0f} {base_token}</b>"
+            arb_string = f"<b>{arbitrage.arbitrage:,.0f} {base_token}</b>"
 
             if chain1.lower() == "binancecex":
                 swap_1_link = f"1) <a href='https://www.binance.com/en/trade/{arb_token}_{base_token}'>{swap_1} 🟧</a>"
@@ -194,23 +268,27 @@ def alert_arb(data: dict, base_token: str, arb_token: str) -> tuple:
             telegram_msg = f"{timestamp}\n{swap_1_link}\n{swap_2_link}\n-->Arb. {arb_string}"
             terminal_msg = f"{swap_1}\n{swap_2}\n-->Arbitrage: {arb_string}"
 
-            # If any of the swaps are on Ethereum try to get gas cost in $
-            if int(swap_ab.id) == 1 or int(swap_ba.id) == 1:
-                if fee1 := swap_ab.cost.get('usdt_cost'):
-                    fee_msg = f", fees ~${fee1:,.0f}"
-                elif fee2 := swap_ba.cost.get('usdt_cost'):
-                    fee_msg = f", fees ~${fee2:,.0f}"
-                else:
-                    fee_msg = f", fees n/a"
-            else:
-                fee_msg = f", fees n/a"
+            fee_msg = f", fees ~${fees:,.0f}" if fees else ", fees n/a"
 
             telegram_msg += fee_msg
             terminal_msg += fee_msg
 
-            # Send arbitrage to ALL alerts channel and log
-            telegram_send_message(telegram_msg)
+            # Queue arbitrage for ALL alerts channel, repeats within the cooldown are dropped, and log
+            alert_outbox.put(telegram_msg, key=alert_key(arbitrage))
             log_arbitrage.info(terminal_msg)
             print(f"{terminal_msg}\n")
 
-    return base_token, arb_token
+    return base_token, arb_token, best_arbitrage
+
+
+def alert_arb(data: dict, base_token: str, arb_token: str) -> tuple:
+    """
+    Alerts via Telegram for arbitrage between 2 tokens.
+    Blocking version of 'alert_arb_async', safe to call from any thread.
+
+    :param data: Input dictionary data with coins
+    :param base_token: Name of Base token being swapped in
+    :param arb_token: Name of token being Arbitraged
+    :returns: Base token, Arb token & highest arbitrage net of fees found, None if no swaps were compared
+    """
+    return quote_client.run(alert_arb_async(data, base_token, arb_token))
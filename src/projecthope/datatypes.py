@@ -1,8 +1,17 @@
 from dataclasses import dataclass
-from typing import Dict
 
 
-@dataclass(frozen=True)
+@dataclass(slots=True)
+class Cost:
+    """Class for keeping track of swap costs.
+    Gas amount, Gas price in wei, Total cost in USDT, Exchange fee in swapped in token."""
+    gas_amount: int | None = None
+    gas_price: int | None = None
+    usdt_cost: float | None = None
+    exchange_fee: float = 0
+
+
+@dataclass(frozen=True, slots=True)
 class Token:
     """Class for keeping track of token data.
     Token name, Amount to swap, Token decimals"""
@@ -14,21 +23,21 @@ class Token:
         return f"{self.name} token"
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Swap:
     """Class for keeping track of swap data.
     Network name, Network id, Cost, FromToken, ToToken, remainder."""
     chain: str
     id: str
-    cost: Dict[str, int]
+    cost: Cost
     from_token: Token
     to_token: Token
     remainder: float = 0
 
     def __repr__(self):
         if self.chain.lower() == "binancecex":
-            price_per = (self.from_token.amount - self.cost["exchange_fee"]) / self.to_token.amount
-            fee = self.cost["exchange_fee"]
+            price_per = (self.from_token.amount - self.cost.exchange_fee) / self.to_token.amount
+            fee = self.cost.exchange_fee
         else:
             price_per = self.from_token.amount / self.to_token.amount
             fee = self.cost
@@ -37,3 +46,17 @@ class Swap:
                f"{self.to_token.amount:,.6f} {self.to_token.name} on " \
                f"{self.chain}(id: {self.id}), fee: {fee}, price per {self.to_token.name}: {price_per:,.6f}, " \
                f"remaining amount: {self.remainder:,.6f} {self.from_token.name}"
+
+
+@dataclass(frozen=True, slots=True)
+class Arbitrage:
+    """Class for keeping track of an arbitrage.
+    Base->Arb Swap, Arb->Base Swap, Arbitrage & Network and bridge fees, both in base token."""
+    swap_ab: Swap
+    swap_ba: Swap
+    arbitrage: float
+    fees: float = 0
+
+    @property
+    def net(self) -> float:
+        return self.arbitrage - self.fees
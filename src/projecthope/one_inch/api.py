@@ -1,96 +1,191 @@
-import ast
 import json
+import time
+import asyncio
 
+from time import perf_counter
+from typing import List
 from json.decoder import JSONDecodeError
-from aiohttp import ClientSession
 
 from src.projecthope.blockchain.evm import EvmContract
+from src.projecthope.one_inch.client import quote_client
+from src.projecthope.blockchain.costs import chain_costs
 from src.projecthope.datatypes import (
+    Cost,
     Token,
     Swap,
 )
-from src.projecthope.common.decorators import count_func_calls
+from src.projecthope.one_inch.cache import QuoteCache
+from src.projecthope.one_inch.routes import Route
+from src.projecthope.one_inch.health import (
+    Admission,
+    network_health,
+)
+from src.projecthope.one_inch.limiter import (
+    rate_limiter,
+    parse_retry_after,
+)
 from src.projecthope.common.logger import log_error
+from src.projecthope.common.decorators import traced
+from src.projecthope.common.metrics import metrics
+from src.projecthope.common.recorder import quote_recorder
 from src.projecthope.common.variables import (
+    ONE_INCH_API,
     network_ids,
-    memcache,
-    timeout_class,
 )
 
 
-# Create an EVM contract class
+# Create an EVM contract class, its gas oracle prices Ethereum swaps
 contract = EvmContract()
+chain_costs.add_oracle(contract.gas_oracle)
 
+# Source of quotes instead of the 1inch API, eg. 'replay.RecordedQuotes'. Unless set by 'use_quote_source'
+quote_source = None
 
-def get_ethusdt_price() -> float | None:
+
+def use_quote_source(source) -> None:
     """
-    Get the ETH/USDT price from Binance 'ETHUSDT' WebSocket stream.
+    Replaces 1inch API requests with a quote source in this process, eg. to replay recorded quotes.
+    Sources take a Route and return a Swap or None, they are not cached, rate limited or recorded.
+
+    :param source: Object with a 'get_swapout(route)' method, None to query the 1inch API again
     """
+    global quote_source
+    quote_source = source
 
-    order_book: bytes = memcache.get(key="ETHUSDT", default=None)
-    if not order_book:
-        return None
 
-    order_book: dict = ast.literal_eval(order_book.decode("utf-8"))  # Decode bytes string into a dictionary
-    try:
-        eth_usdt_price = float(order_book['bids'][0][0])
+quote_latency = metrics.histogram("quote_latency_seconds", "1inch quote request latency", ("network", ))
+quote_errors = metrics.counter("quote_errors_total", "Failed 1inch quotes by error type", ("network", "type"))
 
-        return eth_usdt_price
 
-    except Exception as e:
-        log_error.error(f"'get_ethusd_price' Error - can not query ETH/USDT price. {e}")
+@traced
+async def fetch_quote(network_id: str, payload: dict, description: str, timeout: float = 4,
+                      retries: int = 1) -> dict | None:
+    """
+    Sends a 1inch quote request through the network's rate limiter and circuit breaker.
 
-        return None
+    :param network_id: Network id
+    :param payload: Query parameters of the request
+    :param description: Swap description for log messages
+    :param timeout: Maximum time to wait for request, lowered automatically for fast networks
+    :param retries: Number of retries if rate limited (HTTP 429)
+    :return: Response data, None if the request failed
+    """
+    api = f"{ONE_INCH_API}/v4.0/{network_id}/quote"
 
+    limiter = rate_limiter.for_network(network_id)
+    health = network_health.for_network(network_id)
+    timeout = min(timeout, health.timeout)
 
-def get_eth_fees(cost: dict, gas_amount: int, bridge_fees_eth: float = 0.005510) -> dict:
-    """
-    Calculates fees on Ethereum in USDT. Adds 'gas_price' and 'usdc_cost' to cost dictionary.
-    Queries Binance WebSocket for ETH/USDT info then caches it.
+    for attempt in range(retries + 1):
+        # Wait for the network's rate limiter before sending
+        await limiter.acquire()
+        start = perf_counter()
+        status = None
+        retry_after = None
 
-    :param cost: Dictionary with cost data to transform
-    :param gas_amount: Gas amount for transaction to be executed
-    :param bridge_fees_eth: Eth bridge fees, default 0.005510 ETH
-    :return: Dictionary with updated cost data
-    """
+        try:
+            async with quote_client.session.get(api, ssl=False, params=payload, timeout=timeout) as response:
+                status = response.status
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                text = await response.text()
 
-    # Get ETH gas price from Web3. Result is cached for 1200 secs before querying again
-    gas_price = contract.eth_gas_price()
-    if gas_price:
-        cost['gas_price'] = gas_price
+        except Exception as e:
+            health.record_failure()
+            error_type = "timeout" if isinstance(e, asyncio.TimeoutError) else "connection"
+            quote_errors.inc(network=network_id, type=error_type)
+            log_error.warning(f"'get_swapout', 'async_http_session' Error - could not connect to "
+                              f"{api}?fromTokenAddress={payload['fromTokenAddress']}"
+                              f"&toTokenAddress={payload['toTokenAddress']}&amount={payload['amount']} - {e}")
+            return None
 
-        ethusdt_price = get_ethusdt_price()
-        if ethusdt_price:
-            gas_cost_usdt = ((gas_amount * gas_price) / 10 ** 18) * ethusdt_price
-            bridge_cost_usdt = bridge_fees_eth * ethusdt_price
+        finally:
+            await limiter.release(status, perf_counter() - start, retry_after)
 
-            cost['usdt_cost'] = gas_cost_usdt + bridge_cost_usdt
+        latency = perf_counter() - start
+        quote_latency.observe(latency, network=network_id)
+
+        # Server errors count against the network, client errors mean it answered
+        if status >= 500:
+            health.record_failure()
+            quote_errors.inc(network=network_id, type="server")
+        elif status == 429:
+            quote_errors.inc(network=network_id, type="rate_limited")
         else:
-            cost['usdt_cost'] = None
+            health.record_success(latency)
+
+        # Rate limited - try again once the limiter lets us through
+        if status == 429 and attempt < retries:
+            continue
+
+        try:
+            data = json.loads(text)
+        except JSONDecodeError as e:
+            quote_errors.inc(network=network_id, type="json")
+            log_error.warning(f"'get_swapout', 'JSONError', status: {status}, {api} - {description} - {e}")
+            return None
+
+        if status != 200:
+            if status < 500 and status != 429:
+                quote_errors.inc(network=network_id, type="response")
+            log_error.warning(f"'get_swapout', 'ResponseError', status: {status}, {data.get('error')} - "
+                              f"{description}")
+            return None
+
+        return data
+
 
-    else:
-        cost['gas_price'] = None
-        cost['usdt_cost'] = None
+# Background probes of networks with an open circuit breaker
+_probes: set = set()
 
-    return cost
 
+def probe_network(network_id: str, payload: dict, description: str) -> None:
+    """
+    Retries a quote on a network with an open circuit breaker in the background.
+    The result only updates the network's health, callers do not wait for it.
+
+    :param network_id: Network id
+    :param payload: Query parameters of the request
+    :param description: Swap description for log messages
+    """
+    task = asyncio.create_task(_probe(network_id, payload, description))
 
-@count_func_calls
+    # Keep a reference until the task is done so it is not garbage collected
+    _probes.add(task)
+    task.add_done_callback(_probes.discard)
+
+
+async def _probe(network_id: str, payload: dict, description: str) -> None:
+    health = network_health.for_network(network_id)
+    try:
+        await fetch_quote(network_id, payload, description, retries=0)
+
+    finally:
+        # Neither a response nor a failure was recorded, eg. rate limited (HTTP 429) or cancelled - the probe failed
+        if health.probing:
+            health.record_failure()
+
+
+@traced
+@QuoteCache(ttl=5, maxsize=4096)
 async def get_swapout(network_id: str, from_token: tuple, to_token: tuple,
-                      amount_float: float, timeout: int = 4, include_fees: bool = True) -> Swap | None:
+                      amount_float: float, timeout: int = 4, include_fees: bool = True,
+                      retries: int = 1, base_amount: int | None = None) -> Swap | None:
     """
     Queries https://app.1inch.io for swap_out amount between 2 tokens on a given network.
+    Must run on 'quote_client' event loop, which owns the pooled http session.
+    Results are cached for a few seconds, see 'get_swapout.cache'.
+    Networks that keep failing are skipped until a background probe succeeds.
 
     :param network_id: Network id
     :param from_token: From token (swap in). Tuple format (address, name, decimals)
     :param to_token: To token (swap out). Tuple format (address, name, decimals)
     :param amount_float: Amount to swap in
     :param timeout: Maximum time to wait for request
-    :param include_fees: Include Eth fees?
+    :param include_fees: Include network fees?
+    :param retries: Number of retries if rate limited (HTTP 429)
+    :param base_amount: Amount to swap in, in from token's base units. Computed from 'amount_float' if None
     :return: Swap dataclass: (network_name, network_id, cost, from_token, to_token)
     """
-    api = f"https://api.1inch.io/v4.0/{network_id}/quote"
-
     from_token_addr = str(from_token[0])
     from_token_name = from_token[1]
     from_token_decimal = int(from_token[2])
@@ -101,43 +196,41 @@ async def get_swapout(network_id: str, from_token: tuple, to_token: tuple,
 
     network_name = network_ids[str(network_id)]
 
-    amount = int(amount_float * (10 ** from_token_decimal))
+    amount = base_amount if base_amount is not None else int(amount_float * (10 ** from_token_decimal))
 
     payload = {"fromTokenAddress": from_token_addr,
                "toTokenAddress": to_token_addr,
                "amount": str(amount)}
+    description = f"{network_name}, {amount_float} {from_token_name} -> {to_token_name}"
 
-    async with ClientSession(timeout=timeout_class) as async_http_session:
-        try:
-            async with async_http_session.get(api, ssl=False, params=payload, timeout=timeout) as response:
-
-                try:
-                    data = json.loads(await response.text())
-                except JSONDecodeError as e:
-                    log_error.warning(f"'get_swapout', 'JSONError', status: {response.status}, {response.url} - "
-                                      f"{network_name}, {amount_float} {from_token_name} -> {to_token_name} - {e}")
-                    return None
+    admission = network_health.for_network(network_id).admit()
+    if admission is Admission.SKIP:
+        quote_errors.inc(network=network_id, type="circuit_open")
+        return None
 
-                if response.status != 200:
-                    log_error.warning(f"'get_swapout', 'ResponseError', status: {response.status}, {data['error']} - "
-                                      f"{network_name}, {amount_float} {from_token_name} -> {to_token_name}")
-                    return None
+    if admission is Admission.PROBE:
+        probe_network(network_id, payload, description)
+        return None
 
-        except Exception as e:
-            log_error.warning(f"'get_swapout', 'async_http_session' Error - could not connect to "
-                              f"{api}?fromTokenAddress={from_token_addr}"
-                              f"&toTokenAddress={to_token_addr}&amount={amount} - {e}")
-            return None
+    start = perf_counter()
+    data = await fetch_quote(network_id, payload, description, timeout, retries)
+    latency = perf_counter() - start
+    if not data:
+        quote_recorder.record(time.time(), network_id, from_token_name, to_token_name, amount_float,
+                              float("nan"), 0, float("nan"), latency)
+        return None
 
     swap_out = float(data['toTokenAmount'])
     swap_out_float = swap_out / (10 ** to_token_decimal)
 
     gas_amount = int(data['estimatedGas'])
-    cost = {"gas_amount": gas_amount}
 
-    # Calculate fees on Ethereum only and add to cost dictionary
-    if include_fees and int(network_id) == 1:
-        get_eth_fees(cost, gas_amount)
+    # Price gas on every network from cached gas & native token prices
+    cost = chain_costs.swap_cost(network_id, gas_amount) if include_fees else Cost(gas_amount=gas_amount)
+
+    usdt_cost = cost.usdt_cost if cost.usdt_cost is not None else float("nan")
+    quote_recorder.record(time.time(), network_id, from_token_name, to_token_name, amount_float, swap_out_float,
+                          gas_amount, usdt_cost, latency)
 
     from_token = Token(from_token_name, amount_float, from_token_decimal)
     to_token = Token(to_token_name, swap_out_float, to_token_decimal)
@@ -145,3 +238,34 @@ async def get_swapout(network_id: str, from_token: tuple, to_token: tuple,
     inch_swap = Swap(network_name, network_id, cost, from_token, to_token)
 
     return inch_swap
+
+
+async def get_route_swapouts(routes: List[Route]) -> tuple:
+    """
+    Queries 1inch for swap_out amounts of precompiled routes concurrently.
+
+    :param routes: List of routes, see 'one_inch.routes'
+    :return: Tuple of Swap dataclass or None, in the same order as routes
+    """
+    if quote_source is not None:
+        return tuple(quote_source.get_swapout(route) for route in routes)
+
+    return await asyncio.gather(*[get_swapout(route.network_id, route.from_token, route.to_token, route.amount,
+                                              base_amount=route.base_amount) for route in routes])
+
+
+metrics.counter("quote_cache_requests_total", "1inch quote cache lookups by result", ("result", ),
+                callback=lambda: {("hit", ): get_swapout.cache.hits, ("miss", ): get_swapout.cache.misses,
+                                  ("coalesced", ): get_swapout.cache.coalesced})
+metrics.gauge("network_breaker_open", "1 if the network's circuit breaker is open", ("network", ),
+              callback=lambda: {(network_id, ): int(health.is_open)
+                                for network_id, health in network_health.networks.items()})
+metrics.gauge("network_error_rate", "Share of recent 1inch requests that failed", ("network", ),
+              callback=lambda: {(network_id, ): health.error_rate
+                                for network_id, health in network_health.networks.items()})
+metrics.gauge("network_timeout_seconds", "Adaptive 1inch request timeout", ("network", ),
+              callback=lambda: {(network_id, ): health.timeout
+                                for network_id, health in network_health.networks.items()})
+metrics.gauge("rate_limiter_waiting", "Quotes waiting for the network's rate limiter", ("network", ),
+              callback=lambda: {(network_id, ): limiter.waiting
+                                for network_id, limiter in rate_limiter.networks.items()})
@@ -0,0 +1,125 @@
+import time
+import asyncio
+import functools
+
+from collections import OrderedDict
+from typing import (
+    Any,
+    Callable,
+    Hashable,
+    Awaitable,
+)
+
+
+# Result of an in-flight request whose owner was cancelled
+_ABANDONED = object()
+
+
+class QuoteCache:
+    """
+    Size-bounded LRU cache with a TTL for async quote functions.
+    Concurrent calls with the same arguments share a single in-flight request.
+    """
+
+    def __init__(self, ttl: float = 5, maxsize: int = 4096):
+        """
+        :param ttl: Seconds a quote stays valid for
+        :param maxsize: Maximum number of cached quotes, least recently used are evicted first
+        """
+        self.ttl = ttl
+        self.maxsize = maxsize
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+        self._entries: OrderedDict[Hashable, tuple] = OrderedDict()
+        self._in_flight: dict[Hashable, asyncio.Future] = {}
+
+    def __call__(self, func: Callable[..., Awaitable]) -> Callable[..., Awaitable]:
+        """Decorates an async function, caching its results by arguments."""
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            key = (args, tuple(sorted(kwargs.items())))
+
+            return await self.get(key, lambda: func(*args, **kwargs))
+
+        wrapper.cache = self
+
+        return wrapper
+
+    def configure(self, ttl: float | None = None, maxsize: int | None = None) -> None:
+        """
+        Changes cache settings and drops all cached quotes.
+
+        :param ttl: Seconds a quote stays valid for
+        :param maxsize: Maximum number of cached quotes
+        """
+        if ttl is not None:
+            self.ttl = ttl
+        if maxsize is not None:
+            self.maxsize = maxsize
+
+        self._entries.clear()
+
+    async def get(self, key: Hashable, factory: Callable[[], Awaitable]) -> Any:
+        """
+        Returns a cached value or awaits 'factory' to create it. None results are not cached.
+
+        :param key: Cache key
+        :param factory: Callable returning an awaitable for the value
+        :return: Cached or newly created value
+        """
+        while True:
+            entry = self._entries.get(key)
+            if entry and time.monotonic() - entry[0] <= self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+            # Same request already on its way - wait for it instead of sending another one
+            future = self._in_flight.get(key)
+            if future is None:
+                break
+
+            self.coalesced += 1
+            value = await asyncio.shield(future)
+            # Owner was cancelled before finishing, retry and send the request from here if nobody else has
+            if value is not _ABANDONED:
+                return value
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+
+        try:
+            value = await factory()
+
+        except asyncio.CancelledError:
+            # Only the owner is cancelled, waiting callers are released to retry
+            future.set_result(_ABANDONED)
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Mark as retrieved in case no other caller is waiting
+            raise
+        finally:
+            self._in_flight.pop(key, None)
+
+        future.set_result(value)
+
+        if value is not None:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+        return value
+
+    @property
+    def hit_rate(self) -> float:
+        """Share of lookups served without a new request."""
+        total = self.hits + self.coalesced + self.misses
+
+        return (self.hits + self.coalesced) / total if total else 0.0
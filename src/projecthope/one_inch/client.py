@@ -0,0 +1,92 @@
+import asyncio
+import threading
+
+from typing import (
+    Any,
+    Coroutine,
+)
+from aiohttp import (
+    ClientSession,
+    TCPConnector,
+)
+
+from src.projecthope.common.variables import timeout_class
+
+
+class QuoteClient:
+    """
+    Long-lived HTTP client for 1inch quotes.
+    Owns one event loop, running in a background thread, and one pooled ClientSession per process.
+    """
+
+    def __init__(self, limit: int = 100, limit_per_host: int = 50, keepalive_timeout: float = 60,
+                 ttl_dns_cache: int = 300):
+        """
+        :param limit: Maximum number of open connections
+        :param limit_per_host: Maximum number of open connections to the same host
+        :param keepalive_timeout: Seconds to keep idle connections open for reuse
+        :param ttl_dns_cache: Seconds to cache resolved DNS records for
+        """
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.ttl_dns_cache = ttl_dns_cache
+
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+        self._session: ClientSession | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """Event loop shared by all quotes in this process, started on first use."""
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name="quote-loop", daemon=True)
+                self._thread.start()
+
+        return self._loop
+
+    @property
+    def session(self) -> ClientSession:
+        """Pooled ClientSession. Must be used from within the client's event loop."""
+        if self._session is None or self._session.closed:
+            connector = TCPConnector(limit=self.limit, limit_per_host=self.limit_per_host,
+                                     keepalive_timeout=self.keepalive_timeout, ttl_dns_cache=self.ttl_dns_cache,
+                                     enable_cleanup_closed=True)
+            self._session = ClientSession(connector=connector, timeout=timeout_class)
+
+        return self._session
+
+    def run(self, coro: Coroutine, timeout: float | None = None) -> Any:
+        """
+        Runs a coroutine on the client's event loop and waits for its result. Safe to call from any thread.
+
+        :param coro: Coroutine to run
+        :param timeout: Maximum secs to wait for the result
+        :return: Coroutine result
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    async def _close_session(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    def close(self) -> None:
+        """Closes the pooled session and stops the event loop."""
+        if self._loop is None:
+            return
+
+        self.run(self._close_session(), timeout=10)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=10)
+        self._loop.close()
+
+        self._loop = None
+        self._thread = None
+        self._session = None
+
+
+# One quote client per process
+quote_client = QuoteClient()
@@ -0,0 +1,160 @@
+import time
+
+from enum import Enum
+from collections import deque
+from typing import Dict
+
+
+class Admission(Enum):
+    """Outcome of asking a network's circuit breaker whether a request may be sent."""
+    PASS = "pass"
+    SKIP = "skip"
+    PROBE = "probe"
+
+
+class NetworkHealth:
+    """
+    Latency tracking, p95-based request timeout and circuit breaker for one network.
+    The breaker opens after consecutive failures, skips the network during a cooldown,
+    then lets a single probe through before closing again.
+    """
+
+    def __init__(self, min_timeout: float = 1, max_timeout: float = 4, timeout_multiplier: float = 1.5,
+                 failure_threshold: int = 5, cooldown: float = 30, max_cooldown: float = 300,
+                 window: int = 200):
+        """
+        :param min_timeout: Lowest adaptive timeout in secs
+        :param max_timeout: Highest adaptive timeout in secs, also used until enough samples are collected
+        :param timeout_multiplier: Timeout is p95 latency times this
+        :param failure_threshold: Consecutive failures that open the breaker
+        :param cooldown: Secs to skip the network for after the breaker opens
+        :param max_cooldown: Cooldown doubles after every failed probe up to this many secs
+        :param window: Number of recent latencies & outcomes to keep
+        """
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.timeout_multiplier = timeout_multiplier
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = cooldown
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+
+        self.latencies: deque = deque(maxlen=window)
+        self.outcomes: deque = deque(maxlen=window)
+        self.consecutive_failures = 0
+        self.skipped = 0
+
+        self.is_open = False
+        self.opened_at = 0.0
+        self.probing = False
+
+    @property
+    def p95(self) -> float | None:
+        """95th percentile of recent successful request latencies."""
+        if len(self.latencies) < 20:
+            return None
+
+        latencies = sorted(self.latencies)
+
+        return latencies[int(0.95 * (len(latencies) - 1))]
+
+    @property
+    def timeout(self) -> float:
+        """Request timeout adapted to the network's recent latency."""
+        p95 = self.p95
+        if p95 is None:
+            return self.max_timeout
+
+        return min(self.max_timeout, max(self.min_timeout, p95 * self.timeout_multiplier))
+
+    @property
+    def error_rate(self) -> float:
+        """Share of recent requests that failed."""
+        return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+
+    def admit(self) -> Admission:
+        """
+        Decides whether a request may be sent on this network.
+
+        :return: PASS if healthy, PROBE if the request should check an open breaker, otherwise SKIP
+        """
+        if not self.is_open:
+            return Admission.PASS
+
+        if not self.probing and time.monotonic() - self.opened_at >= self.cooldown:
+            self.probing = True
+            return Admission.PROBE
+
+        self.skipped += 1
+
+        return Admission.SKIP
+
+    def record_success(self, latency: float) -> None:
+        """
+        Records a request that got a response from the network.
+
+        :param latency: Request duration in secs
+        """
+        self.latencies.append(latency)
+        self.outcomes.append(True)
+        self.consecutive_failures = 0
+
+        if self.is_open:
+            self.is_open = False
+            self.probing = False
+            self.cooldown = self.base_cooldown
+
+    def record_failure(self) -> None:
+        """Records a request that timed out, failed to connect or got a server error."""
+        self.outcomes.append(False)
+        self.consecutive_failures += 1
+
+        if self.is_open:
+            # Probe failed - stay open for longer
+            self.probing = False
+            self.opened_at = time.monotonic()
+            self.cooldown = min(self.max_cooldown, self.cooldown * 2)
+
+        elif self.consecutive_failures >= self.failure_threshold:
+            self.is_open = True
+            self.opened_at = time.monotonic()
+
+
+class HealthMonitor:
+    """Per-network health of the 1inch API."""
+
+    def __init__(self, **health_kwargs):
+        """
+        :param health_kwargs: Keyword arguments passed to every NetworkHealth
+        """
+        self.health_kwargs = health_kwargs
+        self.networks: Dict[str, NetworkHealth] = {}
+
+    def configure(self, **health_kwargs) -> None:
+        """
+        Changes the settings of networks tracked from now on, see NetworkHealth for arguments.
+        """
+        self.health_kwargs.update(health_kwargs)
+
+    def for_network(self, network_id: str) -> NetworkHealth:
+        """
+        Returns the health of a network, creating it on first use.
+
+        :param network_id: Network id, eg. '1'
+        :return: NetworkHealth instance
+        """
+        network_id = str(network_id)
+        if network_id not in self.networks:
+            self.networks[network_id] = NetworkHealth(**self.health_kwargs)
+
+        return self.networks[network_id]
+
+    def stats(self) -> Dict[str, dict]:
+        """Breaker state, timeout & error rate per network."""
+        return {network_id: {"open": health.is_open, "timeout": round(health.timeout, 3),
+                             "error_rate": round(health.error_rate, 3), "skipped": health.skipped}
+                for network_id, health in self.networks.items()}
+
+
+# One health monitor per process, shared by all quotes
+network_health = HealthMonitor()
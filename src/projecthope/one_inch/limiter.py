@@ -0,0 +1,157 @@
+import time
+import asyncio
+
+from typing import Dict
+
+
+class NetworkLimiter:
+    """
+    Token bucket plus an AIMD concurrency limit for one network.
+    Concurrency grows by one per window of successful requests, halves on every 429 and shrinks when slow.
+    """
+
+    def __init__(self, rate: float = 10, burst: int = 10, concurrency: int = 10, min_concurrency: int = 1,
+                 max_concurrency: int = 50, latency_target: float = 2):
+        """
+        :param rate: Requests per second the bucket refills with
+        :param burst: Maximum number of tokens in the bucket
+        :param concurrency: Initial number of requests allowed in flight
+        :param min_concurrency: Lowest concurrency limit
+        :param max_concurrency: Highest concurrency limit
+        :param latency_target: Responses slower than this many secs reduce the concurrency limit
+        """
+        self.rate = rate
+        self.max_rate = rate
+        self.burst = burst
+        self.limit = float(concurrency)
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.latency_target = latency_target
+
+        self.in_flight = 0
+        self.waiting = 0
+        self.blocked_until = 0.0
+        self.throttled = 0
+
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._cond = asyncio.Condition()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        """Waits until a request may be sent on this network."""
+        self.waiting += 1
+        try:
+            async with self._cond:
+                while True:
+                    now = time.monotonic()
+                    wait = None
+
+                    if now < self.blocked_until:
+                        # Server asked us to back off
+                        wait = self.blocked_until - now
+                    elif self.in_flight < int(self.limit):
+                        self._refill(now)
+                        if self._tokens >= 1:
+                            self._tokens -= 1
+                            self.in_flight += 1
+                            return
+
+                        wait = (1 - self._tokens) / self.rate
+
+                    try:
+                        await asyncio.wait_for(self._cond.wait(), wait)
+                    except asyncio.TimeoutError:
+                        pass
+        finally:
+            self.waiting -= 1
+
+    async def release(self, status: int | None, latency: float, retry_after: float | None = None) -> None:
+        """
+        Frees a request slot and adapts the limits to the response.
+
+        :param status: HTTP status code, None if the request failed to connect
+        :param latency: Request duration in secs
+        :param retry_after: Secs to wait before the next request, from the 'Retry-After' header
+        """
+        async with self._cond:
+            self.in_flight -= 1
+
+            if status == 429:
+                # Multiplicative decrease on rate limiting
+                self.throttled += 1
+                self.limit = max(self.min_concurrency, self.limit / 2)
+                self.rate = max(0.1 * self.max_rate, self.rate / 2)
+                self.blocked_until = max(self.blocked_until, time.monotonic() + (retry_after or 1))
+
+            elif status is not None and latency > self.latency_target:
+                self.limit = max(self.min_concurrency, self.limit * 0.9)
+
+            elif status is not None and status < 500:
+                # Additive increase, about +1 per 'limit' successful requests
+                self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+                self.rate = min(self.max_rate, self.rate + 0.1 * self.max_rate / self.limit)
+
+            self._cond.notify_all()
+
+
+class RateLimiter:
+    """Per-network request scheduler for the 1inch API."""
+
+    def __init__(self, **limiter_kwargs):
+        """
+        :param limiter_kwargs: Keyword arguments passed to every NetworkLimiter
+        """
+        self.limiter_kwargs = limiter_kwargs
+        self.networks: Dict[str, NetworkLimiter] = {}
+
+    def configure(self, **limiter_kwargs) -> None:
+        """
+        Changes the settings of limiters created from now on, see NetworkLimiter for arguments.
+        """
+        self.limiter_kwargs.update(limiter_kwargs)
+
+    def for_network(self, network_id: str) -> NetworkLimiter:
+        """
+        Returns the limiter of a network, creating it on first use.
+
+        :param network_id: Network id, eg. '1'
+        :return: NetworkLimiter instance
+        """
+        network_id = str(network_id)
+        if network_id not in self.networks:
+            self.networks[network_id] = NetworkLimiter(**self.limiter_kwargs)
+
+        return self.networks[network_id]
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of requests waiting for a slot on all networks."""
+        return sum(limiter.waiting for limiter in self.networks.values())
+
+    def stats(self) -> Dict[str, dict]:
+        """Current limits, in-flight & queued requests per network."""
+        return {network_id: {"concurrency": int(limiter.limit), "rate": round(limiter.rate, 2),
+                             "in_flight": limiter.in_flight, "queued": limiter.waiting,
+                             "throttled": limiter.throttled}
+                for network_id, limiter in self.networks.items()}
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """
+    Parses a 'Retry-After' header given in seconds.
+
+    :param value: Header value
+    :return: Seconds to wait, None if missing or not a number
+    """
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+# One rate limiter per process, shared by all quotes
+rate_limiter = RateLimiter()
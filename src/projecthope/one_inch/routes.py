@@ -0,0 +1,117 @@
+from typing import (
+    Dict,
+    List,
+    Tuple,
+    NamedTuple,
+)
+from web3 import Web3
+
+from src.projecthope.common.variables import network_names
+
+
+class Route(NamedTuple):
+    """
+    Precompiled 1inch quote request on one network.
+    Tokens are (checksum address, name, decimals) tuples, 'base_amount' is 'amount' in the from token's base units.
+    """
+    network_id: str
+    from_token: Tuple[str, str, int]
+    to_token: Tuple[str, str, int]
+    amount: float = 0
+    base_amount: int = 0
+
+    def with_amount(self, amount: float) -> "Route":
+        """
+        Returns the same route for a different swap in amount.
+
+        :param amount: Amount of from token to swap in
+        :return: Route instance
+        """
+        return self._replace(amount=amount, base_amount=int(amount * (10 ** self.from_token[2])))
+
+
+class PairRoutes(NamedTuple):
+    """All routes of a Base-Arb token pair."""
+    amounts: list
+    forward: List[Route]
+    reverse: List[Route]
+
+
+def compile_legs(data: dict, a_token: str, b_token: str) -> List[Route]:
+    """
+    Builds a route without an amount for every network both tokens are on, like 'parse_args_1inch'.
+
+    :param data: Dictionary containing all token data
+    :param a_token: Name of token to swap in
+    :param b_token: Name of token to swap out
+    :return: List of routes, one per network
+    """
+    if a_token not in data:
+        raise Exception(f"Token '{a_token}' not in coin data.")
+    if b_token not in data:
+        raise Exception(f"Token '{b_token}' not in coin data.")
+
+    a_networks = data[a_token]['networks']
+
+    legs = []
+    for network, b_data in data[b_token]['networks'].items():
+        # Skip if arbitraged token not on this network
+        if network not in a_networks:
+            continue
+
+        a_data = a_networks[network]
+        from_token = (Web3.toChecksumAddress(a_data['address']), a_token, int(a_data['decimals']))
+        to_token = (Web3.toChecksumAddress(b_data['address']), b_token, int(b_data['decimals']))
+        legs.append(Route(network_names[network], from_token, to_token))
+
+    return legs
+
+
+class RouteTable:
+    """Routes of every Base-Arb token pair, compiled once instead of on every screening."""
+
+    def __init__(self):
+        self.pairs: Dict[Tuple[str, str], PairRoutes] = {}
+
+    def build(self, args: List[list]) -> None:
+        """
+        Compiles routes for a list of pairs, replacing any compiled before. Call again on config reload.
+
+        :param args: List of [data, base_token, arb_token] arguments
+        """
+        self.pairs = {}
+        for data, base_token, arb_token in args:
+            self.get(data['coins'], base_token, arb_token)
+
+    def get(self, data: dict, base_token: str, arb_token: str) -> PairRoutes:
+        """
+        Returns the routes of a pair, compiling them on first use.
+
+        :param data: Dictionary containing all token data
+        :param base_token: Name of Base token
+        :param arb_token: Name of Arb token
+        :return: PairRoutes instance
+        """
+        pair_routes = self.pairs.get((base_token, arb_token))
+        if pair_routes is None:
+            legs = compile_legs(data, base_token, arb_token)
+
+            try:
+                amounts = data[arb_token]['swap_amount']
+            except KeyError:
+                raise Exception(f"Must provide range amounts for {base_token} -> {arb_token} token swap.")
+
+            forward = [leg.with_amount(amount) for leg in legs
+                       for amount in (amounts if type(amounts) is list else [amounts])]
+
+            # Reverse routes get their amount from the best Base->Arb swap at screening time
+            reverse = [Route(leg.network_id, leg.to_token, leg.from_token) for leg in legs]
+
+            pair_routes = PairRoutes(amounts, forward, reverse)
+            self.pairs[(base_token, arb_token)] = pair_routes
+
+        return pair_routes
+
+
+# One route table per process
+route_table = RouteTable()
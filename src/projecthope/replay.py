@@ -0,0 +1,477 @@
+"""
+Offline replay of recorded Binance order books & 1inch quotes, see 'common.recorder'.
+Pairs are compared with 'compare_swaps_async' exactly like the live screener, reading from recorded sources
+as of a replay clock that jumps from loop to loop instead of waiting. Every configuration runs in its own process.
+"""
+import math
+import time
+import asyncio
+
+from bisect import bisect_right
+from multiprocessing import Pool
+from typing import (
+    Dict,
+    List,
+    Tuple,
+)
+
+from src.projecthope.datatypes import (
+    Cost,
+    Token,
+    Swap,
+    Arbitrage,
+)
+from src.projecthope.compare import (
+    compare_swaps_async,
+    price_arbitrages,
+    alert_key,
+)
+from src.projecthope.scheduler import PairScheduler
+from src.projecthope.binance.codec import encode_book
+from src.projecthope.binance.api import use_book_store
+from src.projecthope.one_inch.api import use_quote_source
+from src.projecthope.one_inch.routes import (
+    Route,
+    route_table,
+)
+from src.projecthope.blockchain.costs import chain_costs
+from src.projecthope.common.logger import log_error
+from src.projecthope.common.recorder import (
+    read_meta,
+    read_segment,
+    list_segments,
+)
+from src.projecthope.common.variables import (
+    network_ids,
+    base_tokens,
+)
+
+
+class ReplayClock:
+    """Current replay time in secs since epoch, shared by the replayed sources & scheduler."""
+
+    def __init__(self, now: float = 0.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class SegmentIndex:
+    """
+    Recorded rows of one record type grouped by key, eg. trading pair, for lookups by record time.
+    Segments are loaded in time order as the replay clock reaches them, only the last two are kept in memory.
+    """
+
+    def __init__(self, directory: str, kind: str, key_columns: Tuple[str, ...], start: float | None = None,
+                 end: float | None = None):
+        """
+        :param directory: Directory segments were written to
+        :param kind: Record type, eg. 'books'
+        :param key_columns: Columns rows are grouped by, eg. ('symbol', )
+        :param start: Skip segments ending before this time
+        :param end: Skip segments starting after this time
+        """
+        self.key_columns = key_columns
+
+        self.paths: List[Tuple[str, float]] = []
+        for path in list_segments(directory, kind):
+            meta = read_meta(path)
+            if (start is None or meta["end"] >= start) and (end is None or meta["start"] <= end):
+                self.paths.append((path, meta["end"]))
+
+        self._next = 0
+        self._segments: List[Tuple[dict, Dict[tuple | str, Tuple[list, list]], float]] = []
+
+    def _load(self, path: str, end: float) -> Tuple[dict, Dict[tuple | str, Tuple[list, list]], float]:
+        columns = read_segment(path)
+        received = columns["received"]
+
+        if len(self.key_columns) == 1:
+            keys = columns[self.key_columns[0]]
+        else:
+            keys = zip(*(columns[name] for name in self.key_columns))
+
+        # Record times & row numbers of every key, in recording order
+        index: Dict[tuple | str, Tuple[list, list]] = {}
+        for row, key in enumerate(keys):
+            entry = index.get(key)
+            if entry is None:
+                entry = index[key] = ([], [])
+            entry[0].append(received[row])
+            entry[1].append(row)
+
+        return columns, index, end
+
+    def _advance(self, now: float) -> None:
+        while self._next < len(self.paths) and (not self._segments or self._segments[-1][2] < now):
+            self._segments = self._segments[-1:] + [self._load(*self.paths[self._next])]
+            self._next += 1
+
+    def latest(self, key: tuple | str, since: float, now: float) -> Tuple[dict, int] | None:
+        """
+        Finds the newest row of a key recorded within a time window.
+
+        :param key: Key column values, eg. 'ETHUSDT'
+        :param since: Ignore rows recorded at or before this time
+        :param now: Ignore rows recorded after this time
+        :return: Segment columns & row number, None if there is none
+        """
+        self._advance(now)
+
+        for columns, index, _ in reversed(self._segments):
+            entry = index.get(key)
+            if not entry:
+                continue
+
+            times, rows = entry
+            found = bisect_right(times, now)
+            if found and times[found - 1] > since:
+                return columns, rows[found - 1]
+
+        return None
+
+    def window(self, key: tuple | str, since: float, now: float) -> List[Tuple[dict, int]]:
+        """
+        Finds every row of a key recorded within a time window.
+
+        :param key: Key column values, eg. ('137', 'USDC', 'WETH')
+        :param since: Ignore rows recorded at or before this time
+        :param now: Ignore rows recorded after this time
+        :return: List of segment columns & row number, oldest first
+        """
+        self._advance(now)
+
+        found: list = []
+        for columns, index, _ in self._segments:
+            entry = index.get(key)
+            if not entry:
+                continue
+
+            times, rows = entry
+            found.extend((columns, rows[i]) for i in range(bisect_right(times, since), bisect_right(times, now)))
+
+        return found
+
+
+class RecordedBooks:
+    """
+    Read-only order book store serving recorded Binance books as of the replay clock.
+    Exposes the same 'get'/'set' calls as the memcache client, see 'binance.api.use_book_store'.
+    """
+
+    def __init__(self, index: SegmentIndex, clock: ReplayClock, expire: float = 20):
+        """
+        :param index: SegmentIndex of 'books' segments keyed by symbol
+        :param clock: Replay clock
+        :param expire: Secs after which a book is treated as missing, like the live stream's
+        """
+        self.index = index
+        self.clock = clock
+        self.expire = expire
+
+        self._encoded: Dict[str, Tuple[int, int, bytes]] = {}
+
+    @staticmethod
+    def encode(columns: dict, row: int) -> bytes:
+        """
+        Encodes a recorded book row like the Binance stream publishes it, without its NaN padding.
+
+        :param columns: Segment columns
+        :param row: Row number
+        :return: Encoded order book, see 'binance.codec'
+        """
+        depth = len(columns["bid_prices"]) // len(columns["received"])
+        levels = slice(row * depth, (row + 1) * depth)
+
+        bids = [(price, quantity) for price, quantity in zip(columns["bid_prices"][levels],
+                                                             columns["bid_quantities"][levels])
+                if not math.isnan(price)]
+        asks = [(price, quantity) for price, quantity in zip(columns["ask_prices"][levels],
+                                                             columns["ask_quantities"][levels])
+                if not math.isnan(price)]
+
+        return encode_book(columns["update_id"][row], columns["event_time"][row], bids, asks)
+
+    def get(self, key: str, default: bytes | None = None) -> bytes | None:
+        """
+        Newest recorded order book of a trading pair at the replay time.
+
+        :param key: Trading pair, eg. 'ETHUSDT'
+        :param default: Value to return if no book was recorded within 'expire' secs
+        :return: Encoded order book bytes
+        """
+        key = key.upper()
+        now = self.clock.now
+
+        found = self.index.latest(key, now - self.expire, now)
+        if found is None:
+            return default
+
+        # Encode each recorded book once, screenings within a loop read the same one
+        columns, row = found
+        cached = self._encoded.get(key)
+        if cached is None or cached[0] != id(columns) or cached[1] != row:
+            cached = self._encoded[key] = (id(columns), row, self.encode(columns, row))
+
+        return cached[2]
+
+    def set(self, key: str, value: bytes, expire: float = 0) -> bool:
+        """Recorded books are read-only, nothing is written."""
+        return False
+
+
+class RecordedQuotes:
+    """
+    Quote source serving recorded 1inch quotes as of the replay clock, see 'one_inch.api.use_quote_source'.
+    A route is answered with the newest quote of the same tokens & network within 'max_age' secs whose amount
+    is closest to the route's, its amount out scaled linearly. Amounts more than 'amount_ratio' apart do not match.
+    """
+
+    def __init__(self, index: SegmentIndex, clock: ReplayClock, max_age: float = 10, amount_ratio: float = 2,
+                 fees: str = "recorded"):
+        """
+        :param index: SegmentIndex of 'quotes' segments keyed by (network, from_token, to_token)
+        :param clock: Replay clock
+        :param max_age: Secs a recorded quote is used for
+        :param amount_ratio: Maximum ratio between a route's amount and the recorded amount
+        :param fees: 'recorded' for the recorded USDT gas cost, 'model' to price gas with 'chain_costs'
+        """
+        if fees not in ("recorded", "model"):
+            raise Exception(f"Unknown replay fee model '{fees}'.")
+
+        self.index = index
+        self.clock = clock
+        self.max_age = max_age
+        self.max_distance = math.log(amount_ratio)
+        self.fees = fees
+
+        self.served = 0
+        self.failed = 0
+        self.missing = 0
+
+    def get_swapout(self, route: Route) -> Swap | None:
+        """
+        Replays a 1inch quote.
+
+        :param route: Route to quote
+        :return: Swap dataclass, None if no matching quote was recorded or the recorded request failed
+        """
+        network_id, from_token, to_token = route.network_id, route.from_token, route.to_token
+        now = self.clock.now
+
+        best = None
+        best_distance = self.max_distance
+        if route.amount > 0:
+            # Newest first, so the newest of equally close quotes wins
+            for columns, row in reversed(self.index.window((network_id, from_token[1], to_token[1]),
+                                                           now - self.max_age, now)):
+                amount_in = columns["amount_in"][row]
+                if amount_in <= 0:
+                    continue
+
+                distance = abs(math.log(route.amount / amount_in))
+                if distance < best_distance or best is None and distance <= best_distance:
+                    best, best_distance = (columns, row), distance
+                    if distance == 0:
+                        break
+
+        if best is None:
+            self.missing += 1
+            return None
+
+        columns, row = best
+        amount_out = columns["amount_out"][row]
+        if math.isnan(amount_out):
+            self.failed += 1
+            return None
+
+        self.served += 1
+        amount_out *= route.amount / columns["amount_in"][row]
+        gas_amount = columns["gas_amount"][row]
+
+        if self.fees == "model":
+            cost = chain_costs.swap_cost(network_id, gas_amount)
+        else:
+            usdt_cost = columns["usdt_cost"][row]
+            cost = Cost(gas_amount=gas_amount, usdt_cost=None if math.isnan(usdt_cost) else usdt_cost)
+
+        return Swap(network_ids[network_id], network_id, cost, Token(from_token[1], route.amount, from_token[2]),
+                    Token(to_token[1], amount_out, to_token[2]))
+
+
+def recorded_span(directory: str) -> Tuple[float | None, float | None]:
+    """
+    Time span covered by recorded order books.
+
+    :param directory: Directory segments were written to
+    :return: First & last record time, None if nothing was recorded
+    """
+    metas = [read_meta(path) for path in list_segments(directory, "books")]
+    if not metas:
+        return None, None
+
+    return min(meta["start"] for meta in metas), max(meta["end"] for meta in metas)
+
+
+def configuration_data(info: dict, configuration: dict) -> dict:
+    """
+    Applies a replay configuration to the screener's input data.
+
+    :param info: Input data, as passed to 'main.py'
+    :param configuration: Eg. {"name": "fees", "min_arb": 50, "settings": {"scheduler": {"call_budget": 100}}}
+    :return: Input data with the configuration's settings & 'min_arb' thresholds
+    """
+    settings = {**info["settings"], **configuration.get("settings", {})}
+    coins = {name: dict(coin) for name, coin in info["coins"].items()}
+
+    # One threshold for every token or one per token
+    min_arb = configuration.get("min_arb")
+    for name, coin in coins.items():
+        if isinstance(min_arb, dict) and name in min_arb:
+            coin["min_arb"] = min_arb[name]
+        elif isinstance(min_arb, (int, float)) and name not in base_tokens:
+            coin["min_arb"] = min_arb
+
+    return {**info, "coins": coins, "settings": settings}
+
+
+async def _compare_pair(data: dict, base_token: str, arb_token: str) -> List[Arbitrage] | None:
+    try:
+        max_swap_pairs = await compare_swaps_async(data['coins'], base_token, arb_token)
+    except Exception as e:
+        log_error.warning(f"'replay' Error - {base_token} -> {arb_token} - {e}")
+        return None
+
+    return price_arbitrages(max_swap_pairs) if max_swap_pairs else None
+
+
+async def replay_async(args: List[list], clock: ReplayClock, end: float, interval: float = 10,
+                       cooldown: float = 300, scheduler: PairScheduler | None = None) -> dict:
+    """
+    Screening loop of 'arb_screener_async' against recorded sources, moving the replay clock by 'interval'
+    secs per loop. Alerts are kept instead of sent, repeats within 'cooldown' replay secs are dropped.
+
+    :param args: List of [data, base_token, arb_token] arguments
+    :param clock: Replay clock, set to the start time
+    :param end: Replay time to stop at
+    :param interval: Replay secs between two loops
+    :param cooldown: Replay secs during which an alert with the same key is not sent again
+    :param scheduler: Picks the pairs to screen in each loop
+    :return: Replay summary with every alert that would have been sent
+    """
+    alerts: list = []
+    last_alerted: Dict[tuple, float] = {}
+    summary = {"loops": 0, "screenings": 0, "failed_screenings": 0, "suppressed": 0}
+
+    while clock.now <= end:
+        loop_args = await scheduler.select() if scheduler else args
+        results = await asyncio.gather(*[_compare_pair(*arg) for arg in loop_args])
+
+        screened = []
+        for (data, base_token, arb_token), arbitrages in zip(loop_args, results):
+            best_arbitrage = max((arbitrage.net for arbitrage in arbitrages), default=None) if arbitrages else None
+            screened.append((base_token, arb_token, best_arbitrage) if arbitrages is not None else None)
+
+            min_arb = data['coins'][arb_token]['min_arb']
+            for arbitrage in arbitrages or []:
+                if arbitrage.net < min_arb:
+                    continue
+
+                key = alert_key(arbitrage)
+                if clock.now - last_alerted.get(key, -math.inf) < cooldown:
+                    summary["suppressed"] += 1
+                    continue
+                last_alerted[key] = clock.now
+
+                alerts.append({"time": clock.now, "pair": key[0],
+                               "buy": arbitrage.swap_ab.chain, "sell": arbitrage.swap_ba.chain,
+                               "amount_in": arbitrage.swap_ab.from_token.amount,
+                               "arbitrage": arbitrage.arbitrage, "fees": arbitrage.fees, "net": arbitrage.net})
+
+        if scheduler:
+            scheduler.record(loop_args, screened)
+
+        summary["loops"] += 1
+        summary["screenings"] += len(loop_args)
+        summary["failed_screenings"] += sum(1 for result in screened if result is None)
+        clock.now += interval
+
+    return {**summary, "alerts": alerts}
+
+
+def replay_configuration(directory: str, info: dict, configuration: dict, start: float, end: float) -> dict:
+    """
+    Replays one configuration from 'start' to 'end'. Replaces this process' book store & quote source,
+    run it in a process of its own, see 'replay'.
+
+    :param directory: Directory segments were written to
+    :param info: Input data, as passed to 'main.py'
+    :param configuration: Replay configuration, see 'configuration_data'. Its optional 'quotes' key takes
+                          'RecordedQuotes' settings, eg. {"max_age": 10, "fees": "model"}
+    :param start: Replay start time in secs since epoch
+    :param end: Replay end time in secs since epoch
+    :return: Replay summary of the configuration
+    """
+    wall_start = time.perf_counter()
+
+    data = configuration_data(info, configuration)
+    settings = data["settings"]
+    base_token = settings["base_token"]
+    args = [[data, base_token, arb_token] for arb_token in data["coins"] if arb_token not in base_tokens]
+
+    clock = ReplayClock(start)
+    quote_settings = configuration.get("quotes", {})
+    max_age = quote_settings.get("max_age", 10)
+
+    books = RecordedBooks(SegmentIndex(directory, "books", ("symbol", ), start - 20, end), clock)
+    quotes = RecordedQuotes(SegmentIndex(directory, "quotes", ("network", "from_token", "to_token"),
+                                         start - max_age, end), clock, **quote_settings)
+    use_book_store(books)
+    use_quote_source(quotes)
+
+    # Price gas from configured prices only, live oracles & published prices are not part of the recording
+    chain_costs.configure(**{**settings.get("chain_costs", {}), "rpc": None, "price_ttl": 0,
+                             "shared_prices": False})
+
+    route_table.build(args)
+
+    scheduler = None
+    if "scheduler" in settings:
+        scheduler = PairScheduler(args, **settings["scheduler"], clock=clock)
+
+    interval = settings.get("sleep_time", 10)
+    cooldown = settings.get("alerts", {}).get("cooldown", 300)
+    summary = asyncio.run(replay_async(args, clock, end, interval, cooldown, scheduler))
+
+    wall_time = time.perf_counter() - wall_start
+    return {"name": configuration.get("name"), "start": start, "end": end,
+            "quotes": {"served": quotes.served, "failed": quotes.failed, "missing": quotes.missing},
+            "net_arbitrage": sum(alert["net"] for alert in summary["alerts"]),
+            "wall_time": round(wall_time, 3), "speedup": round((end - start) / wall_time, 1) if wall_time else None,
+            **summary}
+
+
+def replay(directory: str, info: dict, configurations: List[dict], start: float | None = None,
+           end: float | None = None, processes: int | None = None) -> List[dict]:
+    """
+    Replays recorded books & quotes for several configurations in parallel, one process per configuration.
+
+    :param directory: Directory segments were written to
+    :param info: Input data, as passed to 'main.py'
+    :param configurations: List of replay configurations, see 'replay_configuration'
+    :param start: Replay start time in secs since epoch. If None starts at the first recorded book
+    :param end: Replay end time in secs since epoch. If None ends at the last recorded book
+    :param processes: Number of worker processes. If None one per CPU
+    :return: List of replay summaries, in the same order as configurations
+    """
+    first, last = recorded_span(directory)
+    start = first if start is None else start
+    end = last if end is None else end
+    if start is None or end is None:
+        raise Exception(f"No recorded order books in '{directory}'.")
+
+    # A fresh process per configuration, sources & settings are process wide
+    with Pool(processes, maxtasksperchild=1) as pool:
+        return pool.starmap(replay_configuration, [(directory, info, configuration, start, end)
+                                                   for configuration in configurations])
@@ -0,0 +1,143 @@
+import time
+import asyncio
+
+from typing import (
+    Dict,
+    List,
+    Callable,
+)
+
+from src.projecthope.binance.codec import decode_book
+from src.projecthope.binance.api import get_order_book_async
+from src.projecthope.one_inch.routes import route_table
+
+
+class PairState:
+    """Screening history of one Base-Arb token pair used to rank it."""
+    __slots__ = ("args", "symbol", "min_arb", "calls", "spread", "volatility", "failure_rate", "last_mid",
+                 "last_visit")
+
+    def __init__(self, args: list):
+        """
+        :param args: [data, base_token, arb_token] arguments of the pair
+        """
+        data, base_token, arb_token = args
+        self.args = args
+        self.symbol = f"{arb_token}{base_token}"
+        self.min_arb = data['coins'][arb_token]['min_arb'] or 1
+
+        # Expected 1inch calls per screening: Base->Arb for every route & range plus one Arb->Base per range
+        self.calls = 2 * len(route_table.get(data['coins'], base_token, arb_token).forward)
+
+        self.spread = 1.0
+        self.volatility = 0.0
+        self.failure_rate = 0.0
+        self.last_mid: float | None = None
+        self.last_visit = 0.0
+
+
+class PairScheduler:
+    """
+    Hands out a per-loop budget of 1inch calls to the pairs most likely to produce arbitrage.
+    Pairs are ranked by recent best spread relative to 'min_arb', Binance book volatility & quote failure rate.
+    Pairs not screened for 'revisit_interval' secs are always included so none starve.
+    """
+
+    def __init__(self, args: List[list], call_budget: int = 200, revisit_interval: float = 60,
+                 smoothing: float = 0.3, volatility_reference: float = 0.001,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        :param args: List of [data, base_token, arb_token] arguments
+        :param call_budget: 1inch calls to spend per loop
+        :param revisit_interval: Maximum secs between two screenings of the same pair
+        :param smoothing: Weight of the newest observation in moving averages
+        :param volatility_reference: Mid price move per loop that counts as volatile, eg. 0.001 for 0.1%
+        :param clock: Returns the current time in secs, replaced by the replay clock when replaying
+        """
+        self.call_budget = call_budget
+        self.revisit_interval = revisit_interval
+        self.smoothing = smoothing
+        self.volatility_reference = volatility_reference
+        self.clock = clock
+
+        self.pairs: List[PairState] = [PairState(arg) for arg in args]
+
+    def _smooth(self, average: float, value: float) -> float:
+        return (1 - self.smoothing) * average + self.smoothing * value
+
+    async def update_volatility(self) -> None:
+        """Updates every pair's volatility from the mid price move of its Binance book since the last call."""
+        books = await asyncio.gather(*[get_order_book_async(pair.symbol) for pair in self.pairs])
+
+        for pair, book in zip(self.pairs, books):
+            if not book:
+                continue
+
+            book = decode_book(book)
+            if book.best_bid is None or book.best_ask is None:
+                continue
+
+            mid = (book.best_bid + book.best_ask) / 2
+            if pair.last_mid:
+                pair.volatility = self._smooth(pair.volatility, abs(mid - pair.last_mid) / pair.last_mid)
+            pair.last_mid = mid
+
+    def priority(self, pair: PairState, now: float) -> float:
+        """
+        Ranks a pair, higher is screened first.
+
+        :param pair: Pair to rank
+        :param now: Current time of the scheduler's clock
+        :return: Priority score
+        """
+        volatility = min(3.0, pair.volatility / self.volatility_reference)
+        # Pairs waiting longer slowly climb the ranking
+        age = min(1.0, (now - pair.last_visit) / self.revisit_interval)
+
+        return (1 + pair.spread) * (1 + volatility) * (1 - 0.5 * pair.failure_rate) * (0.5 + age)
+
+    async def select(self) -> List[list]:
+        """
+        Picks the pairs to screen in this loop.
+
+        :return: List of [data, base_token, arb_token] arguments
+        """
+        await self.update_volatility()
+        now = self.clock()
+
+        # Pairs due for a revisit go first regardless of budget
+        due = [pair for pair in self.pairs if now - pair.last_visit >= self.revisit_interval]
+        budget = self.call_budget - sum(pair.calls for pair in due)
+
+        selected = due
+        ranked = sorted((pair for pair in self.pairs if now - pair.last_visit < self.revisit_interval),
+                        key=lambda p: self.priority(p, now), reverse=True)
+        for pair in ranked:
+            if pair.calls <= budget:
+                selected.append(pair)
+                budget -= pair.calls
+
+        for pair in selected:
+            pair.last_visit = now
+
+        return [pair.args for pair in selected]
+
+    def record(self, args: List[list], results: List[tuple | None]) -> None:
+        """
+        Updates pair scores with the outcome of their screening.
+
+        :param args: Arguments returned by 'select'
+        :param results: 'screen_pair' results, in the same order
+        """
+        states: Dict[str, PairState] = {pair.symbol: pair for pair in self.pairs}
+
+        for (_, base_token, arb_token), result in zip(args, results):
+            pair = states[f"{arb_token}{base_token}"]
+
+            failed = result is None or result[2] is None
+            pair.failure_rate = self._smooth(pair.failure_rate, 1.0 if failed else 0.0)
+
+            if not failed:
+                # 0 at -min_arb, 1 at break-even, 2 at min_arb
+                spread = max(0.0, min(3.0, 1 + result[2] / pair.min_arb))
+                pair.spread = self._smooth(pair.spread, spread)
@@ -0,0 +1,153 @@
+import asyncio
+
+from time import perf_counter
+from queue import Empty
+from multiprocessing import Queue
+from typing import (
+    Dict,
+    List,
+)
+
+from src.projecthope.compare import alert_arb_async
+from src.projecthope.common.logger import log_error
+from src.projecthope.common.metrics import metrics
+from src.projecthope.common.tracing import tracer
+
+
+pair_latency = metrics.histogram("pair_screening_seconds", "Duration of a pair's screening", ("pair", ))
+pair_wait = metrics.histogram("pair_queue_seconds", "Time a pair waited for a free concurrency slot")
+
+
+async def screen_pair(semaphore: asyncio.Semaphore, data: dict, base_token: str, arb_token: str,
+                      timeout: float = 10) -> tuple | None:
+    """
+    Screens a single Base-Arb token pair, waiting for a free concurrency slot first.
+
+    :param semaphore: Semaphore bounding the number of pairs screened at once
+    :param data: Input dictionary data with coins
+    :param base_token: Name of Base token being swapped in
+    :param arb_token: Name of token being Arbitraged
+    :param timeout: Maximum secs to screen the pair for
+    :return: 'alert_arb_async' result, None if screening failed
+    """
+    queued = perf_counter()
+    async with semaphore:
+        start = perf_counter()
+        pair_wait.observe(start - queued)
+        try:
+            with tracer.root("screen_pair", pair=f"{arb_token}{base_token}"):
+                return await asyncio.wait_for(alert_arb_async(data, base_token, arb_token), timeout)
+
+        except asyncio.TimeoutError:
+            log_error.warning(f"'alert_arb' Error - {base_token} -> {arb_token} - timed out after {timeout} secs")
+        except asyncio.CancelledError:
+            # Cancelled from within, eg. by an awaited future, counts as a failed pair. Not when this task is cancelled
+            if _cancel_requested():
+                raise
+            log_error.warning(f"'alert_arb' Error - {base_token} -> {arb_token} - cancelled")
+        except Exception as e:
+            log_error.warning(f"'alert_arb' Error - {base_token} -> {arb_token} - {e}")
+
+        finally:
+            pair_latency.observe(perf_counter() - start, pair=f"{arb_token}{base_token}")
+
+    return None
+
+
+def _cancel_requested() -> bool:
+    """True if the running task itself is being cancelled. Always True before Python 3.11, which cannot tell."""
+    task = asyncio.current_task()
+
+    return task is None or not hasattr(task, "cancelling") or task.cancelling() > 0
+
+
+async def screen_pairs(args: List[list], max_concurrency: int = 20, timeout: float = 10,
+                       semaphore: asyncio.Semaphore | None = None) -> List[tuple | None]:
+    """
+    Screens all Base-Arb token pairs concurrently on the running event loop.
+
+    :param args: List of [data, base_token, arb_token] arguments
+    :param max_concurrency: Maximum number of pairs screened at once
+    :param timeout: Maximum secs to screen each pair for
+    :param semaphore: Semaphore shared with other screenings. If None a new one is created
+    :return: List of 'screen_pair' results
+    """
+    semaphore = semaphore or asyncio.Semaphore(max_concurrency)
+
+    return await asyncio.gather(*[screen_pair(semaphore, *arg, timeout=timeout) for arg in args])
+
+
+class PairTrigger:
+    """
+    Screens single pairs when the Binance stream reports that their order book moved.
+    Notifications are debounced, and ones arriving while a pair is being screened are coalesced into one rerun.
+    """
+
+    def __init__(self, args: List[list], semaphore: asyncio.Semaphore, debounce: float = 0.25,
+                 timeout: float = 10):
+        """
+        :param args: List of [data, base_token, arb_token] arguments
+        :param semaphore: Semaphore shared with full screening loops
+        :param debounce: Secs to wait for further notifications before screening a pair
+        :param timeout: Maximum secs to screen each pair for
+        """
+        # Trading pair as published by the stream, eg. 'CVXUSDT', to its arguments
+        self.pairs: Dict[str, list] = {f"{arb_token}{base_token}": [data, base_token, arb_token]
+                                       for data, base_token, arb_token in args}
+        self.semaphore = semaphore
+        self.debounce = debounce
+        self.timeout = timeout
+
+        self.triggered = 0
+        self._scheduled: Dict[str, asyncio.TimerHandle] = {}
+        self._running: Dict[str, asyncio.Task] = {}
+        self._dirty: set = set()
+
+    def notify(self, symbol: str) -> None:
+        """
+        Schedules a screening of a trading pair unless one is already pending.
+
+        :param symbol: Trading pair, eg. 'CVXUSDT'
+        """
+        if symbol not in self.pairs or symbol in self._scheduled:
+            return
+
+        # Screen again once the running screening is done
+        if symbol in self._running:
+            self._dirty.add(symbol)
+            return
+
+        loop = asyncio.get_running_loop()
+        self._scheduled[symbol] = loop.call_later(self.debounce, self._start, symbol)
+
+    def _start(self, symbol: str) -> None:
+        self._scheduled.pop(symbol, None)
+        self._running[symbol] = asyncio.create_task(self._screen(symbol))
+
+    async def _screen(self, symbol: str) -> None:
+        try:
+            self.triggered += 1
+            await screen_pair(self.semaphore, *self.pairs[symbol], timeout=self.timeout)
+        finally:
+            self._running.pop(symbol, None)
+            if symbol in self._dirty:
+                self._dirty.discard(symbol)
+                self.notify(symbol)
+
+    async def listen(self, changes: Queue) -> None:
+        """
+        Reads changed trading pairs published by the Binance stream process forever.
+
+        :param changes: Queue shared with 'BookChangeDetector'
+        """
+        while True:
+            symbol = await asyncio.to_thread(_queue_get, changes)
+            if symbol:
+                self.notify(symbol)
+
+
+def _queue_get(changes: Queue, timeout: float = 1) -> str | None:
+    try:
+        return changes.get(timeout=timeout)
+    except Empty:
+        return None
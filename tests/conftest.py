@@ -0,0 +1,4 @@
+import os
+
+# Loggers open their files in logs/ when imported, like when running main.py from the project root
+os.makedirs("logs", exist_ok=True)
@@ -0,0 +1,146 @@
+"""
+QuoteCache TTL, coalescing of identical in-flight requests and failure paths.
+"""
+import asyncio
+
+import pytest
+
+from src.projecthope.one_inch.cache import QuoteCache
+
+
+class Quotes:
+    """Quote function counting calls, each taking 'delay' secs."""
+
+    def __init__(self, delay: float = 0.05, result: float | None = 1.0, error: Exception | None = None):
+        self.delay = delay
+        self.result = result
+        self.error = error
+        self.calls = 0
+
+    async def __call__(self, amount: float) -> float | None:
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+
+        return None if self.result is None else self.result * amount
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_cached_within_ttl():
+    cache, quotes = QuoteCache(ttl=5), Quotes(delay=0)
+    quote = cache(quotes)
+
+    async def main():
+        return [await quote(2), await quote(2), await quote(3)]
+
+    assert run(main()) == [2.0, 2.0, 3.0]
+    assert quotes.calls == 2
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_expired_after_ttl():
+    cache, quotes = QuoteCache(ttl=0.01), Quotes(delay=0)
+    quote = cache(quotes)
+
+    async def main():
+        await quote(2)
+        await asyncio.sleep(0.02)
+        await quote(2)
+
+    run(main())
+    assert quotes.calls == 2
+
+
+def test_lru_evicts_oldest():
+    cache, quotes = QuoteCache(maxsize=2), Quotes(delay=0)
+    quote = cache(quotes)
+
+    async def main():
+        for amount in (1, 2, 1, 3, 1, 2):
+            await quote(amount)
+
+    run(main())
+
+    # 2 was least recently used when 3 came in
+    assert quotes.calls == 4
+
+
+def test_none_is_not_cached():
+    cache, quotes = QuoteCache(), Quotes(delay=0, result=None)
+    quote = cache(quotes)
+
+    async def main():
+        return [await quote(1), await quote(1)]
+
+    assert run(main()) == [None, None]
+    assert quotes.calls == 2
+
+
+def test_concurrent_calls_share_one_request():
+    cache, quotes = QuoteCache(), Quotes()
+    quote = cache(quotes)
+
+    async def main():
+        return await asyncio.gather(*[quote(2) for _ in range(5)])
+
+    assert run(main()) == [2.0] * 5
+    assert quotes.calls == 1
+    assert (cache.misses, cache.coalesced) == (1, 4)
+
+
+def test_exception_reaches_every_waiter_and_is_not_cached():
+    cache, quotes = QuoteCache(), Quotes(error=ValueError("bad quote"))
+    quote = cache(quotes)
+
+    async def main():
+        return await asyncio.gather(*[quote(2) for _ in range(3)], return_exceptions=True)
+
+    results = run(main())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert quotes.calls == 1
+
+    quotes.error = None
+    assert run(main()) == [2.0] * 3
+    assert quotes.calls == 2
+
+
+def test_owner_cancelled_waiter_sends_request_itself():
+    cache, quotes = QuoteCache(), Quotes(delay=0.1)
+    quote = cache(quotes)
+
+    async def main():
+        owner = asyncio.create_task(asyncio.wait_for(quote(2), 0.02))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(quote(2))
+
+        with pytest.raises(asyncio.TimeoutError):
+            await owner
+
+        return await waiter
+
+    assert run(main()) == 2.0
+    assert quotes.calls == 2
+
+
+def test_cancelled_waiter_leaves_request_running():
+    cache, quotes = QuoteCache(), Quotes(delay=0.05)
+    quote = cache(quotes)
+
+    async def main():
+        owner = asyncio.create_task(quote(2))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(quote(2))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+        return await owner
+
+    assert run(main()) == 2.0
+    assert quotes.calls == 1
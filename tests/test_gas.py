@@ -0,0 +1,140 @@
+"""
+GasOracle against a local JSON-RPC stub serving 'eth_blockNumber' & 'eth_feeHistory'.
+"""
+import json
+
+from threading import Thread
+from http.server import (
+    BaseHTTPRequestHandler,
+    ThreadingHTTPServer,
+)
+
+import pytest
+from web3 import Web3
+
+from src.projecthope.blockchain import gas
+from src.projecthope.blockchain.gas import GasOracle
+
+
+GWEI = 10 ** 9
+
+
+class JsonRpcStub(ThreadingHTTPServer):
+    """Node answering block number & fee history requests with canned data, recording the methods called."""
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), JsonRpcHandler)
+        self.block_number = 100
+        self.base_fees = [20 * GWEI, 22 * GWEI, 24 * GWEI]
+        self.rewards = [[1 * GWEI], [3 * GWEI], [2 * GWEI]]
+        self.calls = []
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class JsonRpcHandler(BaseHTTPRequestHandler):
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        node: JsonRpcStub = self.server
+        node.calls.append((request["method"], request["params"]))
+
+        if request["method"] == "eth_blockNumber":
+            result = hex(node.block_number)
+        elif request["method"] == "eth_feeHistory":
+            result = {"oldestBlock": hex(node.block_number - len(node.rewards) + 1),
+                      "baseFeePerGas": [hex(fee) for fee in node.base_fees],
+                      "gasUsedRatio": [0.5] * len(node.rewards),
+                      "reward": [[hex(reward) for reward in rewards] for rewards in node.rewards]}
+        else:
+            result = None
+
+        body = json.dumps({"jsonrpc": "2.0", "id": request["id"], "result": result}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeMemcache:
+    """Records what the oracle publishes instead of talking to memcached."""
+
+    def __init__(self):
+        self.values = {}
+
+    def set(self, key, value, expire=0):
+        self.values[key] = (value, expire)
+        return True
+
+
+@pytest.fixture
+def node():
+    server = JsonRpcStub()
+    thread = Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def published(monkeypatch):
+    cache = FakeMemcache()
+    monkeypatch.setattr(gas, "memcache", cache)
+
+    return cache.values
+
+
+def fee_history_calls(node: JsonRpcStub) -> list:
+    return [params for method, params in node.calls if method == "eth_feeHistory"]
+
+
+def test_refresh_prices_next_base_fee_and_median_reward(node, published):
+    oracle = GasOracle(Web3(Web3.HTTPProvider(node.url)), "1", block_count=3, percentile=60, expire=120)
+
+    gas_price = oracle.refresh()
+
+    # Next block's base fee with 25% headroom plus the median priority fee
+    assert oracle.base_fee == 24 * GWEI
+    assert oracle.priority_fee == 2 * GWEI
+    assert gas_price == 32 * GWEI
+    assert oracle.fresh
+
+    assert fee_history_calls(node) == [[hex(3), hex(100), [60]]]
+    assert published == {"eth_gas_price": (32 * GWEI, 120)}
+
+
+def test_refresh_skips_fee_history_until_new_block(node, published):
+    oracle = GasOracle(Web3(Web3.HTTPProvider(node.url)), "137", block_count=3)
+
+    oracle.refresh()
+    node.base_fees = [40 * GWEI] * 3
+    oracle.refresh()
+
+    # Same block - price kept and published again without asking for fee history
+    assert len(fee_history_calls(node)) == 1
+    assert oracle.gas_price == 32 * GWEI
+
+    node.block_number += 1
+    oracle.refresh()
+
+    assert len(fee_history_calls(node)) == 2
+    assert oracle.gas_price == 52 * GWEI
+    assert published["gas_price_137"][0] == 52 * GWEI
+
+
+def test_refresh_without_rewards_pays_no_priority_fee(node, published):
+    node.rewards = []
+    node.base_fees = [8 * GWEI]
+    oracle = GasOracle(Web3(Web3.HTTPProvider(node.url)), "1")
+
+    assert oracle.refresh() == 10 * GWEI
+    assert oracle.priority_fee == 0
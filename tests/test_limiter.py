@@ -0,0 +1,120 @@
+"""
+Per-network token bucket & AIMD concurrency limits of 1inch requests.
+"""
+import time
+import asyncio
+
+from src.projecthope.one_inch.limiter import (
+    NetworkLimiter,
+    RateLimiter,
+    parse_retry_after,
+)
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_concurrency_limit_holds_requests_back():
+    async def main():
+        limiter = NetworkLimiter(rate=1000, burst=100, concurrency=2)
+        await limiter.acquire()
+        await limiter.acquire()
+
+        third = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0.02)
+        assert not third.done() and limiter.waiting == 1
+
+        await limiter.release(200, 0.1)
+        await asyncio.wait_for(third, 1)
+        assert limiter.in_flight == 2
+
+    run(main())
+
+
+def test_token_bucket_paces_requests():
+    async def main():
+        limiter = NetworkLimiter(rate=50, burst=2, concurrency=10)
+        start = time.monotonic()
+        for _ in range(5):
+            await limiter.acquire()
+            await limiter.release(200, 0.01)
+
+        # Burst of 2, then 3 more at 50 per sec
+        return time.monotonic() - start
+
+    assert 0.04 <= run(main()) < 0.5
+
+
+def test_additive_increase_on_success():
+    async def main():
+        limiter = NetworkLimiter(concurrency=4, max_concurrency=5)
+        for _ in range(4):
+            await limiter.acquire()
+            await limiter.release(200, 0.1)
+
+        assert 4.9 < limiter.limit <= 5
+
+        for _ in range(20):
+            await limiter.acquire()
+            await limiter.release(200, 0.1)
+
+        assert limiter.limit == 5
+
+    run(main())
+
+
+def test_multiplicative_decrease_and_back_off_on_429():
+    async def main():
+        limiter = NetworkLimiter(rate=10, concurrency=8, min_concurrency=3)
+        await limiter.acquire()
+        await limiter.release(429, 0.1, retry_after=0.05)
+
+        assert limiter.limit == 4
+        assert limiter.rate == 5
+        assert limiter.throttled == 1
+
+        # Blocked for 'Retry-After' secs
+        start = time.monotonic()
+        await limiter.acquire()
+        assert time.monotonic() - start >= 0.04
+        await limiter.release(429, 0.1, retry_after=0)
+
+        assert limiter.limit == 3
+
+    run(main())
+
+
+def test_slow_responses_shrink_limit_and_failures_keep_it():
+    async def main():
+        limiter = NetworkLimiter(concurrency=10, latency_target=1)
+        await limiter.acquire()
+        await limiter.release(200, 2)
+        assert limiter.limit == 9
+
+        await limiter.acquire()
+        await limiter.release(None, 0.1)
+        await limiter.acquire()
+        await limiter.release(500, 0.1)
+        assert limiter.limit == 9
+        assert limiter.in_flight == 0
+
+    run(main())
+
+
+def test_rate_limiter_keeps_one_limiter_per_network():
+    limiter = RateLimiter(concurrency=3)
+
+    assert limiter.for_network("1") is limiter.for_network(1)
+    assert limiter.for_network("137").limit == 3
+
+    limiter.configure(concurrency=6)
+    assert limiter.for_network("56").limit == 6
+    assert limiter.stats()["1"]["concurrency"] == 3
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("2") == 2.0
+    assert parse_retry_after("-1") == 0.0
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") is None
+    assert parse_retry_after(None) is None
@@ -0,0 +1,56 @@
+"""
+Background log handlers writing one file per process.
+"""
+import logging
+import multiprocessing
+
+from src.projecthope.common import logger as logger_module
+from src.projecthope.common.logger import (
+    logger_setup,
+    process_filename,
+)
+
+
+def read(path) -> str:
+    with open(path) as file:
+        return file.read()
+
+
+def write_from_child(name: str, filename: str) -> None:
+    logger = logging.getLogger(name)
+    logger.warning("from child")
+    for handler in logger.handlers:
+        handler.close()
+
+
+def test_process_filename():
+    assert process_filename("logs/error.log") == "logs/error.log"
+
+
+def test_child_process_writes_its_own_file(tmp_path):
+    filename = str(tmp_path / "test.log")
+    logger = logger_setup("test-child", filename)
+    logger.warning("from parent")
+
+    child = multiprocessing.get_context("fork").Process(target=write_from_child, name="child",
+                                                        args=("test-child", filename))
+    child.start()
+    child.join()
+
+    logger.warning("parent again")
+    for handler in logger.handlers:
+        handler.close()
+
+    assert child.exitcode == 0
+    assert read(tmp_path / "test-child.log").count("from") == 1
+    assert "from child" in read(tmp_path / "test-child.log")
+    assert "from child" not in read(filename) and "parent again" in read(filename)
+
+
+def test_reconfiguring_does_not_keep_old_handlers(tmp_path):
+    before = len(logger_module._background_handlers)
+    for _ in range(5):
+        logger_setup("test-reconfigure", str(tmp_path / "test.log"))
+
+    assert len(logger_module._background_handlers) == before + 1
+    logging.getLogger("test-reconfigure").handlers[0].close()
@@ -0,0 +1,90 @@
+"""
+Syncing a local order book from a REST snapshot and diff-depth events.
+"""
+import pytest
+
+from src.projecthope.binance.orderbook import (
+    OrderBook,
+    OrderBookGapError,
+)
+
+
+SNAPSHOT = {"lastUpdateId": 107, "bids": [["100.0", "1.0"], ["99.0", "2.0"]], "asks": [["101.0", "1.5"]]}
+
+
+def event(first: int, last: int, bids: list | None = None, asks: list | None = None, time: int | None = None) -> dict:
+    return {"e": "depthUpdate", "E": time or 1700000000000 + last, "U": first, "u": last,
+            "b": bids or [], "a": asks or []}
+
+
+def test_buffered_event_straddling_snapshot_is_applied():
+    book = OrderBook("ETHUSDT")
+    book.apply_snapshot(SNAPSHOT, [event(100, 105), event(106, 110, bids=[["100.0", "3.0"]])])
+
+    assert book.synced
+    assert book.last_update_id == 110
+    assert book.bids[100.0] == 3.0
+    assert book.event_time == 1700000000110
+
+
+def test_stale_events_are_dropped():
+    book = OrderBook("ETHUSDT")
+    book.apply_snapshot(SNAPSHOT, [event(100, 105, bids=[["100.0", "9.0"]]), event(106, 107)])
+
+    book.apply_event(event(101, 106, bids=[["99.0", "0"]]))
+
+    assert book.last_update_id == 107
+    assert book.bids == {100.0: 1.0, 99.0: 2.0}
+
+
+def test_snapshot_newer_than_buffer_accepts_straddling_live_event():
+    book = OrderBook("ETHUSDT")
+    book.apply_snapshot(SNAPSHOT, [event(100, 105)])
+
+    # Synced on the snapshot alone, aged by the newest buffered event rather than left at 0
+    assert book.synced
+    assert book.last_update_id == 107
+    assert book.event_time == 1700000000105
+
+    book.apply_event(event(106, 110, asks=[["101.0", "0"], ["102.0", "4.0"]]))
+    book.apply_event(event(111, 112))
+
+    assert book.last_update_id == 112
+    assert book.asks == {102.0: 4.0}
+    assert book.event_time == 1700000000112
+
+
+def test_snapshot_older_than_buffered_events_raises():
+    book = OrderBook("ETHUSDT")
+
+    with pytest.raises(OrderBookGapError):
+        book.apply_snapshot(SNAPSHOT, [event(109, 112)])
+
+    assert not book.synced
+
+
+def test_live_event_gap_raises():
+    book = OrderBook("ETHUSDT")
+    book.apply_snapshot(SNAPSHOT, [event(106, 108)])
+
+    with pytest.raises(OrderBookGapError):
+        book.apply_event(event(110, 111))
+
+
+def test_first_live_event_after_snapshot_gap_raises():
+    book = OrderBook("ETHUSDT")
+    book.apply_snapshot(SNAPSHOT, [event(100, 105)])
+
+    with pytest.raises(OrderBookGapError):
+        book.apply_event(event(109, 111))
+
+
+def test_reset_forgets_pending_first_event():
+    book = OrderBook("ETHUSDT")
+    book.apply_snapshot(SNAPSHOT, [])
+    book.reset()
+    book.apply_snapshot({"lastUpdateId": 200, "bids": [], "asks": []}, [event(195, 201)])
+
+    # Straddling event consumed the first event rule, later ones must follow on
+    with pytest.raises(OrderBookGapError):
+        book.apply_event(event(201, 203))
@@ -0,0 +1,39 @@
+"""
+Sampling profiler started & stopped by repeated toggles, eg. SIGUSR2.
+"""
+import time
+import threading
+
+from src.projecthope.common.profiler import SamplingProfiler
+
+
+def test_stop_writes_collapsed_stacks(tmp_path):
+    profiler = SamplingProfiler(interval=0.001, directory=str(tmp_path))
+    profiler.start()
+    time.sleep(0.05)
+
+    path = profiler.stop()
+
+    assert not profiler.running
+    with open(path) as file:
+        lines = file.read().splitlines()
+    assert lines and all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    assert profiler.stop() is None
+
+
+def test_second_stop_while_stopping_returns_none(tmp_path):
+    profiler = SamplingProfiler(interval=0.001, directory=str(tmp_path))
+    # Joining the sampler waits for a slow sample, long enough for a second signal to come in
+    profiler._sample = lambda: time.sleep(0.1)
+    profiler.start()
+    time.sleep(0.01)
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(profiler.stop())) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(results) == 2 and results.count(None) == 1
+    assert len(list(tmp_path.iterdir())) == 1
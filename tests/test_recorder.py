@@ -0,0 +1,63 @@
+"""
+Column segments written by the recorders and read back for replays.
+"""
+import math
+
+from src.projecthope.common.recorder import (
+    BookRecorder,
+    ColumnRecorder,
+    STRING,
+    list_segments,
+    read_meta,
+    read_segment,
+)
+
+
+def test_quotes_round_trip(tmp_path):
+    recorder = ColumnRecorder("quotes", [("received", "d", 1), ("network", STRING, 1), ("amount_out", "d", 1)],
+                              directory=str(tmp_path))
+    path = recorder.write_segment([(1.0, "1", 10.5), (2.0, "137", 11.0), (3.0, "1", float("nan"))])
+
+    columns = read_segment(path)
+    assert list(columns["received"]) == [1.0, 2.0, 3.0]
+    assert columns["network"] == ["1", "137", "1"]
+    assert math.isnan(columns["amount_out"][2])
+    assert read_meta(path)["start"] == 1.0 and read_meta(path)["end"] == 3.0
+
+
+def test_books_are_cut_to_depth_and_padded(tmp_path):
+    recorder = BookRecorder(depth=2, directory=str(tmp_path), flush_interval=60)
+    recorder.start()
+    recorder.record(1.0, 1700000000000, 107, "ETHUSDT",
+                    [[100.0, 1.0], [99.0, 2.0], [98.0, 3.0]], [[101.0, 1.5]])
+    recorder.stop()
+
+    (path, ) = list_segments(str(tmp_path), "books")
+    columns = read_segment(path)
+
+    assert list(columns["bid_prices"]) == [100.0, 99.0]
+    assert list(columns["bid_quantities"]) == [1.0, 2.0]
+    assert columns["ask_prices"][0] == 101.0 and math.isnan(columns["ask_prices"][1])
+    assert columns["symbol"] == ["ETHUSDT"]
+    assert read_meta(path)["columns"][4] == ["bid_prices", "d", 2]
+
+
+def test_book_depth_setting_changes_columns():
+    recorder = BookRecorder()
+    recorder.configure(book_depth=20, segment_rows=10)
+
+    assert recorder.depth == 20 and recorder.segment_rows == 10
+    assert all(width == 20 for _, _, width in recorder.columns[4:])
+
+
+def test_buffer_is_bounded_by_memory(tmp_path):
+    recorder = BookRecorder(depth=100, directory=str(tmp_path), max_bytes=10 * BookRecorder(depth=100).row_bytes)
+    recorder.start()
+    levels = [[100.0 - i, 1.0] for i in range(100)]
+    for i in range(25):
+        recorder.record(float(i), i, i, "ETHUSDT", levels, levels)
+    recorder.stop()
+
+    paths = list_segments(str(tmp_path), "books")
+    assert sorted(read_meta(path)["rows"] for path in paths) == [5, 10, 10]
+    assert recorder.recorded == 25 and recorder.dropped == 0
@@ -0,0 +1,86 @@
+"""
+Shared-memory order book slots and their seqlock.
+"""
+import time
+import pickle
+
+import pytest
+
+from src.projecthope.binance.shm import (
+    SLOT_HEADER,
+    SharedBookStore,
+)
+
+
+@pytest.fixture
+def store():
+    books = SharedBookStore(["ETHUSDT", "BNBUSDT"], slot_size=1024, create=True)
+
+    yield books
+
+    books.close()
+
+
+def sequence(store: SharedBookStore, symbol: str) -> int:
+    return SLOT_HEADER.unpack_from(store.shm.buf, store._slots[symbol])[0]
+
+
+def test_set_and_get(store):
+    assert store.get("ETHUSDT") is None
+    assert store.set("ethusdt", b"book-1")
+    assert store.set("ETHUSDT", b"book-2")
+
+    assert store.get("ETHUSDT") == b"book-2"
+    assert store.get("BNBUSDT", default=b"none") == b"none"
+    assert sequence(store, "ETHUSDT") == 4
+
+
+def test_unknown_symbol_and_oversized_book(store):
+    assert not store.set("BTCUSDT", b"book")
+    assert store.get("BTCUSDT", default=b"none") == b"none"
+
+    assert not store.set("ETHUSDT", b"x" * store.slot_size)
+    assert store.get("ETHUSDT") is None
+
+
+def test_expired_book_is_missing(store):
+    store.set("ETHUSDT", b"book", expire=0.05)
+    assert store.get("ETHUSDT") == b"book"
+
+    time.sleep(0.1)
+    assert store.get("ETHUSDT") is None
+
+
+def test_write_in_progress_is_not_read(store):
+    store.set("ETHUSDT", b"book")
+
+    # Writer marked the slot busy & has not finished
+    SLOT_HEADER.pack_into(store.shm.buf, store._slots["ETHUSDT"], 3, 0, 0, 0)
+
+    assert store.get("ETHUSDT", default=b"busy", retries=5) == b"busy"
+
+
+def test_slot_recovers_after_writer_killed_mid_write(store):
+    store.set("ETHUSDT", b"book-1")
+    SLOT_HEADER.pack_into(store.shm.buf, store._slots["ETHUSDT"], 3, 0, 0, 0)
+
+    # A restarted writer finishes with an even sequence number again
+    store.set("ETHUSDT", b"book-2")
+
+    assert sequence(store, "ETHUSDT") % 2 == 0
+    assert store.get("ETHUSDT") == b"book-2"
+
+
+def test_attach_from_another_process(store):
+    store.set("BNBUSDT", b"book")
+
+    # Spawned processes unpickle the store and attach to the same block
+    attached: SharedBookStore = pickle.loads(pickle.dumps(store))
+    try:
+        assert attached.name == store.name
+        assert attached.get("BNBUSDT") == b"book"
+
+        attached.set("ETHUSDT", b"from-child")
+        assert store.get("ETHUSDT") == b"from-child"
+    finally:
+        attached.shm.close()